@@ -0,0 +1,55 @@
+# Standard library imports
+import argparse
+import math
+import time
+
+# Local application imports
+from src.arena import ArenaGame
+
+
+def time_arena(num_balls, broad_phase, repeat=3, frames=200, warmup=60):
+    """
+    Time updating a multi-ball arena with two AI players.
+
+    Args:
+        num_balls (int): The number of balls.
+        broad_phase (str): 'grid' or 'brute' - see ArenaGame.
+        repeat (int, optional): Timing runs - the fastest is kept.
+        frames (int, optional): Frames per timing run.
+        warmup (int, optional): Frames played before timing, so that the balls have spread out and sped up.
+
+    Returns:
+        tuple: The best average time per frame in milliseconds, and the number of candidate pairs the broad phase
+        finds on the last frame.
+    """
+    game = ArenaGame(num_balls=num_balls, seed=0, broad_phase=broad_phase)
+    for _ in range(warmup):
+        game.update()
+
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(frames):
+            game.update()
+        best = min(best, time.perf_counter() - start)
+
+    return best / frames * 1000, len(game.candidate_pairs()[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Frame time of the multi-ball arena, with the uniform grid and "
+                                                 "the all-pairs broad phase.")
+    parser.add_argument("--balls", type=int, nargs="+", default=[100, 250, 500, 1000], help="numbers of balls")
+    parser.add_argument("--repeat", type=int, default=3, help="timing runs - the fastest is kept")
+    args = parser.parse_args()
+
+    # A frame at 60 frames per second lasts 16.7ms
+    print(f"{'balls':>6} {'broad phase':>12} {'pairs':>9} {'update ms':>10} {'% of frame':>11}")
+    for num_balls in args.balls:
+        for broad_phase in ("grid", "brute"):
+            update, pairs = time_arena(num_balls, broad_phase, args.repeat)
+            print(f"{num_balls:>6} {broad_phase:>12} {pairs:>9.0f} {update:>10.3f} {update / 16.667 * 100:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# Standard library imports
+import argparse
+import math
+import random
+import time
+
+# Local application imports
+from src.game import Game
+
+
+def make_states(count, speed, seed=0):
+    """
+    Generate random but reproducible ball states in play, heading in random directions.
+
+    Args:
+        count (int): The number of states to generate.
+        speed (int): The speed of the ball in every state.
+        seed (int, optional): Seed for the random generator.
+
+    Returns:
+        list: (x, y, dx, dy, speed) tuples.
+    """
+    rng = random.Random(seed)
+    states = []
+    for _ in range(count):
+        angle = rng.uniform(-0.8, 0.8)
+        dx = rng.choice((-1, 1)) * math.cos(angle)
+        dy = math.sin(angle)
+        states.append((rng.uniform(60, 740), rng.uniform(25, 455), dx, dy, speed))
+    return states
+
+
+def time_update(method, states, repeat=3):
+    """
+    Time one frame of ball movement from each of the given states.
+
+    Args:
+        method (str): The Ball method to time - "update_stepped" or "update_swept".
+        states (list): Ball states, as returned by make_states.
+        repeat (int, optional): Number of timing runs - the fastest is kept.
+
+    Returns:
+        float: The best average time per frame, in microseconds.
+    """
+    game = Game()
+    ball = game.ball
+    update = getattr(ball, method)
+
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for ball.x, ball.y, ball.dx, ball.dy, ball.speed in states:
+            update()
+        elapsed = time.perf_counter() - start
+        game.impacts.clear()
+        best = min(best, elapsed)
+
+    return best / len(states) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-frame cost of Ball.update as the ball speeds up.")
+    parser.add_argument("--speeds", type=int, nargs="+", default=[5, 10, 15, 20, 30, 50, 75, 100, 150, 200])
+    parser.add_argument("--frames", type=int, default=2000, help="frames timed per speed")
+    args = parser.parse_args()
+
+    print(f"{'speed':>6} {'stepped us':>11} {'swept us':>9} {'ratio':>6}")
+    for speed in args.speeds:
+        states = make_states(args.frames, speed)
+        stepped = time_update("update_stepped", states)
+        swept = time_update("update_swept", states)
+        print(f"{speed:>6} {stepped:>11.2f} {swept:>9.2f} {stepped / swept:>6.1f}")
+
+
+if __name__ == "__main__":
+    main()
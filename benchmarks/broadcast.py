@@ -0,0 +1,103 @@
+# Standard library imports
+import argparse
+import asyncio
+import subprocess
+import sys
+import time
+
+# Local application imports
+from src.broadcast import BroadcastServer, SpectatorClient, pack_state, STATE_SIZE
+from src.game import Game
+
+# Local application constants
+from src.constants import SIMULATION_RATE
+
+
+async def serve(num_spectators, seconds):
+    """
+    Broadcast an AI against AI match on loopback to spectators in a separate process, at the simulation rate.
+
+    Args:
+        num_spectators (int): The number of spectators.
+        seconds (float): How long to measure for, once every spectator has connected.
+
+    Returns:
+        dict: Bytes sent per tick per spectator, the fraction of a core the server used, the fraction of ticks
+        which started late and the number of ticks not sent to spectators which had fallen behind.
+    """
+    server = BroadcastServer()
+    port = await server.start()
+    spectators = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "benchmarks.broadcast", "--spectators", str(num_spectators), "--port", str(port),
+        stdout=subprocess.DEVNULL)
+
+    loop = asyncio.get_running_loop()
+    game = Game(seed=0)
+    start = None
+    next_tick = loop.time()
+    while start is None or loop.time() - start < seconds:
+        if start is None and server.spectators == num_spectators:
+            # Every spectator has connected - start measuring. The measurement spans several keyframe intervals,
+            # so the keyframes' share of the bytes sent is counted fairly
+            start, cpu_start = loop.time(), time.process_time()
+            ticks_start, bytes_start, skipped_start = server.ticks, server.bytes_sent, server.skipped
+            late = 0
+
+        if game.finished:
+            game = Game(seed=server.ticks)
+        game.update()
+        server.publish(pack_state(game))
+
+        next_tick += 1 / SIMULATION_RATE
+        delay = next_tick - loop.time()
+        if start is not None and delay < 0:
+            late += 1
+        await asyncio.sleep(max(0.0, delay))
+
+    elapsed = loop.time() - start
+    cpu = time.process_time() - cpu_start
+    ticks = server.ticks - ticks_start
+    sent = server.bytes_sent - bytes_start
+    skipped = server.skipped - skipped_start
+    await server.close()
+    await spectators.wait()
+
+    return {"bytes_per_tick": sent / ticks / num_spectators,
+            "cpu": cpu / elapsed,
+            "late": late / ticks,
+            "skipped": skipped}
+
+
+async def spectate(num_spectators, port):
+    # Connects the spectators, which run until the server closes their connections
+    clients = [SpectatorClient() for _ in range(num_spectators)]
+    await asyncio.gather(*(client.run("127.0.0.1", port) for client in clients))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test of the spectator broadcast on loopback: bytes sent per "
+                                                 "tick, and how many spectators one core can serve at 60 Hz.")
+    parser.add_argument("--counts", type=int, nargs="+", default=[10, 100, 250, 500, 1000],
+                        help="numbers of spectators to test with")
+    parser.add_argument("--seconds", type=float, default=5, help="measurement time for each number of spectators")
+    parser.add_argument("--spectators", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.spectators:
+        asyncio.run(spectate(args.spectators, args.port))
+        return
+
+    # The spectators run in a separate process, so the server's CPU time is its own. If the machine has a single
+    # core, they compete for it, and ticks start late well before the server itself is at capacity
+    print(f"uncompressed state {STATE_SIZE} bytes")
+    print(f"{'spectators':>10} {'bytes/tick':>11} {'server cpu':>11} {'late':>7} {'skipped':>8} {'per core':>9}")
+    for count in args.counts:
+        result = asyncio.run(serve(count, args.seconds))
+        per_core = count / result["cpu"] if result["cpu"] else float("inf")
+        print(f"{count:>10} {result['bytes_per_tick']:>11.1f} {result['cpu']:>11.1%} {result['late']:>7.1%} "
+              f"{result['skipped']:>8} {per_core:>9.0f}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
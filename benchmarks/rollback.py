@@ -0,0 +1,91 @@
+# Standard library imports
+import argparse
+import math
+import random
+import time
+
+# Local application imports
+from src.game import Game
+from src.netplay import MAX_ROLLBACK_FRAMES
+from src.replay import MOVES
+
+
+def make_game(frames, seed=0):
+    """
+    Create a two-player game, and play it for a number of frames with random moves.
+
+    Args:
+        frames (int): The number of frames to play before timing starts.
+        seed (int, optional): Seed for the game and the moves.
+
+    Returns:
+        Game: The game.
+    """
+    rng = random.Random(seed)
+    game = Game(controls=(lambda: rng.choice(MOVES), lambda: rng.choice(MOVES)), seed=seed)
+    for _ in range(frames):
+        game.update()
+    return game
+
+
+def time_snapshot(game, repeat=3, count=2000):
+    """
+    Time taking a snapshot of a game and restoring it.
+
+    Returns:
+        tuple: The best average times of snapshot and restore, in microseconds.
+    """
+    best_snapshot = best_restore = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(count):
+            state = game.snapshot()
+        best_snapshot = min(best_snapshot, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for _ in range(count):
+            game.restore(state)
+        best_restore = min(best_restore, time.perf_counter() - start)
+
+    return best_snapshot / count * 1e6, best_restore / count * 1e6
+
+
+def time_rollback(game, depth, repeat=3, count=200):
+    """
+    Time a rollback as RollbackSession performs it - restoring the snapshot from a number of frames ago, then
+    re-simulating each frame since, taking a snapshot before each one.
+
+    Returns:
+        float: The best average time per rollback, in microseconds.
+    """
+    state = game.snapshot()
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(count):
+            game.restore(state)
+            for _ in range(depth):
+                game.snapshot()
+                game.update()
+        best = min(best, time.perf_counter() - start)
+    return best / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cost of rolling back and re-simulating a networked game.")
+    parser.add_argument("--warmup", type=int, default=600, help="frames played before timing, to fill the impacts")
+    args = parser.parse_args()
+
+    game = make_game(args.warmup)
+    snapshot, restore = time_snapshot(game)
+    print(f"snapshot {snapshot:.2f} us, restore {restore:.2f} us")
+
+    # A frame at 60 frames per second lasts 16.7ms, and the worst case is a rollback of the full window every frame
+    print(f"{'depth':>6} {'rollback us':>12} {'% of frame':>11}")
+    for depth in range(1, MAX_ROLLBACK_FRAMES + 1):
+        rollback = time_rollback(game, depth)
+        print(f"{depth:>6} {rollback:>12.1f} {rollback / 16667 * 100:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# Standard library imports
+import argparse
+import asyncio
+import os
+import random
+
+# Local application imports
+from src.host import SessionHost
+from src.session import INPUT_SPACE, INPUT_A, INPUT_Z
+
+# Each simulated player holds one of these key combinations at a time - still, up or down, sometimes with space
+# held to start a match or go back to the menu
+PLAYER_INPUTS = (0, INPUT_A, INPUT_Z, INPUT_SPACE)
+
+
+async def players(host, seed=0):
+    # Simulates a player at every session, who changes the keys they are holding a few times per second. The
+    # changes are spread over the time between ticks, as they would be if they arrived over the network
+    rng = random.Random(seed)
+    queues = [host.queue(session_id) for session_id in host.sessions]
+    while True:
+        for queue in rng.sample(queues, len(queues) // 20):
+            queue.put_nowait(rng.choice(PLAYER_INPUTS))
+        await asyncio.sleep(host.timestep.step / 4)
+
+
+async def measure(num_sessions, seconds, warmup):
+    """
+    Run a host with a number of sessions and simulated players.
+
+    Args:
+        num_sessions (int): The number of sessions.
+        seconds (float): How long to measure for.
+        warmup (float): How long to run before measuring, so that most sessions are in a match.
+
+    Returns:
+        tuple: The fraction of ticks which missed their deadline, and the fraction of the time spent ticking.
+    """
+    host = SessionHost()
+    for _ in range(num_sessions):
+        host.add()
+
+    feeder = asyncio.ensure_future(players(host))
+    await host.run(warmup)
+
+    # Only count what happens after the warmup
+    ticks, missed, dropped, busy = host.ticks, host.missed, host.timestep.dropped, host.busy
+    await host.run(seconds)
+    feeder.cancel()
+
+    # Dropped ticks miss their deadline without being run
+    due = host.ticks - ticks + host.timestep.dropped - dropped
+    return (host.missed - missed) / max(1, due), (host.busy - busy) / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Number of sessions one process can tick at 60 Hz before ticks "
+                                                 "start to miss their deadlines.")
+    parser.add_argument("--seconds", type=float, default=3, help="measurement time per number of sessions")
+    parser.add_argument("--warmup", type=float, default=1, help="time run before each measurement")
+    parser.add_argument("--max-missed", type=float, default=0.01,
+                        help="fraction of ticks allowed to miss their deadline")
+    parser.add_argument("--start", type=int, default=50, help="number of sessions to start from")
+    args = parser.parse_args()
+
+    def run(num_sessions):
+        missed, load = asyncio.run(measure(num_sessions, args.seconds, args.warmup))
+        ok = missed <= args.max_missed
+        print(f"{num_sessions:>9} {missed:>10.2%} {load:>8.1%} {'ok' if ok else 'MISSED'}", flush=True)
+        return ok
+
+    print(f"{'sessions':>9} {'missed':>10} {'load':>8}")
+
+    # Double the number of sessions until deadlines are missed, then bisect between the last two
+    good, bad = 0, args.start
+    while run(bad):
+        good, bad = bad, bad * 2
+    while bad - good > max(1, good // 20):
+        middle = (good + bad) // 2
+        if run(middle):
+            good = middle
+        else:
+            bad = middle
+
+    # The host is a single thread, so it uses one core - a process per core scales it up
+    print(f"\n{good} sessions per core at 60 Hz ({os.cpu_count()} cores available)")
+
+
+if __name__ == "__main__":
+    main()
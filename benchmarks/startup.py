@@ -0,0 +1,109 @@
+# Standard library imports
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# The modules whose import time is measured, in the order main.py imports them
+MODULES = ("src.utilities", "src.session", "src.profiler", "src.renderer", "src.assets", "src.audio",
+           "src.timestep", "src.netplay", "src.events", "src.broadcast", "src.inputs")
+
+
+def run_child(args, env=None):
+    # Runs this script in a fresh interpreter, and returns the last line it prints
+    result = subprocess.run([sys.executable, "-m", "benchmarks.startup"] + args, env=env, capture_output=True,
+                            text=True, check=True)
+    return result.stdout.strip().splitlines()[-1]
+
+
+def time_import(module, repeat):
+    """
+    Time importing a module in a fresh interpreter, including the modules it imports.
+
+    Returns:
+        float: The median time in milliseconds.
+    """
+    return statistics.median(float(run_child(["--import", module])) for _ in range(repeat))
+
+
+def time_first_frame(repeat, eager):
+    """
+    Time from launching main.py until its first frame has been drawn.
+
+    Args:
+        repeat (int): The number of runs.
+        eager (bool): Load every asset before the first frame, rather than lazily.
+
+    Returns:
+        float: The median time in milliseconds.
+    """
+    env = dict(os.environ, EAGER_ASSETS="1" if eager else "0")
+    times = []
+    for _ in range(repeat):
+        start = time.time()
+        times.append((float(run_child(["--first-frame"], env)) - start) * 1000)
+    return statistics.median(times)
+
+
+def child_import(module):
+    start = time.perf_counter()
+    __import__(module)
+    print((time.perf_counter() - start) * 1000)
+
+
+def child_first_frame():
+    # Runs main.py, printing the time at which the first frame has been drawn and exiting straight away
+    import runpy
+    import pgzero.game
+
+    get_draw_func = pgzero.game.PGZeroGame.get_draw_func
+
+    def first_frame_draw_func(self):
+        draw = get_draw_func(self)
+
+        def draw_and_exit():
+            draw()
+            print(time.time(), flush=True)
+            os._exit(0)
+
+        return draw_and_exit
+
+    pgzero.game.PGZeroGame.get_draw_func = first_frame_draw_func
+    sys.argv = ["main.py"]
+    runpy.run_path("main.py", run_name="__main__")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start time of the game: import time of each module, and "
+                                                 "time from launch to the first frame.")
+    parser.add_argument("--repeat", type=int, default=5, help="runs of each measurement - the median is shown")
+    parser.add_argument("--headless", action="store_true", help="use SDL's dummy video and audio drivers")
+    parser.add_argument("--import", dest="child_import", help=argparse.SUPPRESS)
+    parser.add_argument("--first-frame", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_import:
+        child_import(args.child_import)
+        return
+    if args.first_frame:
+        child_first_frame()
+        return
+
+    if args.headless:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+    print(f"{'module':<16} {'import ms':>10}")
+    for module in MODULES:
+        print(f"{module:<16} {time_import(module, args.repeat):>10.1f}")
+
+    print()
+    print(f"{'assets':<16} {'first frame ms':>15}")
+    for eager in (True, False):
+        print(f"{'eager' if eager else 'lazy':<16} {time_first_frame(args.repeat, eager):>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+# Standard library imports
+import argparse
+import hashlib
+import json
+import math
+import os
+import platform
+import random
+import struct
+import sys
+import time
+
+# Local application imports
+from benchmarks.arena import time_arena
+from benchmarks.ball_speed import make_states, time_update
+from src.game import Game
+from src.impact import ImpactPool
+from src.replay import MOVES
+
+# The golden trajectories are kept next to this file
+GOLDEN_PATH = os.path.join(os.path.dirname(__file__), "golden.json")
+
+# The golden trajectories: seeds, and how many frames of each match are recorded
+GOLDEN_SEEDS = (0, 1, 2, 3, 4)
+GOLDEN_FRAMES = 3000
+
+# The state recorded on every frame of a golden trajectory - ball position, direction and speed, bat positions,
+# timers and scores
+TRACE_FRAME = struct.Struct("<5d2d2i2i")
+
+
+def best_of(function, repeat):
+    """
+    Run a function several times, keeping the fastest time.
+
+    Args:
+        function (callable): The function to time. It returns the number of operations it performed.
+        repeat (int): The number of runs.
+
+    Returns:
+        float: The best number of operations per second.
+    """
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        operations = function()
+        best = min(best, (time.perf_counter() - start) / operations)
+    return 1 / best
+
+
+def bench_game_update(frames):
+    # Headless AI against AI match
+    def run():
+        game = Game(seed=0)
+        for _ in range(frames):
+            game.update()
+        return frames
+    return run
+
+
+def bench_bat_ai(calls):
+    # Bat.ai with the ball at a spread of positions, half near enough for the bat to track it
+    game = Game(seed=0)
+    bat = game.bats[0]
+    rng = random.Random(0)
+    positions = [(rng.uniform(0, 800), rng.uniform(0, 480)) for _ in range(calls)]
+
+    def run():
+        ball = game.ball
+        ai = bat.ai
+        for ball.x, ball.y in positions:
+            ai()
+        return calls
+    return run
+
+
+def bench_impact_churn(frames):
+    # An impact pool receiving a new impact every couple of frames and aging the rest, as in a fast rally
+    def run():
+        pool = ImpactPool()
+        for frame in range(frames):
+            if frame % 2 == 0:
+                pool.add(400, 240)
+            pool.update()
+            for _ in pool:
+                pass
+        return frames
+    return run
+
+
+def bench_game_draw(frames):
+    # Game.draw onto an offscreen surface, with the display set up with SDL's dummy driver if there is no other
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+    # Pygame imports
+    import pygame
+    from pgzero import loaders
+    from pgzero.screen import Screen
+
+    loaders.set_root(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    pygame.display.init()
+    if pygame.display.get_surface() is None:
+        pygame.display.set_mode((800, 480))
+    surface = pygame.Surface((800, 480))
+
+    game = Game(Screen(surface), seed=0)
+    states = []
+    for _ in range(frames):
+        game.update()
+        states.append(game.snapshot())
+
+    def run():
+        for state in states:
+            game.restore(state)
+            game.draw()
+        return frames
+    return run
+
+
+def run_benchmarks(repeat, quick):
+    """
+    Run every benchmark.
+
+    Args:
+        repeat (int): Timing runs per benchmark - the fastest is kept.
+        quick (bool): Time fewer iterations, for a rough result.
+
+    Returns:
+        dict: For each benchmark, its value, unit and whether higher values are better.
+    """
+    scale = 0.1 if quick else 1
+    results = {}
+
+    def record(name, value, unit, higher_is_better=True):
+        results[name] = {"value": value, "unit": unit, "higher_is_better": higher_is_better}
+        print(f"{name:<28} {value:>14.2f} {unit}", flush=True)
+
+    record("game_update", best_of(bench_game_update(int(20000 * scale)), repeat), "frames/s")
+    for speed in (5, 10, 20, 50, 100):
+        states = make_states(int(2000 * scale), speed)
+        record(f"ball_update_speed_{speed}", time_update("update", states, repeat), "us/frame", False)
+    record("bat_ai", 1e6 / best_of(bench_bat_ai(int(50000 * scale)), repeat), "us/call", False)
+    record("impact_churn", best_of(bench_impact_churn(int(50000 * scale)), repeat), "frames/s")
+    record("game_draw", 1e3 / best_of(bench_game_draw(int(1000 * scale)), repeat), "ms/frame", False)
+    record("arena_update_500", time_arena(500, "grid", repeat, int(200 * scale))[0], "ms/frame", False)
+    return results
+
+
+def trace(seed, frames=GOLDEN_FRAMES):
+    """
+    Play a match and record its trajectory. The left-hand player makes random moves, drawn from a generator seeded
+    with the match's seed, so that both the human and the AI control paths are covered.
+
+    Returns:
+        dict: The SHA-256 digest of the state on every frame, the final scores and the frames on which points
+        were scored.
+    """
+    rng = random.Random(seed)
+    move = [0]
+
+    def control():
+        # Hold each key for a few frames, like a player would
+        if rng.random() < 0.1:
+            move[0] = rng.choice(MOVES)
+        return move[0]
+
+    game = Game(controls=(control, None), seed=seed)
+    digest = hashlib.sha256()
+    points = []
+    scores = (0, 0)
+    for frame in range(frames):
+        game.update()
+        ball = game.ball
+        bat0, bat1 = game.bats
+        digest.update(TRACE_FRAME.pack(ball.x, ball.y, ball.dx, ball.dy, ball.speed, bat0.y, bat1.y,
+                                       bat0.timer, bat1.timer, bat0.score, bat1.score))
+        if (bat0.score, bat1.score) != scores:
+            scores = (bat0.score, bat1.score)
+            points.append(frame)
+    return {"sha256": digest.hexdigest(), "scores": list(scores), "points": points}
+
+
+def check_golden(path):
+    """
+    Compare the trajectories of the golden matches with those recorded in a file.
+
+    Returns:
+        dict: For each seed, whether its trajectory matched, and if not, the frames on which points were scored
+        in the golden and current matches.
+    """
+    with open(path) as file:
+        golden = json.load(file)
+
+    results = {}
+    for seed, expected in golden["traces"].items():
+        actual = trace(int(seed), golden["frames"])
+        matched = actual["sha256"] == expected["sha256"]
+        result = {"matched": matched}
+        if not matched:
+            # The frames on which points were scored hint at where the match diverged
+            result["expected_points"] = expected["points"]
+            result["actual_points"] = actual["points"]
+        results[seed] = result
+        print(f"golden seed {seed:<3} {'ok' if matched else 'MISMATCH'}", flush=True)
+    return results
+
+
+def record_golden(path):
+    traces = {str(seed): trace(seed) for seed in GOLDEN_SEEDS}
+    with open(path, "w") as file:
+        json.dump({"frames": GOLDEN_FRAMES, "traces": traces}, file, indent=2)
+        file.write("\n")
+    print(f"recorded {len(traces)} golden trajectories in {path}")
+
+
+def compare(results, baseline_path, threshold):
+    """
+    Compare benchmark results with a baseline written by an earlier run.
+
+    Returns:
+        list: The names of the benchmarks which got worse by more than the threshold.
+    """
+    with open(baseline_path) as file:
+        baseline = json.load(file)["benchmarks"]
+
+    regressions = []
+    print(f"\n{'benchmark':<28} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        old, new = baseline[name]["value"], result["value"]
+
+        # Positive changes are improvements, whichever way the unit goes
+        change = (new - old) / old if result["higher_is_better"] else (old - new) / old
+        flag = ""
+        if change < -threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<28} {old:>12.2f} {new:>12.2f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput benchmarks and golden-trajectory checks. Exits with "
+                                                 "status 1 if a trajectory differs from the golden one, or a "
+                                                 "benchmark regressed compared with the baseline.")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare with the results in this JSON file")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="fraction by which a benchmark must get worse to count as a regression")
+    parser.add_argument("--repeat", type=int, default=3, help="timing runs per benchmark - the fastest is kept")
+    parser.add_argument("--quick", action="store_true", help="time fewer iterations")
+    parser.add_argument("--golden", default=GOLDEN_PATH, help="file holding the golden trajectories")
+    parser.add_argument("--record-golden", action="store_true",
+                        help="record the golden trajectories from the current code, instead of checking them")
+    parser.add_argument("--skip-benchmarks", action="store_true", help="only check the golden trajectories")
+    args = parser.parse_args()
+
+    if args.record_golden:
+        record_golden(args.golden)
+        return
+
+    golden = check_golden(args.golden)
+    results = {} if args.skip_benchmarks else run_benchmarks(args.repeat, args.quick)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"meta": {"python": platform.python_version(),
+                                "platform": platform.platform(),
+                                "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+                       "benchmarks": results,
+                       "golden": golden}, file, indent=2)
+            file.write("\n")
+
+    failed = not all(result["matched"] for result in golden.values())
+    if args.compare and results:
+        failed |= bool(compare(results, args.compare, args.threshold))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
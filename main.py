@@ -1,136 +1,239 @@
+# Standard library imports
+import atexit
+import os
+import threading
+
 # Pygame imports
 import pgzrun
 import pygame
 
 # Local application imports
 from src.utilities import check_python_pygame_versions
-from src.state import State
+from src.session import Session
+from src.inputs import KeyEventQueue
 from src.game import Game
-
-# Local application constants
-from src.constants import PLAYER_SPEED
+from src.profiler import FrameProfiler
+from src.renderer import DirtyRectRenderer
+from src.assets import load_assets
+from src.audio import SoundDispatcher
+from src.timestep import FixedTimestep
+from src.netplay import UdpTransport
+from src.events import EventLog
+from src.broadcast import BroadcastServer, pack_state
 
 # Pygame Zero builtins will be automatically available
 # Do not import screen, keyboard - they are builtins
-from pgzero.builtins import sounds, music
-
-# Declare global game variables
-global state
-global game 
-global num_players
-global space_down
+from pgzero.builtins import music
 
 # Check Python and Pygame versions
 check_python_pygame_versions()
 
-def p1_controls():
-    move = 0
-    if keyboard.z or keyboard.down:
-        move = PLAYER_SPEED
-    elif keyboard.a or keyboard.up:
-        move = -PLAYER_SPEED
-    return move
-
-def p2_controls():
-    move = 0
-    if keyboard.m:
-        move = PLAYER_SPEED
-    elif keyboard.k:
-        move = -PLAYER_SPEED
-    return move
-
-# Pygame Zero calls the update and draw functions each frame
-def update():
-    
-    global state
-    global num_players
-    global game
-    global space_down
-
-    # Initialize game with screen on first run if not already initialized
-    if game.screen is None:
-        game.screen = screen
-
-    # Work out whether the space key has just been pressed - i.e. in the previous frame it wasn't down,
-    # and in this frame it is.
-    space_pressed = False
-    if keyboard.space and not space_down:
-        space_pressed = True
-    space_down = keyboard.space
-
-    if state == State.MENU:
-        if space_pressed:
-            # Switch to play state, and create a new Game object, passing it the controls function for
-            # player 1, and if we're in 2 player mode, the controls function for player 2 (otherwise the
-            # 'None' value indicating this player should be computer-controlled)
-            state = State.PLAY
-            controls = [p1_controls]
-            controls.append(p2_controls if num_players == 2 else None)
-            game = Game(screen, controls)
-        else:
-            # Detect up/down keys
-            if num_players == 2 and keyboard.up:
-                sounds.up.play()
-                num_players = 1
-            elif num_players == 1 and keyboard.down:
-                sounds.down.play()
-                num_players = 2
-
-            # Update the 'attract mode' game in the background (two AIs playing each other)
-            game.update()
-
-    elif state == State.PLAY:
-        # Has anyone won?
-        if max(game.bats[0].score, game.bats[1].score) > 9:
-            state = State.GAME_OVER
-        else:
-            game.update()
-
-    elif state == State.GAME_OVER:
-        if space_pressed:
-            # Reset to menu state
-            state = State.MENU
-            num_players = 1
-
-            # Create a new Game object, without any players
-            game = Game()
-
-def draw():
-    game.draw()
-
-    if state == State.MENU:
-        menu_image = "menu" + str(num_players - 1)
-        screen.blit(menu_image, (0,0))
-
-    elif state == State.GAME_OVER:
-        screen.blit("over", (0,0))
-
+# Pygame Zero calls the update and draw functions each frame, passing update the time since the previous frame
+def update(dt):
 
-# The mixer allows us to play sounds and music
-try:
+    if profiler:
+        profiler.begin_frame()
 
-    pygame.mixer.quit()
-    pygame.mixer.init(44100, -16, 2, 1024)
+    # Put any images which have finished loading in the background into use - see src/assets.py
+    assets.poll()
 
-    music.play("theme")
-    music.set_volume(0.3)
+    # Give the session the screen on first run, as it doesn't exist until Pygame Zero has started
+    if session.screen is None:
+        session.attach(screen)
 
-except:
-    # If an error occurs (e.g. no sound device), just ignore it
-    pass
+    # The game is updated a fixed number of times per second, however often frames are drawn, so this frame may
+    # need several updates or none at all - see src/timestep.py. The menu, matches and game over screen are
+    # handled by the session - see src/session.py
+    steps = timestep.advance(dt)
+    now = key_events.clock()
+    for step in range(steps):
+        # Each update is given the key events up to the time it stands for, and the last one everything received so
+        # far - see src/inputs.py
+        until = now - timestep.accumulator - (steps - 1 - step) * timestep.step if step < steps - 1 else None
+        session.tick(key_events.tick(until))
 
+        # Send every update of a match or attract mode game to the spectators - arena games have too many balls to
+        # fit the broadcast state, so aren't sent
+        if broadcaster and isinstance(session.game, Game):
+            broadcaster.publish_threadsafe(pack_state(session.game))
 
-# Set the initial game state at the main menu
-state = State.MENU
+    # Play the sounds requested by the updates, each one once
+    audio.dispatch()
 
-# Create a new Game object, without any players - don't pass screen yet
-game = Game()
-
-# The initial number of players is set to 1
-num_players = 1
-
-# The space key is not pressed at the start of the game
-space_down = False
+def draw():
+    global renderer
+
+    game = session.game
+
+    # Work out which full-screen image, if any, goes on top of the game
+    overlay = session.overlay()
+
+    if dirty_rects:
+        # Only redraw and push to the display the parts of the screen which have changed - see src/renderer.py
+        if renderer is None:
+            renderer = DirtyRectRenderer(screen.surface)
+        if getattr(game, "arena", False):
+            # With hundreds of balls moving, most of the screen changes every frame anyway
+            game.draw(timestep.alpha, overlay)
+            renderer.invalidate()
+            rects = [screen.surface.get_rect()]
+        else:
+            rects = renderer.draw(game, overlay, timestep.alpha)
+    else:
+        game.draw(timestep.alpha, overlay)
+
+    debug_overlay = False
+    if profiler:
+        if show_profile:
+            profiler.draw(screen)
+            debug_overlay = True
+        profiler.end_frame()
+
+    if show_latency:
+        key_events.draw(screen)
+        debug_overlay = True
+
+    # A debug overlay was drawn over the game, so the next frame must be redrawn in full
+    if debug_overlay and renderer:
+        renderer.invalidate()
+        rects = [screen.surface.get_rect()]
+
+    if dirty_rects:
+        pygame.display.update(rects)
+
+def on_key_down(key):
+    global show_profile, show_latency
+
+    key_events.key_down(key)
+
+    # F3 toggles the profiler overlay, and F4 the input latency overlay
+    if profiler and key == keys.F3:
+        show_profile = not show_profile
+    elif key == keys.F4:
+        show_latency = not show_latency
+
+def on_key_up(key):
+    key_events.key_up(key)
+
+
+def start_audio():
+
+    # The mixer allows us to play sounds and music
+    try:
+
+        pygame.mixer.quit()
+        pygame.mixer.init(44100, -16, 2, 1024)
+
+        music.play("theme")
+        music.set_volume(0.3)
+
+    except:
+        # If an error occurs (e.g. no sound device), just ignore it
+        pass
+
+    # Sounds can't be loaded until the mixer has been set up. The sound effects' channels are then reserved by the
+    # next dispatch, on the main thread
+    assets.load_sounds()
+    audio.mixer_ready()
+
+
+# Resolve every image and sound into direct handles once, rather than looking them up by name every frame - see
+# src/assets.py. To show the menu as soon as possible, only the images on it are loaded before the first frame, and
+# the others are loaded in the background. Setting up the mixer - which can take a while on some sound devices -
+# starting the music and loading the sounds also happen in the background. Setting EAGER_ASSETS=1 loads everything
+# before the first frame instead
+eager_assets = os.environ.get("EAGER_ASSETS") == "1"
+assets = load_assets(lazy=not eager_assets)
+
+# Sound effects are queued during each update and played once per frame, on a few reserved channels, once the mixer
+# has been set up
+audio = SoundDispatcher(assets, wait_for_mixer=True)
+
+if eager_assets:
+    start_audio()
+else:
+    threading.Thread(target=start_audio, name="Audio setup", daemon=True).start()
+
+
+# Runs the updates at a fixed rate, independently of the frame rate
+timestep = FixedTimestep()
+
+# Setting NETPLAY_PEER to the host:port of another copy of the game makes every match a networked two-player match
+# against it. NETPLAY_PLAYER (0 or 1) chooses which bat this copy controls, NETPLAY_PORT the local UDP port, and
+# both copies must use the same NETPLAY_SEED. NETPLAY_LATENCY_MS and NETPLAY_LOSS simulate a poor connection
+netplay = None
+if os.environ.get("NETPLAY_PEER"):
+    peer_host, peer_port = os.environ["NETPLAY_PEER"].rsplit(":", 1)
+    netplay = {
+        "player": int(os.environ.get("NETPLAY_PLAYER", "0")),
+        "seed": int(os.environ.get("NETPLAY_SEED", "0")),
+        "transport": UdpTransport(("0.0.0.0", int(os.environ.get("NETPLAY_PORT", "0"))),
+                                  (peer_host, int(peer_port)),
+                                  latency=float(os.environ.get("NETPLAY_LATENCY_MS", "0")) / 1000,
+                                  loss=float(os.environ.get("NETPLAY_LOSS", "0"))),
+    }
+
+# Setting ARENA_BALLS to a number makes every match, except networked ones, a match with that many balls in play at
+# once, which bounce off each other as well as off the bats and walls - see src/arena.py
+arena_balls = int(os.environ.get("ARENA_BALLS", "0"))
+
+# Setting PROFILE to a file name enables the frame profiler, whose results are written to that file on exit.
+# The overlay showing the frame times can be toggled with F3
+profile_path = os.environ.get("PROFILE")
+profiler = FrameProfiler() if profile_path else None
+show_profile = True
+if profiler:
+    atexit.register(profiler.dump, profile_path)
+
+# Key events are queued with their timestamps and handed to the updates they happened before, and the latency from
+# each one to the update which used it and to the frame which showed it is measured - see src/inputs.py. Setting
+# INPUT_LATENCY to a file name writes the latency histograms to that file on exit. The overlay showing the
+# latencies can be toggled with F4
+key_events = KeyEventQueue()
+show_latency = False
+latency_path = os.environ.get("INPUT_LATENCY")
+if latency_path:
+    atexit.register(key_events.dump, latency_path)
+
+# Setting EVENTS to a file name records the serves, hits, bounces and points of every match to that file, as
+# newline-delimited JSON written on a background thread - see src/events.py
+events_path = os.environ.get("EVENTS")
+event_log = EventLog(events_path) if events_path else None
+if event_log:
+    atexit.register(event_log.close)
+
+# Setting BROADCAST_PORT to a TCP port streams the game to any number of spectators, who can watch with
+# python -m src.broadcast --watch host:port - see src/broadcast.py
+broadcast_port = os.environ.get("BROADCAST_PORT")
+broadcaster = None
+if broadcast_port:
+    broadcaster = BroadcastServer()
+    broadcaster.start_in_thread("0.0.0.0", int(broadcast_port))
+
+# The menu, matches and game over screen, starting at the menu. The screen is only given to it on the first update.
+# Setting REPLAY_DIR saves the replay of every match in that directory
+session = Session(assets=assets, audio=audio, netplay=netplay, arena_balls=arena_balls,
+                  replay_dir=os.environ.get("REPLAY_DIR"))
+session.events = event_log
+session.profiler = profiler
+
+# Setting DIRTY_RECTS=1 redraws only the changed parts of the screen each frame, which helps on slow hardware where
+# full-screen blits take most of the frame time
+dirty_rects = os.environ.get("DIRTY_RECTS") == "1"
+renderer = None
+if dirty_rects:
+    # draw() pushes the changed regions to the display itself, so the full-screen flip which Pygame Zero does after
+    # every draw is not needed
+    pygame.display.flip = lambda: None
+
+# Record when each frame has been pushed to the display, for the input-to-present latencies
+display_flip = pygame.display.flip
+
+def flip_and_record():
+    display_flip()
+    key_events.presented()
+
+pygame.display.flip = flip_and_record
 
 # Start Pygame Zero
 pgzrun.go()
@@ -0,0 +1,128 @@
+# Local application constants
+from src.constants import (HALF_HEIGHT_PX,
+                           HALF_WIDTH_PX,
+                           MAX_AI_SPEED)
+
+# The ball can bounce off a bat when its centre is this far from the centre of the screen, and off the top or bottom
+# of the arena when it is this far from the middle - see Ball.update_stepped
+BAT_PLANE_DISTANCE = 344
+WALL_DISTANCE = 220
+
+
+def predict_intercept(x, y, dx, dy, plane_x):
+    """
+    Works out where a ball will be on the Y axis when it reaches a given position on the X axis.
+
+    Instead of simulating the bounces off the top and bottom of the arena, the arena is 'unfolded': each bounce
+    mirrors the rest of the trajectory, so the ball can be treated as carrying on in a straight line through
+    mirrored copies of the arena, stacked on top of each other. The straight line's position is then folded back
+    into the real arena. This is exact for perfect reflections - the ball's bounces are within a pixel of them.
+
+    Args:
+        x, y (float): The position of the ball.
+        dx, dy (float): The direction of the ball. dx must not be zero.
+        plane_x (float): The position on the X axis to predict the ball's arrival at.
+
+    Returns:
+        float: The position of the ball on the Y axis when it reaches plane_x.
+    """
+    top = HALF_HEIGHT_PX - WALL_DISTANCE
+    height = 2 * WALL_DISTANCE
+
+    # Position along the unfolded straight line, relative to the top of the arena. Each copy of the arena together
+    # with its mirror image is twice the arena's height, and repeats indefinitely
+    unfolded = y + dy * (plane_x - x) / dx - top
+    unfolded %= 2 * height
+
+    # In the mirrored half of the period, the ball travels the other way
+    if unfolded > height:
+        unfolded = 2 * height - unfolded
+    return top + unfolded
+
+
+class PredictiveAI:
+    """
+    Computer player which works out where the ball will reach its bat, rather than following the ball.
+
+    The prediction is only made when the ball's direction changes - when it is served, hit by a bat or bounces off
+    a wall - and cached until the next change, so on other frames the AI only has to notice that nothing has
+    changed and move towards the cached target. While the ball is heading away, the AI returns towards the centre
+    of the screen.
+
+    The AI can be made easier to beat in two ways. With a reaction delay, it keeps heading for its previous target
+    for a number of frames after the ball changes direction. With error injection, each prediction is off by a
+    random amount of up to a given number of pixels, drawn from the game's random number generator so that seeded
+    games stay reproducible.
+
+    Instances are drop-in replacements for a bat's move_func:
+
+        game.bats[1].move_func = PredictiveAI(game.bats[1], reaction_frames=10, error=20)
+
+    Attributes:
+        bat (Bat): The bat being controlled.
+        reaction_frames (int): The number of frames it takes to react to a change of direction of the ball.
+        error (float): The maximum error of each prediction, in pixels.
+        target_y (float): The position on the Y axis the bat is currently heading for.
+    """
+
+    def __init__(self, bat, reaction_frames=0, error=0):
+        """
+        Initializes the AI.
+
+        Args:
+            bat (Bat): The bat to control.
+            reaction_frames (int, optional): Reaction delay in frames. Defaults to reacting immediately.
+            error (float, optional): Maximum prediction error in pixels. Defaults to perfect predictions.
+        """
+        self.bat = bat
+        self.reaction_frames = reaction_frames
+        self.error = error
+        self.target_y = HALF_HEIGHT_PX
+
+        # The ball's motion the last time a prediction was made. Balls are replaced when a point is scored, so the
+        # ball itself is part of the key
+        self._ball = None
+        self._dx = None
+        self._dy = None
+
+        # A prediction which the AI has not reacted to yet, and the number of frames until it does
+        self._pending_y = None
+        self._countdown = 0
+
+        # The bat can reach the ball when its centre crosses this position on the X axis
+        side = -1 if bat.player == 0 else 1
+        self._plane_x = HALF_WIDTH_PX + side * BAT_PLANE_DISTANCE
+        self._side = side
+
+    def __call__(self):
+        ball = self.bat.game.ball
+
+        # Only predict again if the ball's direction has changed since the last prediction
+        if ball is not self._ball or ball.dx != self._dx or ball.dy != self._dy:
+            self._ball = ball
+            self._dx = ball.dx
+            self._dy = ball.dy
+            self._pending_y = self._predict(ball)
+            self._countdown = self.reaction_frames
+
+        if self._pending_y is not None:
+            if self._countdown > 0:
+                self._countdown -= 1
+            else:
+                self.target_y = self._pending_y
+                self._pending_y = None
+
+        # Move towards the target, no faster than MAX_AI_SPEED each frame
+        return min(MAX_AI_SPEED, max(-MAX_AI_SPEED, self.target_y - self.bat.y))
+
+    def _predict(self, ball):
+        # Returns the position on the Y axis to head for, given the ball's current motion
+
+        # If the ball is heading away, or has already passed the bat, wait in the centre of the screen
+        if ball.dx * self._side <= 0 or (ball.x - self._plane_x) * self._side > 0:
+            return HALF_HEIGHT_PX
+
+        target_y = predict_intercept(ball.x, ball.y, ball.dx, ball.dy, self._plane_x)
+        if self.error:
+            target_y += self.bat.game.rng.uniform(-self.error, self.error)
+        return target_y
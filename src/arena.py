@@ -0,0 +1,517 @@
+# Standard library imports
+from itertools import repeat
+
+# Third party imports
+import numpy as np
+
+# Local application imports
+from src.bat import Bat
+from src.impact import ImpactPool
+from src.profiler import PHASE_BATS, PHASE_BALL, PHASE_IMPACTS, PHASE_SCORING, PHASE_DRAW_BACKGROUND
+
+# Local application constants
+from src.constants import (ARENA_BALL_RADIUS,
+                           ARENA_IMPACT_POOL_CAPACITY,
+                           ARENA_MAX_BALL_SPEED,
+                           ARENA_MIN_DX,
+                           ARENA_RESPAWN_FRAMES,
+                           ARENA_WINNING_SCORE,
+                           ARENA_BALLS_PER_MISS,
+                           HALF_HEIGHT_PX,
+                           HALF_WIDTH_PX,
+                           HEIGHT_PX,
+                           MAX_AI_SPEED,
+                           WIDTH_PX,
+                           SOUND_BOUNCE,
+                           SOUND_BOUNCE_SYNTH,
+                           SOUND_HIT,
+                           SOUND_HIT_SLOW,
+                           SOUND_HIT_MEDIUM,
+                           SOUND_HIT_FAST,
+                           SOUND_HIT_VERYFAST,
+                           SOUND_SCORE_GOAL)
+
+# The grid used to find the balls which might be touching has square cells as wide as a ball, so a ball can only
+# touch the balls in its own cell and the 8 cells around it
+GRID_CELL_PX = 2 * ARENA_BALL_RADIUS
+GRID_COLUMNS = -(-WIDTH_PX // GRID_CELL_PX)
+GRID_ROWS = -(-HEIGHT_PX // GRID_CELL_PX)
+
+# Each pair of neighbouring cells only needs checking once, so a cell is only paired with itself and the 4 of its
+# neighbours which come after it in row-major order - to its right, and below left, below and below right
+_NEIGHBOUR_X = np.array([1, -1, 0, 1])[:, None]
+_NEIGHBOUR_Y = np.array([0, 1, 1, 1])[:, None]
+
+
+def _directions(vx, vy):
+    # Returns the unit vectors pointing along the given vectors, with the horizontal component kept at least
+    # ARENA_MIN_DX either way. A zero vector becomes a horizontal one
+    length = np.hypot(vx, vy)
+    length[length == 0] = 1
+    dx = vx / length
+    dx = np.where(np.abs(dx) < ARENA_MIN_DX, np.where(dx < 0, -ARENA_MIN_DX, ARENA_MIN_DX), dx)
+    dy = np.copysign(np.sqrt(1 - dx * dx), vy)
+    return dx, dy
+
+
+class ArenaGame:
+    """
+    A match with many balls in play at once, which bounce off each other as well as off the bats and walls.
+
+    Game follows a single Ball object, whose update moves it one pixel at a time. With hundreds of balls that would
+    take far longer than a frame, so the arena holds the state of every ball in struct-of-arrays NumPy buffers, as
+    BatchGame does for many matches, and moves them all with a handful of array operations per frame. Each ball
+    moves its whole distance for the frame at once: a ball which crosses the line on which it can bounce off a bat
+    is checked against the bat at the point where it crossed, and a ball which goes past a wall is reflected back
+    off it.
+
+    Collisions between balls go through a broad phase, which finds the pairs of balls which might be touching, and a
+    narrow phase, which checks and resolves them. The default broad phase sorts the balls into a uniform grid of
+    cells as wide as a ball, and only pairs each ball with those in its own and neighbouring cells, so the number of
+    pairs checked grows with the number of balls rather than with its square. The 'brute' broad phase pairs every
+    ball with every other, and is there to compare against. Touching balls which are moving towards each other
+    exchange the components of their velocities along the line between their centres, as balls of equal mass do,
+    then keep their own speeds in their new directions, and are pushed apart so that they no longer overlap.
+
+    Every ball which goes off the left or right edge counts towards a point for the other player, and is served again
+    from the centre of the arena ARENA_RESPAWN_FRAMES later. A point takes one missed ball for every
+    ARENA_BALLS_PER_MISS balls in the arena, so that the match lasts about as long whatever the number of balls, and
+    scoring stops at ARENA_WINNING_SCORE, which ends the match. Unlike in Game, serves go either way at random: with
+    many balls in play, serving each one towards the player who missed it would keep sending more balls to whoever is
+    losing. AI bats track the ball which will reach them first. The bats are Bat objects, so they are drawn by the same
+    adapters as Game's, but they are moved by the arena rather than by Bat.update, which only knows about a single ball.
+    Matches in the arena are not recorded in replays or event logs, and there are no 'just scored' effects, which
+    would cover the screen most of the time.
+
+    Attributes:
+        num_balls (int): The number of balls.
+        misses_per_point (int): The number of balls a player must miss for the other player to score a point.
+        broad_phase (str): 'grid' or 'brute' - see above.
+        bats (list): The two Bat objects.
+        impacts (ImpactPool): The impact effects.
+        x, y, dx, dy (numpy.ndarray): Position and direction of each ball.
+        speed (numpy.ndarray): Speed of each ball, in pixels per frame.
+        in_play (numpy.ndarray): Mask of the balls in play, as opposed to waiting to be served.
+        respawn (numpy.ndarray): For balls which are not in play, the number of frames until they are served.
+        collisions (int): The number of collisions between balls so far.
+        frame (int): The number of frames simulated.
+    """
+
+    # Tells code which handles both kinds of game, such as main.py, that this is an arena, without it having to
+    # import this module, and so NumPy
+    arena = True
+
+    def __init__(self, screen=None, controls=(None, None), num_balls=200, seed=None, broad_phase="grid"):
+        """
+        Initializes the arena, with every ball in play at a random position in the middle of the arena, heading in a
+        random direction.
+
+        Args:
+            screen (Screen, optional): The screen to draw on.
+            controls (tuple, optional): The control functions for the two players, or None for AI players.
+            num_balls (int, optional): The number of balls.
+            seed (int, optional): Seed for the random generator used for serves and AI offsets.
+            broad_phase (str, optional): 'grid' or 'brute'.
+        """
+        if broad_phase not in ("grid", "brute"):
+            raise ValueError(f"Unknown broad phase {broad_phase!r}")
+
+        self.num_balls = num_balls
+        self.misses_per_point = max(1, num_balls // ARENA_BALLS_PER_MISS)
+        self.broad_phase = broad_phase
+        self.rng = np.random.default_rng(seed)
+
+        self.bats = [Bat(0, self, controls[0]), Bat(1, self, controls[1])]
+        self.impacts = ImpactPool(ARENA_IMPACT_POOL_CAPACITY)
+        self.ai_offset = 0
+
+        self.x = self.rng.uniform(HALF_WIDTH_PX - 200, HALF_WIDTH_PX + 200, num_balls)
+        self.y = self.rng.uniform(HALF_HEIGHT_PX - 200, HALF_HEIGHT_PX + 200, num_balls)
+        self.dx = np.empty(num_balls)
+        self.dy = np.empty(num_balls)
+        self.speed = np.full(num_balls, 5, dtype=np.int64)
+        self.in_play = np.ones(num_balls, dtype=bool)
+        self.respawn = np.zeros(num_balls, dtype=np.int64)
+        self._set_directions(np.arange(num_balls), self.rng.choice((-1.0, 1.0), num_balls))
+
+        # Whether each player's bat last missed a ball, rather than hit one - see _update_bats
+        self._missed = [False, False]
+
+        # The number of balls each player has missed
+        self._misses = [0, 0]
+
+        self.collisions = 0
+        self.frame = 0
+
+        # As for Game - see Game.__init__
+        self.screen = screen
+        self.assets = None
+        self.sprites = None
+        self.audio = None
+        self.profiler = None
+        self.events = None
+
+        # The positions of the balls and bats before the most recent update - see sprite_positions
+        self.previous = None
+
+    @property
+    def finished(self):
+        """
+        bool: Whether one of the players has won.
+        """
+        return max(self.bats[0].score, self.bats[1].score) >= ARENA_WINNING_SCORE
+
+    def is_out(self):
+        """
+        Checks which balls have gone off the left or right edge of the screen.
+
+        Returns:
+            numpy.ndarray: Mask of the balls in play which are out of bounds.
+        """
+        return self.in_play & ((self.x < 0) | (self.x > WIDTH_PX))
+
+    def update(self):
+        profiler = self.profiler
+        if profiler:
+            start = profiler.clock()
+
+        self.previous = (self.x.copy(), self.y.copy(), self.in_play.copy(), self.bats[0].y, self.bats[1].y)
+
+        # Bats, balls, impact effects and scoring, in the same order as Game.update
+        self._update_bats()
+
+        if profiler:
+            start = profiler.add(PHASE_BATS, start)
+
+        self._move_balls()
+        self._collide_balls()
+
+        if profiler:
+            start = profiler.add(PHASE_BALL, start)
+
+        self.impacts.update()
+
+        if profiler:
+            start = profiler.add(PHASE_IMPACTS, start)
+
+        self._update_scores()
+        self.frame += 1
+
+        if profiler:
+            profiler.add(PHASE_SCORING, start)
+
+    def _set_directions(self, balls, dx):
+        # Points the given balls horizontally in the given directions, deflected up or down by a random amount
+        self.dx[balls], self.dy[balls] = _directions(dx, self.rng.uniform(-0.5, 0.5, len(balls)))
+
+    def _update_bats(self):
+        for bat in self.bats:
+            bat.timer -= 1
+
+            y_movement = self._ai(bat) if bat.move_func == bat.ai else bat.move_func()
+            bat.y = min(400, max(80, bat.y + y_movement))
+
+            # Frame 1 when the bat has just hit a ball, and 2 when it has just missed one - see Bat.update
+            frame = 0
+            if bat.timer > 0:
+                frame = 2 if self._missed[bat.player] else 1
+            bat.frame = frame
+
+    def _ai(self, bat):
+        # Bat.ai, aiming for the ball which will reach the bat soonest - that is, of the balls heading towards it,
+        # the one with the least time to go at its current speed. If there is none, the bat heads for the centre
+        x_distance = np.abs(self.x - bat.x)
+        approaching = self.in_play & (self.dx * (bat.x - self.x) > 0)
+        if not approaching.any():
+            return min(MAX_AI_SPEED, max(-MAX_AI_SPEED, HALF_HEIGHT_PX - bat.y))
+
+        time = np.where(approaching, x_distance / (self.speed * np.abs(self.dx)), np.inf)
+        ball = time.argmin()
+
+        weight1 = min(1, x_distance[ball] / HALF_WIDTH_PX)
+        weight2 = 1 - weight1
+        target_y = (weight1 * HALF_HEIGHT_PX) + (weight2 * (self.y[ball] + self.ai_offset))
+        return min(MAX_AI_SPEED, max(-MAX_AI_SPEED, target_y - bat.y))
+
+    def _move_balls(self):
+        x, y, dx, dy, speed = self.x, self.y, self.dx, self.dy, self.speed
+        moving = self.in_play
+        old_x = x.copy()
+        old_y = y.copy()
+
+        np.add(x, dx * speed, out=x, where=moving)
+        np.add(y, dy * speed, out=y, where=moving)
+
+        # Which balls crossed the 344 pixel threshold at which they can bounce off a bat this frame? See
+        # Ball.update for where this number comes from
+        crossed = np.flatnonzero(moving & (np.abs(x - HALF_WIDTH_PX) >= 344) & (np.abs(old_x - HALF_WIDTH_PX) < 344))
+        if crossed.size:
+            player = (x[crossed] > HALF_WIDTH_PX).astype(np.int64)
+            edge = np.where(player, HALF_WIDTH_PX + 344, HALF_WIDTH_PX - 344)
+
+            # Where on the Y axis was each ball when it crossed?
+            t = (edge - old_x[crossed]) / (x[crossed] - old_x[crossed])
+            cross_y = old_y[crossed] + t * (y[crossed] - old_y[crossed])
+
+            bat_y = np.array([self.bats[0].y, self.bats[1].y])[player]
+            difference_y = cross_y - bat_y
+            hit = np.abs(difference_y) < 64
+
+            if hit.any():
+                balls = crossed[hit]
+                player = player[hit]
+                edge = edge[hit]
+
+                # Bounce, deflect and normalize as in Ball._hit_bat. The rest of the frame's movement is reflected
+                # back off the bat
+                dx[balls], dy[balls] = _directions(-dx[balls], np.clip(dy[balls] + difference_y[hit] / 128, -1, 1))
+                x[balls] = 2 * edge - x[balls]
+                speed[balls] = np.minimum(speed[balls] + 1, ARENA_MAX_BALL_SPEED)
+
+                for impact_x, impact_y in zip((edge + np.where(player, 10, -10)).tolist(), cross_y[hit].tolist()):
+                    self.impacts.add(impact_x, impact_y)
+
+                for p in np.unique(player).tolist():
+                    self.bats[p].timer = 10
+                    self._missed[p] = False
+                self.ai_offset = int(self.rng.integers(-10, 11))
+
+                # Hit sounds, chosen by the fastest of the balls which were hit
+                fastest = speed[balls].max()
+                self.play_sound(SOUND_HIT)
+                if fastest <= 10:
+                    self.play_sound(SOUND_HIT_SLOW)
+                elif fastest <= 12:
+                    self.play_sound(SOUND_HIT_MEDIUM)
+                elif fastest <= 16:
+                    self.play_sound(SOUND_HIT_FAST)
+                else:
+                    self.play_sound(SOUND_HIT_VERYFAST)
+
+        # The top and bottom of the arena are 220 pixels from the centre. Reflect any ball beyond them back off
+        # the wall
+        bounced = np.flatnonzero(moving & (np.abs(y - HALF_HEIGHT_PX) > 220))
+        if bounced.size:
+            edge = np.where(y[bounced] < HALF_HEIGHT_PX, HALF_HEIGHT_PX - 220, HALF_HEIGHT_PX + 220)
+            y[bounced] = 2 * edge - y[bounced]
+            dy[bounced] = -dy[bounced]
+
+            for impact_x, impact_y in zip(x[bounced].tolist(), y[bounced].tolist()):
+                self.impacts.add(impact_x, impact_y)
+
+            self.play_sound(SOUND_BOUNCE)
+            self.play_sound(SOUND_BOUNCE_SYNTH)
+
+    def candidate_pairs(self):
+        """
+        Finds the pairs of balls in play which might be touching, using the broad phase chosen for the arena.
+
+        Returns:
+            tuple: Two arrays of ball indices - the first and second ball of each pair. Each pair appears once.
+        """
+        live = np.flatnonzero(self.in_play)
+        if self.broad_phase == "brute":
+            first, second = np.triu_indices(live.size, 1)
+            return live[first], live[second]
+
+        # Sort the balls by the grid cell they are in, and work out where each cell's balls start in sorted order
+        column = np.clip((self.x[live] // GRID_CELL_PX).astype(np.int64), 0, GRID_COLUMNS - 1)
+        row = np.clip((self.y[live] // GRID_CELL_PX).astype(np.int64), 0, GRID_ROWS - 1)
+        cell = row * GRID_COLUMNS + column
+        order = np.argsort(cell, kind="stable")
+        cell = cell[order]
+        column = column[order]
+        row = row[order]
+        cell_start = np.zeros(GRID_COLUMNS * GRID_ROWS + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cell, minlength=GRID_COLUMNS * GRID_ROWS), out=cell_start[1:])
+
+        # Pair each ball with the balls after it in its own cell, and with every ball in the neighbouring cells
+        # which come after its own. Each of these is a range of positions in sorted order
+        position = np.arange(live.size)
+        neighbour_column = column + _NEIGHBOUR_X
+        neighbour_row = row + _NEIGHBOUR_Y
+        valid = (neighbour_column >= 0) & (neighbour_column < GRID_COLUMNS) & (neighbour_row < GRID_ROWS)
+        neighbour = np.where(valid, neighbour_row * GRID_COLUMNS + neighbour_column, 0)
+        starts = np.concatenate((position + 1, cell_start[neighbour].ravel()))
+        ends = np.concatenate((cell_start[cell + 1], np.where(valid, cell_start[neighbour + 1], 0).ravel()))
+        counts = np.maximum(ends - starts, 0)
+
+        # Expand the ranges into one entry per pair
+        first = np.repeat(np.tile(position, 5), counts)
+        second = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        return live[order[first]], live[order[second]]
+
+    def _collide_balls(self):
+        first, second = self.candidate_pairs()
+
+        # Narrow phase - keep the pairs which overlap
+        offset_x = self.x[first] - self.x[second]
+        offset_y = self.y[first] - self.y[second]
+        distance = np.hypot(offset_x, offset_y)
+        touching = (distance < 2 * ARENA_BALL_RADIUS) & (distance > 0)
+        if not touching.any():
+            return
+
+        first, second, distance = first[touching], second[touching], distance[touching]
+        normal_x = offset_x[touching] / distance
+        normal_y = offset_y[touching] / distance
+
+        # Push overlapping balls apart along the line between their centres, half the overlap each. Balls in more
+        # than one pair get the sum of their pushes
+        push = (2 * ARENA_BALL_RADIUS - distance) / 2
+        np.add.at(self.x, first, push * normal_x)
+        np.add.at(self.y, first, push * normal_y)
+        np.subtract.at(self.x, second, push * normal_x)
+        np.subtract.at(self.y, second, push * normal_y)
+        moved = np.concatenate((first, second))
+        self.y[moved] = np.clip(self.y[moved], HALF_HEIGHT_PX - 220, HALF_HEIGHT_PX + 220)
+
+        # Only balls moving towards each other bounce - balls which are already separating are left to do so
+        speed_1 = self.speed[first]
+        speed_2 = self.speed[second]
+        closing = ((self.dx[first] * speed_1 - self.dx[second] * speed_2) * normal_x +
+                   (self.dy[first] * speed_1 - self.dy[second] * speed_2) * normal_y)
+        bounce = closing < 0
+        if not bounce.any():
+            return
+        self.collisions += int(bounce.sum())
+
+        # Exchange the components of the velocities along the normal. A ball in more than one pair gets the sum of
+        # its changes of velocity, so the result doesn't depend on the order of the pairs
+        change_x = (closing * normal_x)[bounce]
+        change_y = (closing * normal_y)[bounce]
+        balls, index = np.unique(np.concatenate((first[bounce], second[bounce])), return_inverse=True)
+        new_vx = self.dx[balls] * self.speed[balls]
+        new_vy = self.dy[balls] * self.speed[balls]
+        np.add.at(new_vx, index, np.concatenate((-change_x, change_x)))
+        np.add.at(new_vy, index, np.concatenate((-change_y, change_y)))
+
+        self.dx[balls], self.dy[balls] = _directions(new_vx, new_vy)
+
+    def _update_scores(self):
+        out = np.flatnonzero(self.is_out())
+        if out.size:
+            # Each ball which went out counts towards a point for the other player, and waits to be served again.
+            # Several balls can go out on the same frame, so the score is capped at the winning score
+            losing_player = (self.x[out] < HALF_WIDTH_PX).astype(np.int64) ^ 1
+            for p in np.unique(losing_player).tolist():
+                self._misses[p] += int((losing_player == p).sum())
+                self.bats[1 - p].score = min(ARENA_WINNING_SCORE, self._misses[p] // self.misses_per_point)
+                self.bats[p].timer = 20
+                self._missed[p] = True
+
+            self.in_play[out] = False
+            self.respawn[out] = ARENA_RESPAWN_FRAMES
+
+            self.play_sound(SOUND_SCORE_GOAL)
+
+        waiting = ~self.in_play
+        if waiting.any():
+            self.respawn[waiting] -= 1
+            serve = np.flatnonzero(waiting & (self.respawn <= 0))
+            if serve.size:
+                self.x[serve] = HALF_WIDTH_PX
+                self.y[serve] = HALF_HEIGHT_PX + self.rng.uniform(-100, 100, serve.size)
+                self.speed[serve] = 5
+                self.in_play[serve] = True
+                self._set_directions(serve, self.rng.choice((-1.0, 1.0), serve.size))
+
+    def draw(self, alpha=1.0, overlay=None):
+        """
+        Draws the arena, in the same way as Game.draw.
+
+        Args:
+            alpha (float, optional): How far between their positions before and after the most recent update to
+                draw the bats and balls - see sprite_positions.
+            overlay (pygame.Surface, optional): A full-screen image to draw on top of everything.
+        """
+        if not self.screen:
+            return
+
+        profiler = self.profiler
+        if profiler:
+            start = profiler.clock()
+
+        assets = self.get_assets()
+        sprites = self.get_sprites()
+
+        bat_positions, (ball_x, ball_y) = self.sprite_positions(alpha)
+        layers = [sprites.bat.place(bat, pos) for bat, pos in zip(self.bats, bat_positions)]
+
+        # Every ball has the same sprite, so their positions are worked out together rather than with BallSprite
+        image = assets.ball
+        layers.extend(zip(repeat(image), zip((ball_x - image.get_width() / 2).tolist(),
+                                             (ball_y - image.get_height() / 2).tolist())))
+
+        layers.extend(sprites.impact.place(impact) for impact in self.impacts)
+        digits = assets.digits
+        layers.extend((digits[colour][digit], pos) for colour, digit, pos in self.score_digits())
+
+        sprites.static.draw(self.screen.surface, (), overlay, layers)
+
+        if profiler:
+            profiler.add(PHASE_DRAW_BACKGROUND, start)
+
+    def get_assets(self):
+        """
+        Returns the asset registry, loading it on first use - see Game.get_assets.
+        """
+        if self.assets is None:
+            # Pygame imports
+            from src.assets import load_assets
+            self.assets = load_assets()
+        return self.assets
+
+    def get_sprites(self):
+        """
+        Returns the adapters used to draw the bats and impacts, creating them on first use - see Game.get_sprites.
+        """
+        if self.sprites is None:
+            # Local application imports
+            from src.sprites import Sprites
+            self.sprites = Sprites(self.get_assets())
+        return self.sprites
+
+    def sprite_positions(self, alpha=1.0):
+        """
+        Works out where to draw the bats and balls - see Game.sprite_positions.
+
+        Returns:
+            tuple: (bat_positions, ball_positions) - the (x, y) positions of the two bats, and two arrays giving the
+            X and Y positions of the balls in play.
+        """
+        bat_positions = [(bat.x, bat.y) for bat in self.bats]
+        x, y = self.x, self.y
+
+        if alpha < 1 and self.previous:
+            previous_x, previous_y, previous_in_play, *bat_ys = self.previous
+            bat_positions = [(bat.x, bat_y + (bat.y - bat_y) * alpha) for bat, bat_y in zip(self.bats, bat_ys)]
+
+            # Balls which were served by the most recent update have no previous position
+            moved = previous_in_play & self.in_play
+            x = np.where(moved, previous_x + (x - previous_x) * alpha, x)
+            y = np.where(moved, previous_y + (y - previous_y) * alpha, y)
+
+        return bat_positions, (x[self.in_play], y[self.in_play])
+
+    def score_digits(self):
+        """
+        Lists the score digits to draw - see Game.score_digits. A player's score is highlighted while the other
+        player's bat shows that it has just missed a ball.
+        """
+        digits = []
+        for p in (0, 1):
+            tens, units = divmod(self.bats[p].score, 10)
+
+            colour = 0
+            if self.bats[1 - p].frame == 2:
+                colour = 2 if p == 0 else 1
+            digits.append((colour, tens, (255 + (160 * p), 46)))
+            digits.append((colour, units, (255 + (160 * p) + 55, 46)))
+
+        return digits
+
+    def play_sound(self, sound_id):
+        # As Game.play_sound - sounds are only played in matches with a human player, and never when headless
+        if self.audio is not None and self.bats[0].move_func != self.bats[0].ai:
+            self.audio.request(sound_id)
@@ -0,0 +1,208 @@
+# Standard library imports
+import os
+import re
+import threading
+
+# Pygame imports
+import pygame
+from pgzero import loaders
+
+# Local application imports
+from src.atlas import pack_atlas
+
+# Local application constants
+from src.constants import IMPACT_LIFETIME, SOUND_NAMES
+
+# The images needed to draw the first frame - the menu over the attract mode game - including the menu with two
+# players chosen, which Down switches to straight away. When assets are loaded lazily, only these are loaded before
+# the first frame
+FIRST_FRAME_IMAGES = re.compile(r"table|ball|blank|bat\d\d|digit\d\d|menu\d")
+
+# The sprites, which are packed into a single atlas surface - see pack_atlas
+ATLAS_IMAGES = re.compile(r"ball|blank|bat\d\d|digit\d\d|impact\d")
+
+
+class Assets:
+    """
+    Registry of every image and sound used by the game, resolved once into direct Surface and Sound handles.
+
+    Pygame Zero lets you write things like 'screen.blit("digit05", pos)' or 'sounds.hit3.play()', which looks the
+    resource up by name every time. Building those names each frame - "bat" + str(player) + str(frame) and so on -
+    allocates strings and goes through the loaders' caches on every draw. Instead, the registry loads everything up
+    front and arranges the handles in nested lists indexed by small integers, so that choosing a sprite or a sound
+    on the hot path is just list indexing. Once every image has been loaded, the sprites are packed into a single
+    atlas surface, and their handles become views of the atlas - see src/atlas.py.
+
+    To get the first frame on screen sooner, the registry can instead be loaded lazily. Only the images matching
+    FIRST_FRAME_IMAGES are loaded straight away, and the rest are decoded on a background thread. Until poll sees
+    that they are ready and converts them for fast blitting - which has to happen on the main thread - the blank
+    image stands in for them. None of them are seen within the first second or so of the game. Sounds are not loaded
+    in lazy mode until load_sounds is called, which can be done from any thread. The lists of handles are updated
+    in place, so references to them stay valid.
+
+    Attributes:
+        images (dict): Every image in images/ loaded so far, by name.
+        atlas (pygame.Surface): The surface holding the sprites, or None until every image has been loaded.
+        table (pygame.Surface): The background.
+        ball (pygame.Surface): The ball sprite.
+        blank (pygame.Surface): A transparent 1x1 sprite.
+        over (pygame.Surface): The game over screen.
+        bats (list): Bat sprites indexed by [player][frame] - see Bat.frame.
+        effects (list): The full-screen 'just scored' effects, indexed by the player who conceded the point.
+        digits (list): Score digit sprites indexed by [colour][digit], where the colour is 0 for grey, 1 for blue and
+            2 for green.
+        menus (list): The menu screens, indexed by the number of players minus one.
+        impacts (list): Impact sprites indexed by the impact's time - see ImpactPool.
+        sounds (list): For each SOUND_ constant, the list of its variants as pygame.mixer.Sound objects. The lists
+            are empty if the mixer could not be initialized, or the sounds haven't been loaded yet.
+        generation (int): Goes up whenever the handles are set up again, e.g. when poll puts the images loaded in
+            the background into use, so that anything built from the previous images can tell it is out of date.
+    """
+
+    def __init__(self, lazy=False):
+        """
+        Loads the images and sounds. The Pygame Zero resource root must have been set, which importing pgzrun does.
+
+        Args:
+            lazy (bool, optional): Only load the images needed for the first frame, and start decoding the others
+                in the background. Defaults to loading everything before returning.
+        """
+        files = _resource_files("images")
+        self.images = {}
+        self.atlas = None
+        self.sounds = [[] for _ in SOUND_NAMES]
+
+        # Images decoded by the background thread, as (name, surface) tuples, and the thread itself
+        self._decoded = []
+        self._loader = None
+        self.generation = 0
+
+        if lazy:
+            self.images = {name: loaders.images.load(name) for name in files if FIRST_FRAME_IMAGES.fullmatch(name)}
+            remaining = [files[name] for name in files if name not in self.images]
+            self._loader = threading.Thread(target=self._decode, args=(remaining,), name="Asset loader",
+                                            daemon=True)
+            self._loader.start()
+        else:
+            self.images = {name: loaders.images.load(name) for name in files}
+
+        self._arrange()
+
+        if not lazy:
+            self.load_sounds()
+
+    def _arrange(self):
+        # Sets up the handles from the images loaded so far, using the blank image for those which aren't. Lists
+        # are filled in place, as the sprites keep references to them - see src/sprites.py
+        if self._loader is None and self.atlas is None:
+            names = [name for name in self.images if ATLAS_IMAGES.fullmatch(name)]
+            self.atlas, views = pack_atlas([self.images[name] for name in names])
+            self.images.update(zip(names, views))
+
+        self.generation += 1
+        blank = self.images["blank"]
+
+        def image(name):
+            return self.images.get(name, blank)
+
+        self.table = image("table")
+        self.ball = image("ball")
+        self.blank = blank
+        self.over = image("over")
+
+        # Impact sprites are numbered 0 to 4 and each one is shown for 2 frames. An impact which has not been
+        # updated yet is blank, and impacts are removed once their time reaches IMPACT_LIFETIME
+        lists = {"bats": [[image("bat" + str(player) + str(frame)) for frame in range(3)] for player in (0, 1)],
+                 "effects": [image("effect" + str(player)) for player in (0, 1)],
+                 "digits": [[image("digit" + str(colour) + str(digit)) for digit in range(10)]
+                            for colour in range(3)],
+                 "menus": [image("menu" + str(players - 1)) for players in (1, 2)],
+                 "impacts": [blank] + [image("impact" + str((time - 1) // 2)) for time in range(1, IMPACT_LIFETIME)]}
+        for name, handles in lists.items():
+            if hasattr(self, name):
+                getattr(self, name)[:] = handles
+            else:
+                setattr(self, name, handles)
+
+    def _decode(self, paths):
+        # Runs on the background thread. Decoding the files is the slow part of loading an image, and converting
+        # the result to the display's pixel format is left to poll, on the main thread
+        for path in paths:
+            name = os.path.splitext(os.path.basename(path))[0]
+            self._decoded.append((name, pygame.image.load(path)))
+
+    @property
+    def ready(self):
+        """
+        bool: Whether every image has been loaded and arranged.
+        """
+        return self._loader is None
+
+    def poll(self):
+        """
+        Puts the images decoded in the background into use, once they are all ready. Call this on the main thread,
+        e.g. once per frame - it returns straight away once loading has finished.
+
+        Returns:
+            bool: Whether every image has been loaded.
+        """
+        if self._loader is None:
+            return True
+        if self._loader.is_alive():
+            return False
+
+        self._loader = None
+        for name, surface in self._decoded:
+            self.images[name] = surface.convert_alpha()
+        self._decoded = []
+        self._arrange()
+        return True
+
+    def load_sounds(self):
+        """
+        Loads every sound, if the mixer has been initialized. This can be called from a background thread - each
+        sound becomes available to play as soon as its variants are loaded.
+
+        Sounds belong to the mixer they were loaded with, and playing one after the mixer has been re-initialized
+        crashes, so sounds are always loaded afresh rather than taken from Pygame Zero's cache.
+        """
+        loaders.sounds.cache.clear()
+        for sound_id, name in enumerate(SOUND_NAMES):
+            self.sounds[sound_id][:] = self._load_variants(name)
+
+    @staticmethod
+    def _load_variants(name):
+        # Some sounds have multiple varieties, in files named e.g. hit0.ogg to hit4.ogg - we find them all, so that
+        # the sound dispatcher can pick one at random. Without a working mixer, sounds can't be loaded, and the game
+        # runs silently
+        if not pygame.mixer.get_init():
+            return []
+        pattern = re.compile(re.escape(name) + r"\d*")
+        return [loaders.sounds.load(variant) for variant in _resource_files("sounds") if pattern.fullmatch(variant)]
+
+
+def _resource_files(folder):
+    # Lists the resources in one of Pygame Zero's resource folders, as a dict mapping their names - the file names
+    # without their extensions - to their paths, in sorted order so that numbered variants are in order
+    path = os.path.join(loaders.root, folder)
+    return {os.path.splitext(file)[0]: os.path.join(path, file) for file in sorted(os.listdir(path))
+            if not file.startswith(".")}
+
+
+_assets = None
+
+
+def load_assets(lazy=False):
+    """
+    Returns the shared asset registry, loading it on first use.
+
+    Args:
+        lazy (bool, optional): If the registry hasn't been loaded yet, load it lazily - see Assets.
+
+    Returns:
+        Assets: The registry.
+    """
+    global _assets
+    if _assets is None:
+        _assets = Assets(lazy)
+    return _assets
@@ -0,0 +1,140 @@
+# Pygame imports
+import pygame
+
+# Local application imports
+from src.renderer import merge_rects
+
+# Width of the sprite atlas. Every sprite is much narrower, so they are packed into rows of this width
+ATLAS_WIDTH = 512
+
+
+def pack_atlas(images):
+    """
+    Packs images into a single surface, and returns views of the parts of it holding each image.
+
+    The images are placed in rows - tallest first, so that each row wastes little space - and copied into the atlas
+    pixel for pixel, alpha included. The views returned are subsurfaces, which share the atlas's pixels: drawing one
+    is a blit of a rectangle of the atlas, so they can be used anywhere the original images were, and all the
+    sprites' pixels end up in one block of memory rather than one allocation per image.
+
+    Args:
+        images (list): The pygame.Surface images to pack. Each distinct image is packed once.
+
+    Returns:
+        tuple: (atlas, views) - the atlas surface, and a list giving the view of each image, in the same order.
+    """
+    unique = list({id(image): image for image in images}.values())
+    order = sorted(unique, key=lambda image: (-image.get_height(), -image.get_width()))
+
+    # Work out where each image goes
+    positions = {}
+    x = y = row_height = 0
+    for image in order:
+        width, height = image.get_size()
+        if x + width > ATLAS_WIDTH:
+            x = 0
+            y += row_height
+            row_height = 0
+        positions[id(image)] = (x, y)
+        x += width
+        row_height = max(row_height, height)
+
+    # Alpha blending an image onto the transparent atlas would change its pixels, whereas taking the maximum of
+    # each channel with zero copies them exactly
+    atlas = pygame.Surface((ATLAS_WIDTH, y + row_height), pygame.SRCALPHA).convert_alpha()
+    atlas.fill((0, 0, 0, 0))
+    views = {}
+    for image in unique:
+        pos = positions[id(image)]
+        atlas.blit(image, pos, special_flags=pygame.BLEND_RGBA_MAX)
+        views[id(image)] = atlas.subsurface(pygame.Rect(pos, image.get_size()))
+
+    return atlas, [views[id(image)] for image in images]
+
+
+class StaticLayers:
+    """
+    Draws the layers of the screen which never move - the table, the 'just scored' effects and the menu or game
+    over overlay - from pre-composited copies, together with the sprites and digits which go in between.
+
+    Every combination of full-screen layers is composited once, the first time it is needed, into a surface with
+    no alpha channel, so the whole background is drawn with a single full-screen copy rather than a blit per layer.
+    As the overlay goes on top of the sprites, they can't simply be drawn over a background which already includes
+    it. Instead, the background is drawn with the overlay, and then just the regions covered by sprites are redrawn
+    in order - background without the overlay, sprites, overlay - which gives exactly the same pixels as drawing
+    every layer in full.
+
+    Attributes:
+        assets (Assets): The registry holding the table and effect images.
+    """
+
+    def __init__(self, assets):
+        """
+        Args:
+            assets (Assets): The asset registry - see src/assets.py.
+        """
+        self.assets = assets
+
+        # Composited backgrounds, by the images they are made of, and the assets' generation they were made from.
+        # They are all dropped when the assets' images are replaced, e.g. when the images loaded in the background
+        # replace the placeholders they were composited with
+        self._backgrounds = {}
+        self._generation = assets.generation
+
+    def background(self, effects=(), overlay=None):
+        """
+        Returns the table with the given full-screen layers drawn over it, compositing it on first use.
+
+        Args:
+            effects (tuple): The 'just scored' effect images to draw over the table, in order.
+            overlay (pygame.Surface, optional): A full-screen image to draw on top.
+
+        Returns:
+            pygame.Surface: The composited background.
+        """
+        if self._generation != self.assets.generation:
+            self._backgrounds.clear()
+            self._generation = self.assets.generation
+
+        key = (self.assets.table, effects, overlay)
+        background = self._backgrounds.get(key)
+        if background is None:
+            background = self.assets.table.convert()
+            for image in effects:
+                background.blit(image, (0, 0))
+            if overlay:
+                background.blit(overlay, (0, 0))
+            self._backgrounds[key] = background
+        return background
+
+    def draw(self, surface, effects, overlay, layers, rects=None):
+        """
+        Draws the static layers with the given layers in between them.
+
+        Args:
+            surface (pygame.Surface): The surface to draw on.
+            effects (tuple): The 'just scored' effect images, drawn over the table.
+            overlay (pygame.Surface): The full-screen image drawn on top of everything, or None.
+            layers (list): (image, topleft) pairs to draw between the effects and the overlay, in order.
+            rects (list, optional): Non-overlapping pygame.Rect regions to draw. Defaults to the whole surface.
+        """
+        if rects is None:
+            surface.blit(self.background(effects, overlay), (0, 0))
+            if overlay is None:
+                for image, pos in layers:
+                    surface.blit(image, pos)
+                return
+
+            # Sprite positions can be fractional, so round the rectangles outwards to cover every pixel touched
+            rects = merge_rects([pygame.Rect(int(x) - 1, int(y) - 1, image.get_width() + 2, image.get_height() + 2)
+                                 for image, (x, y) in layers])
+
+        background = self.background(effects)
+        for rect in rects:
+            surface.set_clip(rect)
+            surface.blit(background, rect.topleft, rect)
+            for image, pos in layers:
+                surface.blit(image, pos)
+            if overlay:
+                surface.blit(overlay, rect.topleft, rect)
+        surface.set_clip(None)
@@ -0,0 +1,143 @@
+# Standard library imports
+import random
+
+# Pygame imports
+import pygame
+
+# Local application constants
+from src.constants import SOUND_NAMES, SOUND_GROUPS, SOUND_GROUP_VOICES
+
+
+class SoundDispatcher:
+    """
+    Plays the sound effects requested during a frame, once per frame, on a limited number of mixer channels.
+
+    The simulation requests sounds from deep inside its update - a fast ball can hit a bat and bounce off a wall in
+    the same frame, and each hit asks for two sounds. Rather than starting each sound there and then, request just
+    sets a bit in a mask, so the simulation never waits for the mixer and asking for the same sound twice in a frame
+    only plays it once. dispatch then starts the requested sounds, once per frame.
+
+    Each group of sounds - see SOUND_GROUPS - has its own reserved channels, so sounds of one group never cut off
+    those of another. A sound which is still playing is restarted on the channel it is playing on, rather than
+    being layered over itself. Otherwise it takes an idle channel of its group, or, if every one is busy, the
+    channel which started playing longest ago. Channel.play only hands the sound to SDL's audio thread, which does
+    the mixing, so dispatching never blocks.
+
+    Without a working mixer, requests are accepted and discarded. If the mixer is set up after the dispatcher is
+    created - e.g. on a background thread during startup - the dispatcher should be created with wait_for_mixer,
+    and mixer_ready called once the mixer is ready. Until then requests are discarded without touching the mixer,
+    which may be being shut down and re-initialized. mixer_ready only sets a flag, and the channels are reserved at
+    the next dispatch, so that the mixer's channels are only ever used from the thread which dispatches.
+
+    Attributes:
+        assets (Assets): The registry holding the sounds.
+        rng (random.Random): Generator used to choose between the variants of a sound.
+        dispatched (int): The number of sounds started.
+        merged (int): The number of requests which were merged with an identical request in the same frame.
+    """
+
+    def __init__(self, assets, rng=None, wait_for_mixer=False):
+        """
+        Initializes the dispatcher, reserving the mixer channels used for sound effects if the mixer is ready.
+
+        Args:
+            assets (Assets): The registry holding the sounds.
+            rng (random.Random, optional): Generator used to choose between the variants of a sound. Sound effects
+                use their own generator, so that playing them never changes the course of a game.
+            wait_for_mixer (bool, optional): Leave the mixer alone until mixer_ready is called.
+        """
+        self.assets = assets
+        self.rng = rng or random.Random()
+        self.dispatched = 0
+        self.merged = 0
+
+        # Bit mask of the sounds requested since the last dispatch, with bit n set for sound n
+        self._pending = 0
+
+        # For each group, its channels in the order in which they last started playing, least recent first
+        self._voices = []
+
+        # For each sound, the channel it was last played on
+        self._last_channel = [None] * len(SOUND_NAMES)
+
+        # Set by mixer_ready, possibly on another thread, until the next dispatch reserves the channels again
+        self._mixer_changed = False
+
+        if not wait_for_mixer:
+            self._reserve_channels()
+
+    def _reserve_channels(self):
+        # Sets up the voices of each group, if the mixer has been initialized. Reserved channels are never picked
+        # by Sound.play, which music and any other sounds use
+        if not pygame.mixer.get_init():
+            return
+        total = sum(SOUND_GROUP_VOICES)
+        pygame.mixer.set_num_channels(max(pygame.mixer.get_num_channels(), total))
+        pygame.mixer.set_reserved(total)
+        first = 0
+        for voices in SOUND_GROUP_VOICES:
+            self._voices.append([pygame.mixer.Channel(i) for i in range(first, first + voices)])
+            first += voices
+
+    def mixer_ready(self):
+        """
+        Tells the dispatcher that the mixer has been initialized or re-initialized, and its sounds loaded. This can
+        be called from any thread: it only sets a flag, and the channels are reserved by the next dispatch.
+        """
+        self._mixer_changed = True
+
+    def request(self, sound_id):
+        """
+        Asks for a sound to be played at the next dispatch.
+
+        Args:
+            sound_id (int): One of the SOUND_ constants.
+        """
+        bit = 1 << sound_id
+        if self._pending & bit:
+            self.merged += 1
+        self._pending |= bit
+
+    def dispatch(self):
+        """
+        Starts the sounds requested since the last dispatch. Call this once per frame.
+        """
+        pending = self._pending
+        if not pending:
+            return
+        self._pending = 0
+
+        # Any channels reserved before the mixer was re-initialized are gone
+        if self._mixer_changed:
+            self._mixer_changed = False
+            self._voices = []
+            self._last_channel = [None] * len(SOUND_NAMES)
+            self._reserve_channels()
+        if not self._voices:
+            return
+
+        sound_id = 0
+        while pending:
+            if pending & 1:
+                self._play(sound_id)
+            pending >>= 1
+            sound_id += 1
+
+    def _play(self, sound_id):
+        variants = self.assets.sounds[sound_id]
+        if not variants:
+            return
+        sound = variants[self.rng.randrange(len(variants))]
+        voices = self._voices[SOUND_GROUPS[sound_id]]
+
+        # Restart the sound where it's already playing, so identical samples don't stack up
+        channel = self._last_channel[sound_id]
+        if channel is None or channel.get_sound() not in variants:
+            # Otherwise use an idle voice, or steal the least recently started one
+            channel = next((voice for voice in voices if not voice.get_busy()), voices[0])
+
+        voices.remove(channel)
+        voices.append(channel)
+        channel.play(sound)
+        self._last_channel[sound_id] = channel
+        self.dispatched += 1
@@ -1,23 +1,27 @@
-# Standard library imports
-import random
-
-# Pygame imports
-from pgzero.actor import Actor
-
 # Local application imports
-from src.utilities import normalize_xy_vector
-from src.impact import Impact
+from src.utilities import normalize_xy_vector, repeated_addition_run
+from src.events import EVENT_BAT_HIT, EVENT_WALL_BOUNCE
 
 # Local application constants
 from src.constants import (HALF_WIDTH_PX, 
                            HALF_HEIGHT_PX, 
-                           WIDTH_PX)
+                           SWEPT_COLLISION_MIN_SPEED,
+                           WIDTH_PX,
+                           SOUND_BOUNCE,
+                           SOUND_BOUNCE_SYNTH,
+                           SOUND_HIT,
+                           SOUND_HIT_SLOW,
+                           SOUND_HIT_MEDIUM,
+                           SOUND_HIT_FAST,
+                           SOUND_HIT_VERYFAST)
 
-class Ball(Actor):
-    def __init__(self, dx, game=None):
-        # Call the parent class constructor
-        super().__init__("ball", (0,0))
+class Ball:
 
+    # Balls are plain state objects so that headless games never touch Pygame - see BallSprite in
+    # src/sprites.py for how they are drawn
+    __slots__ = ("x", "y", "dx", "dy", "speed", "game")
+
+    def __init__(self, dx, game=None):
         # Set the initial position of the ball to the centre of the screen
         self.x = HALF_WIDTH_PX
         self.y = HALF_HEIGHT_PX
@@ -32,19 +36,38 @@ class Ball(Actor):
         # Store reference to game instance
         self.game = game
 
+    @property
+    def pos(self):
+        return (self.x, self.y)
+
     def update(self):
         
         if not self.game:
             return
-            
+
+        # Slow balls are moved one pixel at a time, fast balls analytically - both give exactly the same result
+        if self.speed < SWEPT_COLLISION_MIN_SPEED:
+            self.update_stepped()
+        else:
+            self.update_swept()
+
+    def update_stepped(self):
+        """
+        Moves the ball for one frame in a series of one-pixel steps, checking for collisions after each step.
+        """
+
+        # The position and direction are kept in local variables while stepping, as this is the hottest loop in
+        # the game, and written back once the frame is done
+        x, y, dx, dy = self.x, self.y, self.dx, self.dy
+
         # Each frame, we move the ball in a series of small steps - the number of steps being based on its speed attribute
         for i in range(self.speed):
             # Store the previous x position
-            original_x = self.x
+            original_x = x
 
             # Move the ball based on dx and dy
-            self.x += self.dx
-            self.y += self.dy
+            x += dx
+            y += dy
 
             # Check to see if ball needs to bounce off a bat
 
@@ -57,90 +80,263 @@ class Ball(Actor):
             # screen, it can bounce off a bat (assuming the bat is in the right position on the Y axis - checked
             # shortly afterwards).
             # We also check the previous X position to ensure that this is the first frame in which the ball crossed the threshold.
-            if abs(self.x - HALF_WIDTH_PX) >= 344 and abs(original_x - HALF_WIDTH_PX) < 344:
-
-                # Now that we know the edge of the ball has crossed the threshold on the x-axis, we need to check to
-                # see if the bat on the relevant side of the arena is at a suitable position on the y-axis for the
-                # ball collide with it.
-
-                if self.x < HALF_WIDTH_PX:
-                    new_dir_x = 1
-                    bat = self.game.bats[0]
-                else:
-                    new_dir_x = -1
-                    bat = self.game.bats[1]
-
-                difference_y = self.y - bat.y
-
-                if difference_y > -64 and difference_y < 64:
-                    # Ball has collided with bat - calculate new direction vector
-
-                    # To understand the maths used below, we first need to consider what would happen with this kind of
-                    # collision in the real world. The ball is bouncing off a perfectly vertical surface. This makes for a
-                    # pretty simple calculation. Let's take a ball which is travelling at 1 metre per second to the right,
-                    # and 2 metres per second down. Imagine this is taking place in space, so gravity isn't a factor.
-                    # After the ball hits the bat, it's still going to be moving at 2 m/s down, but it's now going to be
-                    # moving 1 m/s to the left instead of right. So its speed on the y-axis hasn't changed, but its
-                    # direction on the x-axis has been reversed. This is extremely easy to code - "self.dx = -self.dx".
-                    # However, games don't have to perfectly reflect reality.
-                    # In Pong, hitting the ball with the upper or lower parts of the bat would make it bounce diagonally
-                    # upwards or downwards respectively. This gives the player a degree of control over where the ball
-                    # goes. To make for a more interesting game, we want to use realistic physics as the starting point,
-                    # but combine with this the ability to influence the direction of the ball. When the ball hits the
-                    # bat, we're going to deflect the ball slightly upwards or downwards depending on where it hit the
-                    # bat. This gives the player a bit of control over where the ball goes.
-
-                    # Bounce the opposite way on the X axis
-                    self.dx = -self.dx
-
-                    # Deflect slightly up or down depending on where ball hit bat
-                    self.dy += difference_y / 128
-
-                    # Limit the Y component of the vector so we don't get into a situation where the ball is bouncing
-                    # up and down too rapidly
-                    self.dy = min(max(self.dy, -1), 1)
-
-                    # Ensure our direction vector is a unit vector, i.e. represents a distance of the equivalent of
-                    # 1 pixel regardless of its angle
-                    self.dx, self.dy = normalize_xy_vector(self.dx, self.dy)
-
-                    # Create an impact effect
-                    self.game.impacts.append(Impact((self.x - new_dir_x * 10, self.y)))
-
-                    # Increase speed with each hit
-                    self.speed += 1
-
-                    # Add an offset to the AI player's target Y position, so it won't aim to hit the ball exactly
-                    # in the centre of the bat
-                    self.game.ai_offset = random.randint(-10, 10)
-
-                    # Bat glows for 10 frames
-                    bat.timer = 10
-
-                    # Play hit sounds, with more intense sound effects as the ball gets faster
-                    self.game.play_sound("hit", 5)  # play every time in addition to:
-                    if self.speed <= 10:
-                        self.game.play_sound("hit_slow", 1)
-                    elif self.speed <= 12:
-                        self.game.play_sound("hit_medium", 1)
-                    elif self.speed <= 16:
-                        self.game.play_sound("hit_fast", 1)
-                    else:
-                        self.game.play_sound("hit_veryfast", 1)
+            if abs(x - HALF_WIDTH_PX) >= 344 and abs(original_x - HALF_WIDTH_PX) < 344:
+                dx, dy = self._hit_bat(x, y, dx, dy)
 
             # The top and bottom of the arena are 220 pixels from the centre
-            if abs(self.y - HALF_HEIGHT_PX) > 220:
-                # Invert vertical direction and apply new dy to y so that the ball is no longer overlapping with the
-                # edge of the arena
-                self.dy = -self.dy
-                self.y += self.dy
-
-                # Create impact effect
-                self.game.impacts.append(Impact(self.pos))
-
-                # Sound effect
-                self.game.play_sound("bounce", 5)
-                self.game.play_sound("bounce_synth", 1)
+            if abs(y - HALF_HEIGHT_PX) > 220:
+                y, dy = self._hit_wall(x, y, dy)
+
+        self.x, self.y, self.dx, self.dy = x, y, dx, dy
+
+    def update_swept(self):
+        """
+        Moves the ball for one frame, producing exactly the same trajectory, bounces, impacts and sounds as 
+        update_stepped, but in a time proportional to the number of collisions rather than to the speed.
+
+        Between two collisions, each one-pixel step adds the same dx and dy to the position. Floating point 
+        additions are rounded, so adding dx n times is not in general the same as adding n * dx - but while the 
+        position stays between two consecutive powers of two, every addition is rounded to the same grid and so 
+        adds exactly the same amount (see repeated_addition_run). Within such a run the position after any number 
+        of steps is known in closed form, which lets us binary search for the first step at which the ball crosses 
+        a bat threshold or a wall, jump straight to the step before it, and perform that step exactly as 
+        update_stepped would.
+        """
+        x, y, dx, dy = self.x, self.y, self.dx, self.dy
+
+        remaining = self.speed
+        while remaining > 0:
+            # Jump over the steps on which nothing happens
+            free_steps, step_x, step_y = self._free_steps(x, y, dx, dy, remaining)
+            if free_steps:
+                x += free_steps * step_x
+                y += free_steps * step_y
+                remaining -= free_steps
+
+            # Then perform the next step one pixel at a time, as it may involve a collision
+            if remaining:
+                original_x = x
+                x += dx
+                y += dy
+
+                if abs(x - HALF_WIDTH_PX) >= 344 and abs(original_x - HALF_WIDTH_PX) < 344:
+                    dx, dy = self._hit_bat(x, y, dx, dy)
+
+                if abs(y - HALF_HEIGHT_PX) > 220:
+                    y, dy = self._hit_wall(x, y, dy)
+
+                remaining -= 1
+
+        self.x, self.y, self.dx, self.dy = x, y, dx, dy
+
+    def fast_forward(self, max_frames):
+        """
+        Moves the ball forward by as many whole frames as it can, up to max_frames, without it colliding with
+        anything or crossing a bat threshold. The resulting position is exactly the one update would give.
+
+        Args:
+            max_frames (int): The maximum number of frames to move the ball for.
+
+        Returns:
+            int: The number of frames the ball was moved for, which may be 0.
+        """
+        x, y, dx, dy = self.x, self.y, self.dx, self.dy
+        limit = max_frames * self.speed
+
+        # Find how many one-pixel steps are free of collisions, as a series of runs on each of which the position
+        # has a closed form - see update_swept. Each run is recorded as the number of steps before it, its
+        # starting position and the amount each of its steps adds
+        runs = []
+        taken = 0
+        while taken < limit:
+            free_steps, step_x, step_y = self._free_steps(x, y, dx, dy, limit - taken)
+            if not free_steps:
+                # There is no closed form for the next step - for instance because the ball is moving into a
+                # different binade - but it can still be taken on its own if it needs no collision checks
+                if ((abs(x + dx - HALF_WIDTH_PX) >= 344 and abs(x - HALF_WIDTH_PX) < 344)
+                        or abs(y + dy - HALF_HEIGHT_PX) > 220):
+                    break
+                free_steps, step_x, step_y = 1, dx, dy
+
+            runs.append((taken, x, y, step_x, step_y))
+            x += free_steps * step_x
+            y += free_steps * step_y
+            taken += free_steps
+
+        # Only whole frames are taken, so move the ball to the position after the last whole frame's worth of steps
+        frames = taken // self.speed
+        if frames:
+            steps = frames * self.speed
+            for start, x, y, step_x, step_y in reversed(runs):
+                if start < steps:
+                    self.x = x + (steps - start) * step_x
+                    self.y = y + (steps - start) * step_y
+                    break
+        return frames
+
+    @staticmethod
+    def _free_steps(x, y, dx, dy, limit):
+        """
+        Works out how many one-pixel steps the ball can take before the first one which needs collision checks.
+
+        Args:
+            x, y (float): The position of the ball.
+            dx, dy (float): The direction of the ball.
+            limit (int): The maximum number of steps to look ahead.
+
+        Returns:
+            tuple: (n, step_x, step_y) - the ball can take n steps without crossing a bat threshold or touching a 
+            wall, after which its position is exactly (x + n * step_x, y + n * step_y).
+        """
+        n, step_x = repeated_addition_run(x, dx, limit)
+        n, step_y = repeated_addition_run(y, dy, n)
+        if n == 0:
+            return 0, step_x, step_y
+
+        # During the run the ball moves in a straight line, so the steps which cross the bat threshold in the 
+        # direction of travel form a suffix of the run, and so do the steps beyond the wall the ball is heading 
+        # for. If the ball is beyond the other wall, those steps form a prefix, which we detect by checking the 
+        # first step. So "a collision check is needed at or before step j" is true for a suffix of the run, and 
+        # we can binary search for its first step
+        if abs(y + step_y - HALF_HEIGHT_PX) > 220:
+            return 0, step_x, step_y
+
+        # Multiplying by the side the ball is heading for (-1 or 1) is exact, so the threshold test below gives
+        # the same answer as the abs() test in update_stepped
+        side = -1 if dx < 0 else 1
+        can_cross = (x - HALF_WIDTH_PX) * side < 344
+
+        def needs_check(j):
+            return (abs(y + j * step_y - HALF_HEIGHT_PX) > 220 
+                    or (can_cross and (x + j * step_x - HALF_WIDTH_PX) * side >= 344))
+
+        if not needs_check(n):
+            return n, step_x, step_y
+
+        low, high = 1, n
+        while low < high:
+            mid = (low + high) // 2
+            if needs_check(mid):
+                high = mid
+            else:
+                low = mid + 1
+
+        return low - 1, step_x, step_y
+
+    def _hit_bat(self, x, y, dx, dy):
+        """
+        Handles the ball crossing the threshold at which it can bounce off a bat.
+
+        Args:
+            x, y (float): The position of the ball.
+            dx, dy (float): The direction of the ball.
+
+        Returns:
+            tuple: The new direction of the ball, which is unchanged if the bat missed it.
+        """
+
+        # Now that we know the edge of the ball has crossed the threshold on the x-axis, we need to check to
+        # see if the bat on the relevant side of the arena is at a suitable position on the y-axis for the
+        # ball collide with it.
+
+        if x < HALF_WIDTH_PX:
+            new_dir_x = 1
+            bat = self.game.bats[0]
+        else:
+            new_dir_x = -1
+            bat = self.game.bats[1]
+
+        difference_y = y - bat.y
+
+        if difference_y > -64 and difference_y < 64:
+            # Ball has collided with bat - calculate new direction vector
+
+            # To understand the maths used below, we first need to consider what would happen with this kind of
+            # collision in the real world. The ball is bouncing off a perfectly vertical surface. This makes for a
+            # pretty simple calculation. Let's take a ball which is travelling at 1 metre per second to the right,
+            # and 2 metres per second down. Imagine this is taking place in space, so gravity isn't a factor.
+            # After the ball hits the bat, it's still going to be moving at 2 m/s down, but it's now going to be
+            # moving 1 m/s to the left instead of right. So its speed on the y-axis hasn't changed, but its
+            # direction on the x-axis has been reversed. This is extremely easy to code - "dx = -dx".
+            # However, games don't have to perfectly reflect reality.
+            # In Pong, hitting the ball with the upper or lower parts of the bat would make it bounce diagonally
+            # upwards or downwards respectively. This gives the player a degree of control over where the ball
+            # goes. To make for a more interesting game, we want to use realistic physics as the starting point,
+            # but combine with this the ability to influence the direction of the ball. When the ball hits the
+            # bat, we're going to deflect the ball slightly upwards or downwards depending on where it hit the
+            # bat. This gives the player a bit of control over where the ball goes.
+
+            # Bounce the opposite way on the X axis
+            dx = -dx
+
+            # Deflect slightly up or down depending on where ball hit bat
+            dy += difference_y / 128
+
+            # Limit the Y component of the vector so we don't get into a situation where the ball is bouncing
+            # up and down too rapidly
+            dy = min(max(dy, -1), 1)
+
+            # Ensure our direction vector is a unit vector, i.e. represents a distance of the equivalent of
+            # 1 pixel regardless of its angle
+            dx, dy = normalize_xy_vector(dx, dy)
+
+            # Create an impact effect
+            self.game.impacts.add(x - new_dir_x * 10, y)
+
+            # Increase speed with each hit
+            self.speed += 1
+
+            # Add an offset to the AI player's target Y position, so it won't aim to hit the ball exactly
+            # in the centre of the bat
+            self.game.ai_offset = self.game.rng.randint(-10, 10)
+
+            # Bat glows for 10 frames
+            bat.timer = 10
+
+            if self.game.events:
+                self.game.events.emit(self.game.frame, EVENT_BAT_HIT, bat.player, x, y, self.speed, difference_y, dy)
+
+            # Play hit sounds, with more intense sound effects as the ball gets faster
+            self.game.play_sound(SOUND_HIT)  # play every time in addition to:
+            if self.speed <= 10:
+                self.game.play_sound(SOUND_HIT_SLOW)
+            elif self.speed <= 12:
+                self.game.play_sound(SOUND_HIT_MEDIUM)
+            elif self.speed <= 16:
+                self.game.play_sound(SOUND_HIT_FAST)
+            else:
+                self.game.play_sound(SOUND_HIT_VERYFAST)
+
+        return dx, dy
+
+    def _hit_wall(self, x, y, dy):
+        """
+        Bounces the ball off the top or bottom wall of the arena.
+
+        Args:
+            x, y (float): The position of the ball.
+            dy (float): The vertical direction of the ball.
+
+        Returns:
+            tuple: The new vertical position and direction of the ball.
+        """
+
+        # Invert vertical direction and apply new dy to y so that the ball is no longer overlapping with the
+        # edge of the arena
+        dy = -dy
+        y += dy
+
+        # Create impact effect
+        self.game.impacts.add(x, y)
+
+        if self.game.events:
+            self.game.events.emit(self.game.frame, EVENT_WALL_BOUNCE, x=x, y=y, speed=self.speed)
+
+        # Sound effect
+        self.game.play_sound(SOUND_BOUNCE)
+        self.game.play_sound(SOUND_BOUNCE_SYNTH)
+
+        return y, dy
 
     def is_out(self):
         """
@@ -1,18 +1,22 @@
 
-# Pygame imports
-from pgzero.actor import Actor
-
 # Local application imports
+from src.profiler import PHASE_BAT_AI
+from src.utilities import first_nonpositive
+
+# Local application constants
 from src.constants import (HALF_HEIGHT_PX, 
                            HALF_WIDTH_PX, 
                            MAX_AI_SPEED)
 
-class Bat(Actor):
+class Bat:
+
+    # Bats are plain state objects so that headless games never touch Pygame - see BatSprite in
+    # src/sprites.py for how they are drawn
+    __slots__ = ("x", "y", "player", "score", "game", "move_func", "timer", "frame")
 
     def __init__(self, player, game, move_func=None):
-        x = 40 if player == 0 else 760
-        y = HALF_HEIGHT_PX
-        super().__init__("blank", (x, y))
+        self.x = 40 if player == 0 else 760
+        self.y = HALF_HEIGHT_PX
 
         self.player = player
         self.score = 0
@@ -33,20 +37,27 @@ class Bat(Actor):
         # Finally, it is used in Game.draw to determine when to display a visual effect over the top of the background
         self.timer = 0
 
+        # Animation frame used to choose the bat sprite - see update
+        self.frame = 0
+
     def update(self):
         self.timer -= 1
 
         # Our movement function tells us how much to move on the Y axis
-        y_movement = self.move_func()
+        profiler = self.game.profiler
+        if profiler:
+            start = profiler.clock()
+            y_movement = self.move_func()
+            profiler.add(PHASE_BAT_AI, start)
+        else:
+            y_movement = self.move_func()
 
         # Apply y_movement to y position, ensuring bat does not go through the side walls
         self.y = min(400, max(80, self.y + y_movement))
 
-        # Choose the appropriate sprite. There are 3 sprites per player - e.g. bat00 is the left-hand player's
-        # standard bat sprite, bat01 is the sprite to use when the ball has just bounced off the bat, and bat02
-        # is the sprite to use when the bat has just missed the ball and the ball has gone out of bounds.
-        # bat10, 11 and 12 are the equivalents for the right-hand player
-
+        # Choose the appropriate animation frame. Frame 0 is the standard bat, frame 1 is used when the ball
+        # has just bounced off the bat, and frame 2 is used when the bat has just missed the ball and the ball
+        # has gone out of bounds
         frame = 0
         if self.timer > 0:
             if self.game.ball.is_out():
@@ -54,7 +65,7 @@ class Bat(Actor):
             else:
                 frame = 1
 
-        self.image = "bat" + str(self.player) + str(frame)
+        self.frame = frame
 
     def ai(self):
         
@@ -88,4 +99,116 @@ class Bat(Actor):
 
         # Subtract target_y from our current Y position, then make sure we can't move any further than MAX_AI_SPEED
         # each frame
-        return min(MAX_AI_SPEED, max(-MAX_AI_SPEED, target_y - self.y))
\ No newline at end of file
+        return min(MAX_AI_SPEED, max(-MAX_AI_SPEED, target_y - self.y))
+
+    def advance(self, frames, ball_x, ball_y, ball_vx, ball_vy):
+        """
+        Moves an AI-controlled bat forward by a number of frames in closed form, giving the same result as calling
+        update that many times while the ball travels in a straight line - see Game.advance.
+
+        The target Bat.ai heads for is the centre of the screen while the ball is at least half the screen width
+        away, and otherwise a blend of the centre and the ball's position which, with the ball moving in a
+        straight line, is a quadratic function of the frame number. Each frame the bat either moves MAX_AI_SPEED
+        towards the target, reaches it, or is stopped by the edge of the arena. Instead of simulating the frames one
+        by one, we work out how long the bat stays in each of these modes by finding where quadratics change sign,
+        so the cost depends on the number of changes of mode rather than on the number of frames. Rounding may
+        differ from update's in the last bits of the bat's position, which the ball picks up when it next hits the
+        bat.
+
+        Args:
+            frames (int): The number of frames to advance by.
+            ball_x, ball_y (float): The position of the ball at the start of the first frame.
+            ball_vx, ball_vy (float): The distance the ball moves each frame.
+        """
+        self.timer -= frames
+
+        # The ball doesn't cross the bat's position on the X axis while it travels in a straight line, so its
+        # distance from the bat after j frames is distance + speed * j
+        side = 1 if ball_x >= self.x else -1
+        distance = (ball_x - self.x) * side
+        speed = ball_vx * side
+
+        y = self.y
+        j = 0
+        while j < frames:
+            # Work out how many frames the target is worked out the same way for - see the comments in ai(). At
+            # exactly half the screen width away, both ways give the same target
+            if distance + speed * j >= HALF_WIDTH_PX:
+                end = max(j + 1, first_nonpositive(0, speed, distance - HALF_WIDTH_PX, j, frames))
+                a, b, c = 0, 0, HALF_HEIGHT_PX
+            else:
+                end = max(j + 1, first_nonpositive(0, -speed, HALF_WIDTH_PX - distance, j, frames))
+
+                # Expand target_y = weight1 * HALF_HEIGHT_PX + (1 - weight1) * (ball y + offset), where both weight1
+                # and the ball's position on the Y axis are linear in j, into a * j**2 + b * j + c
+                w0 = distance / HALF_WIDTH_PX
+                w1 = speed / HALF_WIDTH_PX
+                y0 = ball_y + self.game.ai_offset
+                a = -w1 * ball_vy
+                b = ball_vy + w1 * (HALF_HEIGHT_PX - y0) - w0 * ball_vy
+                c = y0 + w0 * (HALF_HEIGHT_PX - y0)
+
+            y, j = self._advance_towards(y, j, end, a, b, c)
+
+        self.y = y
+
+        # Choose the animation frame as update would on the last frame
+        frame = 0
+        if self.timer > 0:
+            if self.game.ball.is_out():
+                frame = 2
+            else:
+                frame = 1
+        self.frame = frame
+
+    @staticmethod
+    def _advance_towards(y, j, end, a, b, c):
+        """
+        Moves the bat from frame j to frame end, heading each frame i for the target a * i**2 + b * i + c.
+
+        Returns:
+            tuple: The bat's position on the Y axis, and end.
+        """
+        while j < end:
+            target_y = (a * j + b) * j + c
+            difference = target_y - y
+
+            if -MAX_AI_SPEED <= difference <= MAX_AI_SPEED and 80 <= target_y <= 400:
+                # The bat reaches the target this frame. It keeps doing so on the following frames as long as the
+                # target stays within the arena, and moves by no more than MAX_AI_SPEED from one frame to the next
+                # - that is, as long as 2 * a * i + (b - a) stays between -MAX_AI_SPEED and MAX_AI_SPEED
+                stop = min(first_nonpositive(a, b, c - 80, j + 1, end),
+                           first_nonpositive(-a, -b, 400 - c, j + 1, end),
+                           first_nonpositive(0, -2 * a, MAX_AI_SPEED - b + a, j + 1, end),
+                           first_nonpositive(0, 2 * a, MAX_AI_SPEED + b - a, j + 1, end))
+                y = (a * (stop - 1) + b) * (stop - 1) + c
+
+            else:
+                direction = 1 if difference > 0 else -1
+                edge = 400 if direction > 0 else 80
+
+                if y == edge and (target_y - edge) * direction > 0:
+                    # The bat is stopped by the edge of the arena for as long as the target stays beyond it
+                    stop = first_nonpositive(direction * a, direction * b, direction * (c - edge), j, end)
+
+                elif difference > MAX_AI_SPEED or difference < -MAX_AI_SPEED:
+                    # The bat moves at full speed towards the target, until it gets within MAX_AI_SPEED of it or
+                    # would go past the edge of the arena
+                    stop = min(end, j + int((edge - y) * direction // MAX_AI_SPEED))
+                    stop = first_nonpositive(direction * a,
+                                             direction * b - MAX_AI_SPEED,
+                                             direction * (c - y) + MAX_AI_SPEED * (j - 1),
+                                             j, stop)
+                    y += direction * MAX_AI_SPEED * (stop - j)
+
+                else:
+                    stop = j
+
+                if stop == j:
+                    # None of the above lasts for a whole frame, so simulate a single frame as update would
+                    y = min(400, max(80, y + min(MAX_AI_SPEED, max(-MAX_AI_SPEED, difference))))
+                    stop = j + 1
+
+            j = stop
+
+        return y, end
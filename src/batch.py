@@ -0,0 +1,229 @@
+# Standard library imports
+import math
+
+# Third party imports
+import numpy as np
+
+# Local application constants
+from src.constants import (HALF_HEIGHT_PX,
+                           HALF_WIDTH_PX,
+                           MAX_AI_SPEED,
+                           WIDTH_PX)
+
+
+class BatchGame:
+    """
+    A batch of independent matches advanced together, one tick per call to step.
+
+    The state of every match is held in struct-of-arrays NumPy buffers, and each tick reproduces Game.update - the
+    bats' movement and Bat.ai targeting, Ball.update's sub-step collision logic and the scoring and respawn timers -
+    with masked array operations over all the matches at once. The results are identical to running each match with
+    Game, except that the AI offset is drawn from this batch's own random generator and impact effects, which have
+    no effect on play, are not simulated.
+
+    A match stops advancing once either player has more than 9 points, as in main.py.
+
+    Attributes:
+        num_games (int): The number of matches in the batch.
+        ai_players (tuple): Whether each of the two players is controlled by the AI, or by the moves passed to step.
+        ball_x, ball_y, ball_dx, ball_dy (numpy.ndarray): Ball position and direction, one entry per match.
+        ball_speed (numpy.ndarray): Ball speed in pixels per frame, one entry per match.
+        bat_y, bat_score, bat_timer (numpy.ndarray): Bat state, with shape (num_games, 2).
+        ai_offset (numpy.ndarray): The AI players' target offset, one entry per match.
+        frames (numpy.ndarray): The number of frames each match has been running for.
+    """
+
+    # Bat positions on the X axis, as in Bat.__init__
+    BAT_X = np.array([40, 760])
+
+    def __init__(self, num_games, seed=None, ai_players=(True, True)):
+        """
+        Initializes the batch with every match in its starting state.
+
+        Args:
+            num_games (int): The number of matches to simulate.
+            seed (int, optional): Seed for the random generator used for the AI offsets.
+            ai_players (tuple, optional): Whether each player is controlled by the AI. Defaults to two AI players.
+        """
+        self.num_games = num_games
+        self.ai_players = tuple(ai_players)
+        self.rng = np.random.default_rng(seed)
+
+        self.ball_x = np.empty(num_games)
+        self.ball_y = np.empty(num_games)
+        self.ball_dx = np.empty(num_games)
+        self.ball_dy = np.empty(num_games)
+        self.ball_speed = np.empty(num_games, dtype=np.int64)
+
+        self.bat_y = np.full((num_games, 2), float(HALF_HEIGHT_PX))
+        self.bat_score = np.zeros((num_games, 2), dtype=np.int64)
+        self.bat_timer = np.zeros((num_games, 2), dtype=np.int64)
+
+        self.ai_offset = np.zeros(num_games, dtype=np.int64)
+        self.frames = np.zeros(num_games, dtype=np.int64)
+
+        # The first ball of every match heads towards the left-hand player
+        self._new_ball(np.ones(num_games, dtype=bool), -1.0)
+
+    def reset(self, mask=None):
+        """
+        Puts the selected matches back into their starting state, as if they had just been created.
+
+        Args:
+            mask (numpy.ndarray, optional): Mask of the matches to reset. Defaults to every match.
+        """
+        if mask is None:
+            mask = np.ones(self.num_games, dtype=bool)
+
+        self.bat_y[mask] = HALF_HEIGHT_PX
+        self.bat_score[mask] = 0
+        self.bat_timer[mask] = 0
+        self.ai_offset[mask] = 0
+        self.frames[mask] = 0
+        self._new_ball(mask, -1.0)
+
+    @property
+    def finished(self):
+        """
+        numpy.ndarray: Mask of the matches which one of the players has won.
+        """
+        return self.bat_score.max(axis=1) > 9
+
+    def _new_ball(self, mask, dx):
+        """
+        Puts a new ball in the centre of the screen for the selected matches, as Ball.__init__ does.
+
+        Args:
+            mask (numpy.ndarray): Mask of the matches which get a new ball.
+            dx (numpy.ndarray or float): The horizontal direction of each new ball, for the selected matches.
+        """
+        self.ball_x[mask] = HALF_WIDTH_PX
+        self.ball_y[mask] = HALF_HEIGHT_PX
+        self.ball_dx[mask] = dx
+        self.ball_dy[mask] = 0
+        self.ball_speed[mask] = 5
+
+    def step(self, moves=None):
+        """
+        Advances every unfinished match by one frame.
+
+        Args:
+            moves (numpy.ndarray, optional): Array of shape (num_games, 2) giving, for each match, how far each
+                player's bat moves this frame. Only the columns of players which are not AI-controlled are used.
+
+        Returns:
+            numpy.ndarray: Mask of the matches which were advanced.
+        """
+        active = ~self.finished
+        self.frames[active] += 1
+
+        self._update_bats(active, moves)
+        self._update_balls(active)
+        self._update_scores(active)
+
+        return active
+
+    def run(self, max_frames=None):
+        """
+        Advances the batch until every match is finished, with all players controlled by the AI.
+
+        Args:
+            max_frames (int, optional): Stop after this many frames even if some matches are still running.
+
+        Returns:
+            int: The number of frames that were run.
+        """
+        frames = 0
+        while not self.finished.all() and (max_frames is None or frames < max_frames):
+            self.step()
+            frames += 1
+        return frames
+
+    def _update_bats(self, active, moves):
+        # Each bat's timer counts down by one every frame, as in Bat.update
+        self.bat_timer[active] -= 1
+
+        for player in (0, 1):
+            bat_y = self.bat_y[:, player]
+
+            if self.ai_players[player]:
+                # Vectorised version of Bat.ai - a weighted average of the centre of the screen and the ball's
+                # position on the Y axis (plus the AI offset), with more weight given to the ball the closer it is
+                x_distance = np.abs(self.ball_x - self.BAT_X[player])
+                weight1 = np.minimum(1, x_distance / HALF_WIDTH_PX)
+                weight2 = 1 - weight1
+                target_y = (weight1 * HALF_HEIGHT_PX) + (weight2 * (self.ball_y + self.ai_offset))
+                y_movement = np.clip(target_y - bat_y, -MAX_AI_SPEED, MAX_AI_SPEED)
+            else:
+                y_movement = moves[:, player]
+
+            # Apply the movement, ensuring the bat does not go through the side walls
+            self.bat_y[:, player] = np.where(active, np.clip(bat_y + y_movement, 80, 400), bat_y)
+
+    def _update_balls(self, active):
+        x, y, dx, dy = self.ball_x, self.ball_y, self.ball_dx, self.ball_dy
+        rows = np.arange(self.num_games)
+
+        # Each ball moves in a number of one-pixel steps equal to its speed at the start of the frame. All the
+        # matches step together, and a match drops out of the loop once it has done all of its steps
+        steps = np.where(active, self.ball_speed, 0)
+        for step in range(steps.max(initial=0)):
+            moving = steps > step
+            original_x = x.copy()
+
+            np.add(x, dx, out=x, where=moving)
+            np.add(y, dy, out=y, where=moving)
+
+            # Has the ball crossed the 344 pixel threshold at which it can bounce off a bat during this step? See
+            # Ball.update for where this number comes from
+            crossed = moving & (np.abs(x - HALF_WIDTH_PX) >= 344) & (np.abs(original_x - HALF_WIDTH_PX) < 344)
+            if crossed.any():
+                player = np.where(x < HALF_WIDTH_PX, 0, 1)
+                difference_y = y - self.bat_y[rows, player]
+                hit = np.flatnonzero(crossed & (difference_y > -64) & (difference_y < 64))
+
+                if hit.size:
+                    # Bounce the opposite way on the X axis, deflect up or down depending on where the ball hit
+                    # the bat, and limit the Y component of the vector as in Ball.update
+                    hit_dx = -dx[hit]
+                    hit_dy = np.clip(dy[hit] + difference_y[hit] / 128, -1, 1)
+
+                    # Ensure the direction vector is a unit vector. math.hypot is used rather than np.hypot, as the
+                    # two can differ in the last bit and the batch must follow the same trajectories as Game
+                    length = np.fromiter(map(math.hypot, hit_dx, hit_dy), dtype=float, count=hit.size)
+                    dx[hit] = hit_dx / length
+                    dy[hit] = hit_dy / length
+
+                    # Increase speed with each hit, make the bat glow for 10 frames and pick a new AI offset
+                    self.ball_speed[hit] += 1
+                    self.bat_timer[hit, player[hit]] = 10
+                    self.ai_offset[hit] = self.rng.integers(-10, 11, size=hit.size)
+
+            # The top and bottom of the arena are 220 pixels from the centre. Invert the vertical direction of any
+            # ball beyond them and apply the new dy so that it no longer overlaps the edge of the arena
+            bounced = moving & (np.abs(y - HALF_HEIGHT_PX) > 220)
+            np.negative(dy, out=dy, where=bounced)
+            np.add(y, dy, out=y, where=bounced)
+
+    def _update_scores(self, active):
+        # Has the ball gone off the left or right edge of the screen?
+        out = active & ((self.ball_x < 0) | (self.ball_x > WIDTH_PX))
+        if not out.any():
+            return
+
+        rows = np.flatnonzero(out)
+        scoring_player = np.where(self.ball_x[rows] < WIDTH_PX // 2, 1, 0)
+        losing_player = 1 - scoring_player
+        losing_timer = self.bat_timer[rows, losing_player]
+
+        # On the first frame the ball is out, the losing player's timer is below zero: award the point and start
+        # the 20 frame timer - see Game.update
+        scored = losing_timer < 0
+        self.bat_score[rows[scored], scoring_player[scored]] += 1
+        self.bat_timer[rows[scored], losing_player[scored]] = 20
+
+        # When the timer runs out, serve a new ball towards the player who just missed
+        respawn = np.zeros(self.num_games, dtype=bool)
+        respawn[rows[losing_timer == 0]] = True
+        direction = np.where(losing_player == 0, -1.0, 1.0)[losing_timer == 0]
+        self._new_ball(respawn, direction)
@@ -0,0 +1,437 @@
+# Standard library imports
+import argparse
+import asyncio
+import os
+import struct
+import threading
+import zlib
+from array import array
+
+# Local application imports
+from src.game import Game
+from src.impact import SNAPSHOT_HEADER as IMPACT_SNAPSHOT_HEADER
+
+# Local application constants
+from src.constants import IMPACT_POOL_CAPACITY, SIMULATION_RATE, WIDTH_PX, HEIGHT_PX, TITLE
+
+# Layout of the state sent to spectators each tick - everything needed to draw the game, and nothing else. It
+# starts with the frame number, the ball's position, the bats' positions, scores, timers and animation frames, and
+# the number of impact effects, followed by a slot for each impact the pool can hold, giving its position and the
+# number of frames since it was created. Unused slots are zero, so every state has the same size, which is what
+# lets a delta be computed byte for byte - see encode_delta
+STATE_HEADER = struct.Struct("<I4f2H2h3B")
+STATE_IMPACT = struct.Struct("<2fB")
+STATE_SIZE = STATE_HEADER.size + STATE_IMPACT.size * IMPACT_POOL_CAPACITY
+
+# Every message, in either direction, is framed with this header - its type and the length of what follows - in
+# the manner of a WebSocket frame
+FRAME_HEADER = struct.Struct("<BH")
+
+# Message types. A keyframe holds a whole state, and a delta holds a state relative to a keyframe - both headed with
+# KEYFRAME_HEADER or DELTA_HEADER. Spectators acknowledge every keyframe they receive, with ACK_MESSAGE
+MESSAGE_KEYFRAME = 1
+MESSAGE_DELTA = 2
+MESSAGE_ACK = 3
+
+# A keyframe's tick, and a delta's tick and the tick of the keyframe it is relative to
+KEYFRAME_HEADER = struct.Struct("<I")
+DELTA_HEADER = struct.Struct("<II")
+ACK_MESSAGE = struct.Struct("<I")
+
+# A keyframe is sent every this many ticks, and the most recent few are kept to compute deltas against
+KEYFRAME_INTERVAL = SIMULATION_RATE
+KEYFRAMES_KEPT = 4
+
+# A spectator which has more than this many bytes waiting to be sent to it misses ticks until it catches up
+MAX_PENDING_BYTES = 64 * 1024
+
+
+def pack_state(game):
+    """
+    Packs the state of a game which spectators need to draw it.
+
+    Args:
+        game (Game): The game.
+
+    Returns:
+        bytes: STATE_SIZE bytes, which apply_state can apply to another game.
+    """
+    bat0, bat1 = game.bats
+    impacts = list(game.impacts)
+    buffer = bytearray(STATE_SIZE)
+
+    # The bats' timers keep counting down below zero, but drawing only depends on whether they are above it
+    STATE_HEADER.pack_into(buffer, 0, game.frame, game.ball.x, game.ball.y, bat0.y, bat1.y, bat0.score, bat1.score,
+                           max(bat0.timer, -1), max(bat1.timer, -1), bat0.frame, bat1.frame, len(impacts))
+    offset = STATE_HEADER.size
+    for x, y, time in impacts:
+        STATE_IMPACT.pack_into(buffer, offset, x, y, time)
+        offset += STATE_IMPACT.size
+    return bytes(buffer)
+
+
+def apply_state(game, state):
+    """
+    Makes a game look like the one a state was packed from, so that drawing it draws what the spectators should
+    see. Only what pack_state stores is changed - the game is not meant to be updated afterwards.
+
+    Args:
+        game (Game): The game to change.
+        state (bytes): A state returned by pack_state.
+    """
+    (game.frame, game.ball.x, game.ball.y, game.bats[0].y, game.bats[1].y, game.bats[0].score, game.bats[1].score,
+     game.bats[0].timer, game.bats[1].timer, game.bats[0].frame, game.bats[1].frame,
+     count) = STATE_HEADER.unpack_from(state)
+
+    # The impacts go back into the pool through its snapshot format, with their birth frames worked out from their
+    # ages
+    impacts = list(STATE_IMPACT.iter_unpack(state[STATE_HEADER.size:]))[:count]
+    game.impacts.restore(IMPACT_SNAPSHOT_HEADER.pack(game.frame, count) +
+                         array("d", [x for x, _, _ in impacts]).tobytes() +
+                         array("d", [y for _, y, _ in impacts]).tobytes() +
+                         array("q", [game.frame - time for _, _, time in impacts]).tobytes())
+
+    # There's no previous position to interpolate from
+    game.previous = None
+
+
+def encode_delta(state, keyframe):
+    """
+    Encodes a state relative to a keyframe. Most of a state stays the same from one tick to the next, so the two
+    are XORed together, leaving mostly zero bytes, which zlib compresses down to very little.
+
+    Returns:
+        bytes: The compressed delta, which decode_delta turns back into the state.
+    """
+    xor = int.from_bytes(state, "little") ^ int.from_bytes(keyframe, "little")
+    return zlib.compress(xor.to_bytes(STATE_SIZE, "little"))
+
+
+def decode_delta(delta, keyframe):
+    """
+    Decodes a state encoded by encode_delta, relative to the same keyframe.
+    """
+    xor = int.from_bytes(zlib.decompress(delta), "little") ^ int.from_bytes(keyframe, "little")
+    return xor.to_bytes(STATE_SIZE, "little")
+
+
+def frame(message_type, payload):
+    # Frames a message for sending
+    return FRAME_HEADER.pack(message_type, len(payload)) + payload
+
+
+async def read_frame(reader):
+    """
+    Reads a message framed by frame.
+
+    Returns:
+        tuple: The message type and payload, or (None, None) once the connection has been closed.
+    """
+    try:
+        header = await reader.readexactly(FRAME_HEADER.size)
+        message_type, length = FRAME_HEADER.unpack(header)
+        return message_type, await reader.readexactly(length)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None, None
+
+
+class _Spectator:
+    # A connected spectator, as the server sees it
+    __slots__ = ("writer", "acknowledged", "awaiting")
+
+    def __init__(self, writer):
+        self.writer = writer
+
+        # The tick of the most recent keyframe the spectator has acknowledged, and of the keyframe sent to it
+        # which it hasn't acknowledged yet, if any
+        self.acknowledged = None
+        self.awaiting = None
+
+
+class BroadcastServer:
+    """
+    Streams the state of a game to any number of spectators over TCP.
+
+    publish is given the state of the game on every tick - see pack_state. Every KEYFRAME_INTERVAL ticks, the state
+    becomes a keyframe, which is sent whole, compressed, to every spectator. On the other ticks, each spectator is
+    sent a delta relative to the most recent keyframe it has acknowledged - typically a few dozen bytes. Deltas are
+    relative to a keyframe rather than to the previous tick, so any delta can be decoded on its own: a spectator
+    which falls behind, with more than MAX_PENDING_BYTES waiting to be sent to it, can simply miss ticks until it
+    catches up, without holding up the others. The delta from each keyframe is encoded once per tick, and shared by
+    every spectator which acknowledged that keyframe.
+
+    A new spectator, or one whose last acknowledged keyframe is no longer kept, is sent the most recent keyframe,
+    and then nothing more until it acknowledges it.
+
+    The server runs on an asyncio event loop. publish must be called from the loop's thread, or through
+    publish_threadsafe from any other.
+
+    Attributes:
+        spectators (int): The number of connected spectators.
+        ticks (int): The number of states published.
+        bytes_sent (int): The number of bytes queued for sending, framing included.
+        keyframes_sent (int): The number of keyframes sent.
+        deltas_sent (int): The number of deltas sent.
+        skipped (int): The number of times a tick wasn't sent to a spectator which had fallen behind.
+    """
+
+    def __init__(self):
+        self.ticks = 0
+        self.bytes_sent = 0
+        self.keyframes_sent = 0
+        self.deltas_sent = 0
+        self.skipped = 0
+
+        self._spectators = set()
+        self._server = None
+        self._loop = None
+
+        # The most recent keyframes, by tick, and the most recent one as a framed message
+        self._keyframes = {}
+        self._keyframe_message = None
+
+    @property
+    def spectators(self):
+        return len(self._spectators)
+
+    async def start(self, host="127.0.0.1", port=0):
+        """
+        Starts accepting spectators.
+
+        Returns:
+            int: The port the server is listening on.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._serve, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    def start_in_thread(self, host="127.0.0.1", port=0):
+        """
+        Starts the server on an event loop of its own, on a background thread - for a game whose main loop isn't
+        asyncio's, such as main.py's.
+
+        Returns:
+            int: The port the server is listening on.
+        """
+        started = threading.Event()
+        result = {}
+
+        def run():
+            loop = asyncio.new_event_loop()
+            result["port"] = loop.run_until_complete(self.start(host, port))
+            started.set()
+            loop.run_forever()
+
+        threading.Thread(target=run, name="Broadcast server", daemon=True).start()
+        started.wait()
+        return result["port"]
+
+    async def close(self):
+        """
+        Stops accepting spectators and disconnects those connected.
+        """
+        self._server.close()
+        for spectator in list(self._spectators):
+            spectator.writer.close()
+        await self._server.wait_closed()
+
+    def publish_threadsafe(self, state):
+        """
+        Calls publish on the server's event loop, from any thread.
+        """
+        self._loop.call_soon_threadsafe(self.publish, state)
+
+    def publish(self, state):
+        """
+        Sends the state of the game on a new tick to every spectator.
+
+        Args:
+            state (bytes): The state, as returned by pack_state.
+        """
+        tick = self.ticks
+        self.ticks += 1
+
+        if tick % KEYFRAME_INTERVAL == 0:
+            self._keyframes[tick] = state
+            self._keyframes.pop(tick - KEYFRAME_INTERVAL * KEYFRAMES_KEPT, None)
+            self._keyframe_message = frame(MESSAGE_KEYFRAME, KEYFRAME_HEADER.pack(tick) + zlib.compress(state))
+
+        deltas = {}
+        for spectator in self._spectators:
+            writer = spectator.writer
+            if writer.transport.get_write_buffer_size() > MAX_PENDING_BYTES:
+                self.skipped += 1
+                continue
+
+            if tick % KEYFRAME_INTERVAL == 0 or spectator.acknowledged not in self._keyframes:
+                # Send the most recent keyframe to spectators which don't have one to decode deltas with, unless
+                # they have one on the way
+                if spectator.awaiting in self._keyframes and tick % KEYFRAME_INTERVAL:
+                    continue
+                message = self._keyframe_message
+                spectator.awaiting = max(self._keyframes)
+                self.keyframes_sent += 1
+            else:
+                base = spectator.acknowledged
+                message = deltas.get(base)
+                if message is None:
+                    message = deltas[base] = frame(MESSAGE_DELTA, DELTA_HEADER.pack(tick, base) +
+                                                   encode_delta(state, self._keyframes[base]))
+                self.deltas_sent += 1
+
+            writer.write(message)
+            self.bytes_sent += len(message)
+
+    async def _serve(self, reader, writer):
+        spectator = _Spectator(writer)
+        self._spectators.add(spectator)
+        try:
+            while True:
+                message_type, payload = await read_frame(reader)
+                if message_type is None:
+                    break
+                if message_type == MESSAGE_ACK:
+                    tick, = ACK_MESSAGE.unpack(payload)
+                    if spectator.acknowledged is None or tick > spectator.acknowledged:
+                        spectator.acknowledged = tick
+        finally:
+            self._spectators.discard(spectator)
+            writer.close()
+
+
+class SpectatorClient:
+    """
+    Receives the stream sent by a BroadcastServer, and decodes the state of the game on each tick.
+
+    Attributes:
+        state (bytes): The most recent state received, as packed by pack_state, or None.
+        tick (int): The tick of the most recent state.
+        states (int): The number of states received.
+        bytes_received (int): The number of bytes received, framing included.
+    """
+
+    def __init__(self):
+        self.state = None
+        self.tick = -1
+        self.states = 0
+        self.bytes_received = 0
+
+        # The keyframes received, by tick
+        self._keyframes = {}
+
+    async def run(self, host, port, on_state=None):
+        """
+        Connects to a server and receives states until the connection is closed.
+
+        Args:
+            host (str): The server's address.
+            port (int): The server's port.
+            on_state (callable, optional): Called with each state as it is decoded.
+        """
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            while True:
+                message_type, payload = await read_frame(reader)
+                if message_type is None:
+                    break
+                self.bytes_received += FRAME_HEADER.size + len(payload)
+
+                if message_type == MESSAGE_KEYFRAME:
+                    tick, = KEYFRAME_HEADER.unpack_from(payload)
+                    state = zlib.decompress(payload[KEYFRAME_HEADER.size:])
+                    self._keyframes[tick] = state
+                    self._keyframes.pop(tick - KEYFRAME_INTERVAL * KEYFRAMES_KEPT, None)
+                    writer.write(frame(MESSAGE_ACK, ACK_MESSAGE.pack(tick)))
+
+                elif message_type == MESSAGE_DELTA:
+                    tick, base = DELTA_HEADER.unpack_from(payload)
+                    keyframe = self._keyframes.get(base)
+                    if keyframe is None:
+                        continue
+                    state = decode_delta(payload[DELTA_HEADER.size:], keyframe)
+
+                else:
+                    continue
+
+                self.state = state
+                self.tick = tick
+                self.states += 1
+                if on_state:
+                    on_state(state)
+        finally:
+            writer.close()
+
+
+async def _serve_match(port, seed):
+    # Plays an AI against AI match at the simulation rate, publishing every tick, and starts a new one whenever one
+    # of the players wins
+    server = BroadcastServer()
+    port = await server.start("0.0.0.0", port)
+    print(f"broadcasting on port {port}")
+
+    loop = asyncio.get_running_loop()
+    game = Game(seed=seed)
+    next_tick = loop.time()
+    while True:
+        if game.finished:
+            game = Game(seed=seed)
+        game.update()
+        server.publish(pack_state(game))
+
+        next_tick += 1 / SIMULATION_RATE
+        await asyncio.sleep(max(0.0, next_tick - loop.time()))
+
+
+async def _watch(host, port, frames):
+    # Draws the stream in a window - with the same assets and sprites as the game itself - until it is closed, the
+    # stream ends or the given number of states has been drawn
+
+    # Pygame imports
+    import pygame
+    from pgzero.screen import Screen
+
+    pygame.display.init()
+    pygame.display.set_caption(TITLE + " - spectator")
+    game = Game(Screen(pygame.display.set_mode((WIDTH_PX, HEIGHT_PX))))
+
+    client = SpectatorClient()
+    receiving = asyncio.ensure_future(client.run(host, port))
+    drawn = -1
+    while not receiving.done() and (frames is None or client.states < frames):
+        if any(event.type == pygame.QUIT for event in pygame.event.get()):
+            break
+        if client.tick != drawn:
+            apply_state(game, client.state)
+            game.draw()
+            pygame.display.flip()
+            drawn = client.tick
+        await asyncio.sleep(1 / SIMULATION_RATE)
+
+    receiving.cancel()
+    print(f"{client.states} states, {client.bytes_received / max(1, client.states):.1f} bytes per state")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Broadcast an AI against AI match to spectators, or watch one.")
+    parser.add_argument("--serve", type=int, metavar="PORT", help="broadcast a match on this port")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the broadcast match")
+    parser.add_argument("--watch", metavar="HOST:PORT", help="watch the match broadcast by this server")
+    parser.add_argument("--frames", type=int, help="stop watching after this many states")
+    args = parser.parse_args()
+
+    if args.serve is not None:
+        asyncio.run(_serve_match(args.serve, args.seed))
+    elif args.watch:
+        host, port = args.watch.rsplit(":", 1)
+
+        # Images are loaded relative to the directory above src
+        from pgzero import loaders
+        loaders.set_root(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+        asyncio.run(_watch(host, int(port), args.frames))
+    else:
+        parser.error("one of --serve or --watch is required")
+
+
+if __name__ == "__main__":
+    main()
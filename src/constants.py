@@ -11,6 +11,56 @@ HALF_HEIGHT_PX = HEIGHT_PX // 2
 PLAYER_SPEED = 6
 MAX_AI_SPEED = 6
 
+# The simulation runs at this many updates per second whatever the display's frame rate, and catches up by at most
+# this many updates per drawn frame - see src/timestep.py
+SIMULATION_RATE = 60
+MAX_CATCH_UP_STEPS = 5
+
+# Balls at least this fast are moved analytically rather than one pixel at a time - see Ball.update_swept
+SWEPT_COLLISION_MIN_SPEED = 25
+
+# Number of frames an impact effect is shown for, and the maximum number shown at once - see ImpactPool
+IMPACT_LIFETIME = 10
+IMPACT_POOL_CAPACITY = 32
+
+# Multi-ball arena - see src/arena.py. The radius is that of the opaque part of the ball sprite. Balls speed up by
+# one pixel per frame with each hit, up to the maximum, and the horizontal component of their direction is kept above
+# the minimum so that collisions between balls can't leave one bouncing up and down forever. A ball which goes out is
+# served again from the centre after the respawn delay, and the first player to reach the winning score wins. With
+# more balls in play, more of them go out, so a point takes one more missed ball for every ARENA_BALLS_PER_MISS
+# balls, which makes a match last about as long however many balls there are
+ARENA_BALL_RADIUS = 6
+ARENA_MAX_BALL_SPEED = 12
+ARENA_MIN_DX = 0.25
+ARENA_RESPAWN_FRAMES = 20
+ARENA_WINNING_SCORE = 99
+ARENA_BALLS_PER_MISS = 25
+ARENA_IMPACT_POOL_CAPACITY = 128
+
+# Sound effects. Each one is identified by a small integer, so that playing it is a list lookup rather than a
+# string lookup - see src/assets.py. The names are the start of the file names in sounds/, where each sound can
+# have several numbered variants (e.g. hit0.ogg to hit4.ogg)
+SOUND_BOUNCE = 0
+SOUND_BOUNCE_SYNTH = 1
+SOUND_HIT = 2
+SOUND_HIT_SLOW = 3
+SOUND_HIT_MEDIUM = 4
+SOUND_HIT_FAST = 5
+SOUND_HIT_VERYFAST = 6
+SOUND_SCORE_GOAL = 7
+SOUND_UP = 8
+SOUND_DOWN = 9
+
+SOUND_NAMES = ("bounce", "bounce_synth", "hit", "hit_slow", "hit_medium", "hit_fast", "hit_veryfast", "score_goal",
+               "up", "down")
+
+# Sound effects are played on a fixed number of mixer channels - voices - shared by the sounds of each group, so
+# that a burst of triggers can't use up every channel - see src/audio.py. SOUND_GROUPS gives the group of each
+# SOUND_ constant - bounces, hits, scoring and the menu - and SOUND_GROUP_VOICES the number of voices of each group.
+# A hit plays two sounds at once, the second depending on the ball's speed
+SOUND_GROUPS = (0, 0, 1, 1, 1, 1, 1, 2, 3, 3)
+SOUND_GROUP_VOICES = (2, 3, 1, 1)
+
 # Version
 MINIMUM_PYTHON_VERSION = (3, 5)
 MINIMUM_PYGAME_VERSION = [1, 2]
@@ -0,0 +1,230 @@
+# Third party imports
+import numpy as np
+
+# Local application imports
+from src.game import Game
+from src.batch import BatchGame
+from src.replay import MOVES
+
+# The values making up an observation, in order
+OBSERVATION_FIELDS = ("ball_x", "ball_y", "ball_dx", "ball_dy", "ball_speed", "bat0_y", "bat1_y", "bat0_timer",
+                      "bat1_timer", "bat0_score", "bat1_score")
+
+# Actions are the codes of the moves a player can make each frame - 0, 1 or 2 for up, still or down - as stored
+# in replays
+NUM_ACTIONS = len(MOVES)
+_MOVES = np.array(MOVES, dtype=float)
+
+
+class PongEnv:
+    """
+    Reinforcement learning environment wrapping a single headless Game, with a Gym-style reset/step API.
+
+    Each step advances the game by one frame. The players marked as controlled make the moves given by the agent,
+    and the others are controlled by the built-in AI. Observations are float32 arrays holding the values listed in
+    OBSERVATION_FIELDS, and each player gets a reward of +1 when they score a point and -1 when they concede one.
+    An episode is a match, which terminates as soon as one of the players has more than 9 points, as in main.py.
+
+    Attributes:
+        controlled (tuple): Whether each of the two players is controlled by the agent (True) or the AI (False).
+        max_frames (int): Episodes are truncated after this many frames, if set.
+        game (Game): The game of the current episode.
+    """
+
+    def __init__(self, controlled=(True, False), max_frames=None):
+        """
+        Initializes the environment. reset must be called before the first step.
+
+        Args:
+            controlled (tuple, optional): Whether each player is controlled by the agent. Defaults to the agent
+                playing the left-hand bat against the AI.
+            max_frames (int, optional): Truncate episodes after this many frames.
+        """
+        self.controlled = tuple(controlled)
+        self.max_frames = max_frames
+        self.game = None
+        self._moves = [0, 0]
+        self._frames = 0
+
+    def reset(self, seed=None):
+        """
+        Starts a new match.
+
+        Args:
+            seed (int, optional): Seed for the game's random number generator, which makes the match reproducible.
+
+        Returns:
+            tuple: (observation, info) - the first observation, and an empty dict.
+        """
+        self.game = Game(controls=[self._control(player) if self.controlled[player] else None for player in (0, 1)],
+                         seed=seed)
+        self._moves = [0, 0]
+        self._frames = 0
+        return self._observe(), {}
+
+    def _control(self, player):
+        # The bat's move_func returns whichever move the agent chose in the current step
+        moves = self._moves
+        return lambda: moves[player]
+
+    def step(self, actions):
+        """
+        Advances the match by one frame.
+
+        Args:
+            actions (int or sequence): The action of each player - 0, 1 or 2 to move up, stay still or move down.
+                A single action is taken by the left-hand player. The actions of AI players are ignored.
+
+        Returns:
+            tuple: (observation, rewards, terminated, truncated, info) - the new observation, a float32 array with
+            each player's reward, whether the match is over, whether it was cut short by max_frames, and a dict
+            holding the score.
+
+        Raises:
+            ValueError: If an action isn't one of the NUM_ACTIONS action codes.
+        """
+        if np.ndim(actions) == 0:
+            actions = (actions, 1)
+        if actions[0] not in range(NUM_ACTIONS) or actions[1] not in range(NUM_ACTIONS):
+            raise ValueError(f"actions must be in range({NUM_ACTIONS}), got {actions[0]} and {actions[1]}")
+        self._moves[0] = MOVES[actions[0]]
+        self._moves[1] = MOVES[actions[1]]
+
+        bats = self.game.bats
+        scores = (bats[0].score, bats[1].score)
+        self.game.update()
+        self._frames += 1
+
+        # Points are only awarded by Game.update's scoring path, so a change of score is a point being scored
+        scored_0 = bats[0].score - scores[0]
+        scored_1 = bats[1].score - scores[1]
+        rewards = np.array([scored_0 - scored_1, scored_1 - scored_0], dtype=np.float32)
+
+        terminated = max(bats[0].score, bats[1].score) > 9
+        truncated = not terminated and self.max_frames is not None and self._frames >= self.max_frames
+        return self._observe(), rewards, terminated, truncated, {"score": (bats[0].score, bats[1].score)}
+
+    def _observe(self):
+        ball = self.game.ball
+        bats = self.game.bats
+        return np.array([ball.x, ball.y, ball.dx, ball.dy, ball.speed, bats[0].y, bats[1].y,
+                         bats[0].timer, bats[1].timer, bats[0].score, bats[1].score], dtype=np.float32)
+
+
+class VectorPongEnv:
+    """
+    Vectorised version of PongEnv, stepping many matches at once with BatchGame.
+
+    Observations, actions and rewards gain a leading dimension with one entry per match. Matches which terminate or
+    are truncated are reset automatically at the end of the step in which they finished, so the returned
+    observation for them is the first observation of their next match. The last observations of the finished
+    matches are given in the info dict, as 'final_observation' - an array with a row for each finished match, in
+    order - along with '_final_observation', a boolean mask of the matches which finished.
+
+    The matches follow the same rules as Game, except that impact effects are not simulated and the AI offsets are
+    drawn from the batch's random generator - see src/batch.py.
+
+    Attributes:
+        num_envs (int): The number of matches.
+        controlled (tuple): Whether each of the two players is controlled by the agent (True) or the AI (False).
+        max_frames (int): Matches are truncated after this many frames, if set.
+        batch (BatchGame): The matches.
+    """
+
+    def __init__(self, num_envs, controlled=(True, False), max_frames=None):
+        """
+        Initializes the environment. reset must be called before the first step.
+
+        Args:
+            num_envs (int): The number of matches to step at once.
+            controlled (tuple, optional): Whether each player is controlled by the agent. Defaults to the agent
+                playing the left-hand bat against the AI.
+            max_frames (int, optional): Truncate matches after this many frames.
+        """
+        self.num_envs = num_envs
+        self.controlled = tuple(controlled)
+        self.max_frames = max_frames
+        self.batch = None
+
+        # Buffers reused every step, to avoid allocating large arrays on each call
+        self._moves = np.zeros((num_envs, 2))
+        self._observation = np.empty((num_envs, len(OBSERVATION_FIELDS)), dtype=np.float32)
+
+    def reset(self, seed=None):
+        """
+        Starts a new match in every environment.
+
+        Args:
+            seed (int, optional): Seed for the batch's random generator, which makes the matches reproducible.
+
+        Returns:
+            tuple: (observations, info) - array of shape (num_envs, len(OBSERVATION_FIELDS)), and an empty dict.
+        """
+        self.batch = BatchGame(self.num_envs, seed, ai_players=[not controlled for controlled in self.controlled])
+        return self._observe().copy(), {}
+
+    def step(self, actions):
+        """
+        Advances every match by one frame.
+
+        Args:
+            actions (numpy.ndarray): Integer array of shape (num_envs,) giving the left-hand player's action in
+                each match, or of shape (num_envs, 2) giving both players' actions - 0, 1 or 2 to move up, stay
+                still or move down. The actions of AI players are ignored.
+
+        Returns:
+            tuple: (observations, rewards, terminated, truncated, info) - each with a leading dimension of
+            num_envs. rewards has shape (num_envs, 2), with each player's reward.
+
+        Raises:
+            ValueError: If an action isn't one of the NUM_ACTIONS action codes - negative codes would otherwise
+                index the moves from the end.
+        """
+        batch = self.batch
+
+        # Action codes 0, 1 and 2 map onto moves of -PLAYER_SPEED, 0 and PLAYER_SPEED
+        actions = np.asarray(actions)
+        if actions.size and (actions.min() < 0 or actions.max() >= NUM_ACTIONS):
+            raise ValueError(f"actions must be in range({NUM_ACTIONS}), got values from {actions.min()} to "
+                             f"{actions.max()}")
+        if actions.ndim == 1:
+            self._moves[:, 0] = _MOVES[actions]
+        else:
+            self._moves[:] = _MOVES[actions]
+
+        scores = batch.bat_score.copy()
+        batch.step(self._moves)
+
+        # Points are only awarded by the scoring step, so a change of score is a point being scored
+        scored = batch.bat_score - scores
+        rewards = (scored - scored[:, ::-1]).astype(np.float32)
+
+        terminated = batch.finished
+        truncated = np.zeros(self.num_envs, dtype=bool)
+        if self.max_frames is not None:
+            truncated = ~terminated & (batch.frames >= self.max_frames)
+
+        observation = self._observe()
+        info = {}
+        done = terminated | truncated
+        if done.any():
+            info["final_observation"] = observation[done]
+            info["_final_observation"] = done
+            batch.reset(done)
+            observation = self._observe()
+
+        return observation.copy(), rewards, terminated, truncated, info
+
+    def _observe(self):
+        # Fills the observation buffer from the batch's state arrays
+        batch = self.batch
+        observation = self._observation
+        observation[:, 0] = batch.ball_x
+        observation[:, 1] = batch.ball_y
+        observation[:, 2] = batch.ball_dx
+        observation[:, 3] = batch.ball_dy
+        observation[:, 4] = batch.ball_speed
+        observation[:, 5:7] = batch.bat_y
+        observation[:, 7:9] = batch.bat_timer
+        observation[:, 9:11] = batch.bat_score
+        return observation
@@ -0,0 +1,214 @@
+# Standard library imports
+import argparse
+import json
+import queue
+import threading
+from array import array
+
+# Kinds of event. They are small integers so that recording an event only stores numbers
+EVENT_SERVE = 0
+EVENT_BAT_HIT = 1
+EVENT_WALL_BOUNCE = 2
+EVENT_POINT_SCORED = 3
+
+EVENT_NAMES = ("serve", "bat_hit", "wall_bounce", "point_scored")
+
+# The fields of each event, in the order they are stored. 'value' means something different for each kind of event,
+# so it is written out under the name given here - see EventLog.emit
+EVENT_FIELDS = ("frame", "type", "player", "x", "y", "speed", "value", "dy")
+VALUE_NAMES = ("", "offset", "", "rally")
+
+
+class EventLog:
+    """
+    Opt-in recorder of the events of a match - serves, bat hits, wall bounces and points - for working out
+    per-rally statistics, which are written to a newline-delimited JSON file.
+
+    Game, Ball and Bat report events to a game's log when its events attribute is set, so logging costs a single
+    attribute check per event when it is disabled. Events are stored in preallocated arrays, one per field, which
+    hold a batch of events. When the batch is full, the arrays are copied - a single memory copy each - and handed
+    to a background thread, which formats and writes them, so the frame loop never waits for the file. The queue of
+    batches waiting to be written is bounded; if the writer falls that far behind, further batches are dropped and
+    counted rather than letting memory grow.
+
+    Each line of the file is an object with the event's frame, type and, depending on its type:
+
+        serve: player (the player the new ball is heading towards)
+        bat_hit: player, x, y, speed (after the hit), offset (of the ball from the centre of the bat) and dy (the
+            ball's new vertical direction)
+        wall_bounce: x, y and speed
+        point_scored: player (who scored), speed and rally (the number of bat hits since the last point)
+
+    Attributes:
+        path (str): The file the events are written to.
+        batch_size (int): The number of events in each batch.
+        events (int): The number of events recorded.
+        dropped (int): The number of events which were dropped because the writer fell behind.
+    """
+
+    def __init__(self, path, batch_size=256, max_pending=16):
+        """
+        Opens the file and starts the writer thread.
+
+        Args:
+            path (str): The file to write. It is overwritten if it exists.
+            batch_size (int, optional): The number of events to write at a time.
+            max_pending (int, optional): The maximum number of batches waiting to be written.
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.events = 0
+        self.dropped = 0
+
+        self._frame = array("q", bytes(8 * batch_size))
+        self._kind = array("b", bytes(batch_size))
+        self._player = array("b", bytes(batch_size))
+        self._x = array("d", bytes(8 * batch_size))
+        self._y = array("d", bytes(8 * batch_size))
+        self._speed = array("i", bytes(4 * batch_size))
+        self._value = array("d", bytes(8 * batch_size))
+        self._dy = array("d", bytes(8 * batch_size))
+        self._columns = (self._frame, self._kind, self._player, self._x, self._y, self._speed, self._value,
+                         self._dy)
+        self._count = 0
+
+        # The number of bat hits in the current rally
+        self._rally = 0
+
+        self._file = open(path, "w")
+        self._pending = queue.Queue(max_pending)
+        self._writer = threading.Thread(target=self._write_batches, name="EventLog writer", daemon=True)
+        self._writer.start()
+
+    def emit(self, frame, kind, player=-1, x=0.0, y=0.0, speed=0, value=0.0, dy=0.0):
+        """
+        Records an event.
+
+        Args:
+            frame (int): The frame on which the event happened - see Game.frame.
+            kind (int): One of the EVENT_ constants.
+            player (int, optional): The player involved, or -1.
+            x, y (float, optional): The position of the ball.
+            speed (int, optional): The speed of the ball.
+            value (float, optional): The offset of the ball from the bat's centre, for bat hits.
+            dy (float, optional): The ball's new vertical direction, for bat hits.
+        """
+        if kind == EVENT_BAT_HIT:
+            self._rally += 1
+        elif kind == EVENT_POINT_SCORED:
+            value = self._rally
+            self._rally = 0
+
+        i = self._count
+        self._frame[i] = frame
+        self._kind[i] = kind
+        self._player[i] = player
+        self._x[i] = x
+        self._y[i] = y
+        self._speed[i] = speed
+        self._value[i] = value
+        self._dy[i] = dy
+        self._count = i + 1
+        self.events += 1
+
+        if self._count == self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Hands the events recorded so far to the writer thread.
+        """
+        count = self._count
+        if not count:
+            return
+        self._count = 0
+
+        batch = [column[:count] for column in self._columns]
+        try:
+            self._pending.put_nowait(batch)
+        except queue.Full:
+            self.dropped += count
+
+    def close(self):
+        """
+        Writes out the remaining events, waits for the writer to finish and closes the file.
+        """
+        if self._file.closed:
+            return
+        self.flush()
+        self._pending.put(None)
+        self._writer.join()
+        self._file.close()
+
+    def _write_batches(self):
+        # Runs on the writer thread, formatting each batch as lines of JSON and writing it in one go
+        while True:
+            batch = self._pending.get()
+            if batch is None:
+                return
+            lines = []
+            for frame, kind, player, x, y, speed, value, dy in zip(*batch):
+                event = {"frame": frame, "type": EVENT_NAMES[kind]}
+                if kind != EVENT_WALL_BOUNCE:
+                    event["player"] = player
+                if kind != EVENT_SERVE:
+                    if kind != EVENT_POINT_SCORED:
+                        event["x"] = round(x, 2)
+                        event["y"] = round(y, 2)
+                    event["speed"] = speed
+                if kind == EVENT_BAT_HIT:
+                    event["offset"] = round(value, 2)
+                    event["dy"] = round(dy, 4)
+                elif kind == EVENT_POINT_SCORED:
+                    event["rally"] = int(value)
+                lines.append(json.dumps(event, separators=(",", ":")))
+            self._file.write("\n".join(lines) + "\n")
+
+
+def read_events(path):
+    """
+    Reads the events written by an EventLog.
+
+    Args:
+        path (str): The file to read.
+
+    Returns:
+        list: The events, as dicts.
+    """
+    with open(path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def rally_stats(events):
+    """
+    Summarises the rallies in a list of events.
+
+    Args:
+        events (list): Events, as returned by read_events.
+
+    Returns:
+        dict: The number of points and of hits, the mean and longest rally lengths, the mean absolute offset of the
+        ball from the bat's centre on hits, the mean speed at each hit, and the number of points scored by each
+        player.
+    """
+    points = [event for event in events if event["type"] == "point_scored"]
+    hits = [event for event in events if event["type"] == "bat_hit"]
+    rallies = [event["rally"] for event in points]
+    return {"points": len(points),
+            "hits": len(hits),
+            "mean_rally": sum(rallies) / len(rallies) if rallies else 0,
+            "longest_rally": max(rallies, default=0),
+            "mean_abs_offset": sum(abs(event["offset"]) for event in hits) / len(hits) if hits else 0,
+            "mean_hit_speed": sum(event["speed"] for event in hits) / len(hits) if hits else 0,
+            "points_by_player": [sum(1 for event in points if event["player"] == player) for player in (0, 1)]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarise the rallies in a match event log.")
+    parser.add_argument("path", help="file written by EventLog")
+    args = parser.parse_args(argv)
+    print(json.dumps(rally_stats(read_events(args.path)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
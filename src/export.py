@@ -0,0 +1,284 @@
+# Standard library imports
+import argparse
+import os
+import struct
+import sys
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Local application imports
+from src.game import Game
+from src.replay import Replay
+from src.broadcast import pack_state, apply_state
+
+# Local application constants
+from src.constants import SIMULATION_RATE, WIDTH_PX, HEIGHT_PX
+
+# What is drawn on top of the game on each frame - nothing, the menu with one or two players chosen, or the game
+# over screen, as main.py does
+OVERLAY_NONE = 0
+OVERLAY_MENU_1 = 1
+OVERLAY_MENU_2 = 2
+OVERLAY_OVER = 3
+
+# Output formats - every frame's RGB pixels one after another, or a PNG file per frame
+FORMAT_RAW = "raw"
+FORMAT_PNG = "png"
+
+# The size of a raw frame
+RAW_FRAME_BYTES = WIDTH_PX * HEIGHT_PX * 3
+
+# The start of every PNG file, the colour type of 8-bit RGB pixels, and the zlib level they are compressed with -
+# see encode_png
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_COLOUR_TYPE_RGB = 2
+PNG_COMPRESSION = 1
+
+# The worker process's game and the offscreen surface it is drawn on - see _init_worker
+_worker = {}
+
+
+def match_frames(replay=None, seed=0, menu_frames=0, over_frames=0, max_frames=None):
+    """
+    Re-simulates a match headlessly, and generates what each of its frames shows.
+
+    The match is either a recorded one or, if no replay is given, an AI against AI match from a seed. As in main.py,
+    a frame is drawn after every update until one of the players has won - or, for a replay, until the recording
+    runs out.
+
+    Args:
+        replay (Replay, optional): The match to re-simulate.
+        seed (int, optional): The seed of an AI against AI match, used if replay is not given.
+        menu_frames (int, optional): The number of frames of the menu to show first, over the table before the
+            match starts.
+        over_frames (int, optional): The number of frames of the game over screen to show last, over the end of the
+            match.
+        max_frames (int, optional): Stop the match after this many frames.
+
+    Yields:
+        tuple: The game's state, packed with pack_state - a few hundred bytes, which are cheap to send to another
+        process - and the OVERLAY_ constant for the frame.
+    """
+    if replay:
+        game = replay.playback()
+        frames = replay.frames if max_frames is None else min(replay.frames, max_frames)
+        menu = OVERLAY_MENU_2 if replay.human[1] else OVERLAY_MENU_1
+    else:
+        game = Game(seed=seed)
+        frames = max_frames
+        menu = OVERLAY_MENU_1
+
+    state = pack_state(game)
+    for _ in range(menu_frames):
+        yield state, menu
+
+    frame = 0
+    while (frames is None or frame < frames) and not (replay is None and game.finished):
+        game.update()
+        frame += 1
+        yield pack_state(game), OVERLAY_NONE
+
+    state = pack_state(game)
+    for _ in range(over_frames):
+        yield state, OVERLAY_OVER
+
+
+def _init_worker(root):
+    # Sets up a worker process to draw frames: the dummy video driver, so that no window is opened, a display mode
+    # so that the images can be converted for fast blitting when they are loaded, and an offscreen surface to draw
+    # the game on
+
+    # Raw frames may be streamed to stdout by the main process, so anything a worker prints goes to stderr instead
+    sys.stdout = sys.stderr
+
+    # Pygame imports
+    import pygame
+    from pgzero import loaders
+    from pgzero.screen import Screen
+
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    loaders.set_root(root)
+    pygame.display.init()
+    pygame.display.set_mode((WIDTH_PX, HEIGHT_PX))
+
+    surface = pygame.Surface((WIDTH_PX, HEIGHT_PX))
+    _worker["surface"] = surface
+    _worker["game"] = Game(Screen(surface))
+
+
+def encode_png(pixels):
+    """
+    Encodes a frame as a PNG file.
+
+    Pygame's own PNG writer compresses as hard as zlib's default level, which takes several times longer than
+    drawing the frame. The frames are mostly large flat areas, so the fastest level makes files only a little
+    bigger, in a fraction of the time.
+
+    Args:
+        pixels (bytes): The frame's RGB pixels, as returned by pygame.image.tobytes.
+
+    Returns:
+        bytes: The PNG file.
+    """
+    # Each row of pixels is preceded by its filter type - 0, for none
+    row = WIDTH_PX * 3
+    data = b"".join(b"\0" + pixels[start:start + row] for start in range(0, len(pixels), row))
+    header = struct.pack(">2I5B", WIDTH_PX, HEIGHT_PX, 8, PNG_COLOUR_TYPE_RGB, 0, 0, 0)
+    return (PNG_SIGNATURE + _png_chunk(b"IHDR", header) +
+            _png_chunk(b"IDAT", zlib.compress(data, PNG_COMPRESSION)) + _png_chunk(b"IEND", b""))
+
+
+def _png_chunk(chunk_type, data):
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+
+def render_chunk(first, frames, output_format, path):
+    """
+    Draws a chunk of frames in a worker process, encodes them and writes them out.
+
+    PNG files, and raw frames going to a file, are written by the worker itself - raw frames all have the same size,
+    so each one goes straight to its place in the file. Only raw frames being streamed are sent back to the main
+    process, to write in order.
+
+    Args:
+        first (int): The number of the chunk's first frame.
+        frames (list): The frames to draw, as generated by match_frames.
+        output_format (str): FORMAT_RAW or FORMAT_PNG.
+        path (str): The directory for PNG files, the file for raw frames, or "-" to stream raw frames.
+
+    Returns:
+        list: The raw frames, when they are being streamed - otherwise an empty list.
+    """
+    # Pygame imports
+    import pygame
+
+    surface = _worker["surface"]
+    game = _worker["game"]
+    assets = game.get_assets()
+    overlays = (None, assets.menus[0], assets.menus[1], assets.over)
+
+    encoded = []
+    for state, overlay in frames:
+        # The game is drawn the way Game.draw draws it live, from the state the live game was in
+        apply_state(game, state)
+        game.draw(overlay=overlays[overlay])
+        pixels = pygame.image.tobytes(surface, "RGB")
+        encoded.append(encode_png(pixels) if output_format == FORMAT_PNG else pixels)
+
+    if output_format == FORMAT_PNG:
+        for number, data in enumerate(encoded, first):
+            with open(os.path.join(path, f"frame{number:06d}.png"), "wb") as file:
+                file.write(data)
+    elif path != "-":
+        with open(path, "r+b") as file:
+            file.seek(first * RAW_FRAME_BYTES)
+            for data in encoded:
+                file.write(data)
+    else:
+        return encoded
+    return []
+
+
+def export(frames, output_format, path, workers=None, chunk_size=30):
+    """
+    Draws and encodes frames across a pool of worker processes.
+
+    Frames are handed out in chunks, and only a couple of chunks per worker are in flight at any time, so memory
+    use stays constant however long the match is. The chunks are collected in the order they were handed out, each
+    one waiting for those before it, so streamed frames reach stdout in order.
+
+    Args:
+        frames (iterable): The frames to draw, as generated by match_frames.
+        output_format (str): FORMAT_RAW or FORMAT_PNG.
+        path (str): The directory to write a PNG file per frame to, the file to write raw frames to, or "-" to
+            write raw frames to stdout.
+        workers (int, optional): The number of worker processes. Defaults to the number of CPUs.
+        chunk_size (int, optional): The number of frames per chunk.
+
+    Returns:
+        int: The number of frames written.
+    """
+    workers = workers or os.cpu_count() or 1
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    # The workers write into the output, so it must exist, and start out empty, before they start
+    if output_format == FORMAT_PNG:
+        os.makedirs(path, exist_ok=True)
+    elif path != "-":
+        open(path, "wb").close()
+
+    # Pygame prints a banner to stdout when it is imported. The workers inherit this setting, which hides it, so it
+    # can't end up in the middle of streamed frames
+    os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
+
+    streamed = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(root,)) as executor:
+        pending = deque()
+
+        def collect_oldest():
+            nonlocal streamed
+            for data in pending.popleft().result():
+                sys.stdout.buffer.write(data)
+                streamed += len(data)
+
+        written = 0
+        chunk = []
+        for frame in frames:
+            chunk.append(frame)
+            if len(chunk) == chunk_size:
+                pending.append(executor.submit(render_chunk, written, chunk, output_format, path))
+                written += len(chunk)
+                chunk = []
+                if len(pending) >= 2 * workers:
+                    collect_oldest()
+        if chunk:
+            pending.append(executor.submit(render_chunk, written, chunk, output_format, path))
+            written += len(chunk)
+        while pending:
+            collect_oldest()
+
+    # An encoder reading the stream relies on every frame being exactly RAW_FRAME_BYTES long
+    if path == "-" and streamed != written * RAW_FRAME_BYTES:
+        raise RuntimeError(f"streamed {streamed} bytes for {written} frames of {RAW_FRAME_BYTES} bytes")
+
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render a recorded or seeded match to video frames offline. Raw "
+                                                 "frames can be piped to an encoder, e.g. ffmpeg -f rawvideo -pix_fmt "
+                                                 f"rgb24 -s {WIDTH_PX}x{HEIGHT_PX} -r {SIMULATION_RATE} -i - out.mp4")
+    parser.add_argument("replay", nargs="?", help="replay file to render (default: an AI against AI match)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the AI against AI match")
+    parser.add_argument("--raw", metavar="PATH", help="write raw RGB frames to this file, or - for stdout")
+    parser.add_argument("--png", metavar="DIR", help="write a PNG file per frame to this directory")
+    parser.add_argument("--menu-seconds", type=float, default=0, help="show the menu for this long first")
+    parser.add_argument("--over-seconds", type=float, default=2, help="show the game over screen for this long last")
+    parser.add_argument("--max-frames", type=int, default=None, help="stop the match after this many frames")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: number of CPUs)")
+    parser.add_argument("--chunk-size", type=int, default=30, help="frames per unit of work")
+    args = parser.parse_args(argv)
+
+    if bool(args.raw) == bool(args.png):
+        parser.error("exactly one of --raw or --png is required")
+
+    frames = match_frames(Replay.load(args.replay) if args.replay else None, args.seed,
+                          round(args.menu_seconds * SIMULATION_RATE), round(args.over_seconds * SIMULATION_RATE),
+                          args.max_frames)
+
+    start = time.perf_counter()
+    if args.png:
+        written = export(frames, FORMAT_PNG, args.png, args.workers, args.chunk_size)
+    else:
+        written = export(frames, FORMAT_RAW, args.raw, args.workers, args.chunk_size)
+    elapsed = time.perf_counter() - start
+
+    # Progress goes to stderr, so that raw frames can go to stdout
+    print(f"{written} frames in {elapsed:.2f}s ({written / elapsed:.0f} frames/s, "
+          f"{written / SIMULATION_RATE / elapsed:.1f}x real time)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
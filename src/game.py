@@ -1,15 +1,71 @@
 # Standard library imports
 import random
+import struct
 
 # Local application imports
 from src.bat import Bat
 from src.ball import Ball
+from src.impact import ImpactPool
+from src.events import EVENT_SERVE, EVENT_POINT_SCORED
+from src.profiler import (PHASE_BATS,
+                          PHASE_BALL,
+                          PHASE_IMPACTS,
+                          PHASE_SCORING,
+                          PHASE_DRAW_BACKGROUND,
+                          PHASE_DRAW_SPRITES,
+                          PHASE_DRAW_DIGITS)
 
 # Local application constants
-from src.constants import WIDTH_PX
+from src.constants import HALF_WIDTH_PX, WIDTH_PX, SOUND_SCORE_GOAL
+
+# Layout of a snapshot - see Game.snapshot. It starts with the frame number, the ball's position, direction and
+# speed, each bat's position, score, timer and animation frame, and the AI offset. Next comes the state of the random number
+# generator - the 624 words of the Mersenne Twister plus its position, and the cached value of gauss, if any. The
+# active impact effects follow - see ImpactPool.snapshot
+SNAPSHOT_HEADER = struct.Struct("<q4di" + "d3i" * 2 + "i")
+SNAPSHOT_RNG = struct.Struct("<625I?d")
+
+
+class _CountingRandom(random.Random):
+    # Random number generator which counts the changes to its state, so that snapshots can reuse the packed state
+    # of the generator for as long as it hasn't changed. The game only draws random numbers now and again - when a
+    # point is scored, for instance - while getting and packing the generator's state is by far the most costly
+    # part of a snapshot. Every other way of drawing numbers goes through random or getrandbits, and overriding
+    # both keeps the sequence of numbers the same as random.Random's
+
+    def __init__(self, seed=None):
+        self.changes = 0
+        super().__init__(seed)
+
+    def seed(self, *args, **kwargs):
+        self.changes += 1
+        super().seed(*args, **kwargs)
+
+    def setstate(self, state):
+        self.changes += 1
+        super().setstate(state)
+
+    def random(self):
+        self.changes += 1
+        return super().random()
+
+    def getrandbits(self, k):
+        self.changes += 1
+        return super().getrandbits(k)
+
 
 class Game:
-    def __init__(self, screen=None, controls=(None, None)):
+    def __init__(self, screen=None, controls=(None, None), seed=None):
+        # Each game has its own random number generator, so that a game created with a given seed always plays
+        # out the same way for the same inputs
+        self.seed = seed
+        self.rng = _CountingRandom(seed)
+
+        # The generator's state as most recently packed into or restored from a snapshot, and its number of changes
+        # at that point
+        self._rng_state = None
+        self._rng_changes = -1
+
         # Create a list of two bats, giving each a player number and a function to use to receive
         # control inputs (or the value None if this is intended to be an AI player)
         self.bats = [Bat(0, self, controls[0]), Bat(1, self, controls[1])]
@@ -17,9 +73,9 @@ class Game:
         # Create a ball object
         self.ball = Ball(-1, self)
 
-        # Create an empty list which will later store the details of currently playing impact
+        # Create an empty pool which will later store the details of currently playing impact
         # animations - these are displayed for a short time every time the ball bounces
-        self.impacts = []
+        self.impacts = ImpactPool()
 
         # Add an offset to the AI player's target Y position, so it won't aim to hit the ball exactly
         # in the centre of the bat
@@ -27,18 +83,59 @@ class Game:
 
         self.screen = screen
 
+        # Asset registry, and the adapters used to draw the simulation objects with its sprites. They are set up
+        # the first time the game is drawn, so that headless games never load any assets or import Pygame Zero
+        self.assets = None
+        self.sprites = None
+
+        # SoundDispatcher which plays the sound effects - see src/audio.py. Headless games have none, and are silent
+        self.audio = None
+
+        # Optional FrameProfiler timing each phase of update and draw - see src/profiler.py
+        self.profiler = None
+
+        # Optional EventLog recording serves, hits, bounces and points - see src/events.py
+        self.events = None
+
+        # The number of frames simulated
+        self.frame = 0
+
+        # The ball and the positions of the ball and bats before the most recent update, so that draw can show
+        # them part of the way between their previous and current positions - see sprite_positions
+        self.previous = None
+
+    @property
+    def finished(self):
+        """
+        bool: Whether one of the players has won, by scoring more than 9 points.
+        """
+        return max(self.bats[0].score, self.bats[1].score) > 9
+
     def update(self):
-        # Update all active objects
-        for obj in self.bats + [self.ball] + self.impacts:
-            obj.update()
-
-        # Remove any expired impact effects from the list. We go through the list backwards, starting from the last
-        # element, and delete any elements those time attribute has reached 10. We go backwards through the list
-        # instead of forwards to avoid a number of issues which occur in that scenario. In the next chapter we will
-        # look at an alternative technique for removing items from a list, using list comprehensions.
-        for i in range(len(self.impacts) - 1, -1, -1):
-            if self.impacts[i].time >= 10:
-                del self.impacts[i]
+        profiler = self.profiler
+        if profiler:
+            start = profiler.clock()
+
+        self.previous = (self.ball, self.ball.x, self.ball.y, self.bats[0].y, self.bats[1].y)
+
+        # Update all active objects - bats, ball and impact effects, in that order. Impacts created by the
+        # ball during this frame are not aged until the next one
+        for bat in self.bats:
+            bat.update()
+
+        if profiler:
+            start = profiler.add(PHASE_BATS, start)
+
+        self.ball.update()
+
+        if profiler:
+            start = profiler.add(PHASE_BALL, start)
+
+        # Age the impact effects, and remove any which have expired
+        self.impacts.update()
+
+        if profiler:
+            start = profiler.add(PHASE_IMPACTS, start)
 
         # Has ball gone off the left or right edge of the screen?
         if self.ball.is_out():
@@ -55,7 +152,10 @@ class Game:
             if self.bats[losing_player].timer < 0:
                 self.bats[scoring_player].score += 1
 
-                self.play_sound("score_goal", 1)
+                self.play_sound(SOUND_SCORE_GOAL)
+
+                if self.events:
+                    self.events.emit(self.frame, EVENT_POINT_SCORED, scoring_player, speed=self.ball.speed)
 
                 self.bats[losing_player].timer = 20
 
@@ -64,52 +164,289 @@ class Game:
                 direction = -1 if losing_player == 0 else 1
                 self.ball = Ball(direction, self)
 
-    def draw(self):
+                if self.events:
+                    self.events.emit(self.frame, EVENT_SERVE, 0 if direction < 0 else 1)
+
+        self.frame += 1
+
+        if profiler:
+            profiler.add(PHASE_SCORING, start)
+
+    def advance(self, frames):
+        """
+        Advances the game by a number of frames, like calling update that many times, but jumping straight over
+        the stretches of frames on which nothing happens.
+
+        Between significant events - a bat hit, a wall bounce, the ball going out or a new ball being served -
+        the ball moves in a straight line and the AI bats head for targets which follow simple formulas, so the
+        state after any number of such frames can be worked out directly - see Ball.fast_forward and
+        Bat.advance. The frames on which events happen are simulated with update, so the cost is proportional to
+        the number of events rather than the number of frames.
+
+        The result is not exact to the last bit. The AI bats' positions can differ from update's in their last
+        bits, and when the ball hits a bat, the difference carries over into the ball's path, which then drifts
+        very slightly from the course update would give it. As a rally goes on, that can eventually turn a hit
+        into a miss, so after many frames the game is a plausible continuation, but not necessarily the one update
+        would have produced. Only the ball's motion between hits is exact. Use update wherever a match must be
+        reproduced exactly, as replays and netplay do - headless AI-vs-AI tournaments can use this instead, see
+        src/tournament.py.
+
+        Only games where both bats are controlled by Bat.ai can be fast-forwarded, as other control functions
+        must be called every frame - for other games this just calls update repeatedly. The profiler does not
+        time fast-forwarded frames.
+
+        Args:
+            frames (int): The number of frames to advance by.
+        """
+        if any(bat.move_func != bat.ai for bat in self.bats):
+            for _ in range(frames):
+                self.update()
+            return
+
+        while frames > 0:
+            skipped = self._skip_idle_frames(frames)
+            if skipped:
+                frames -= skipped
+            else:
+                self.update()
+                frames -= 1
+
+    def _skip_idle_frames(self, max_frames):
+        """
+        Jumps over frames on which nothing but straight-line motion happens, up to max_frames of them.
+
+        Returns:
+            int: The number of frames skipped, which is 0 if the next frame must be simulated with update.
+        """
+        ball = self.ball
+
+        if ball.is_out():
+            # Once the ball is out, nothing happens until the timer of the player who missed it runs out, which
+            # update handles on the frame on which the timer reaches zero
+            losing_player = 0 if ball.x < WIDTH_PX // 2 else 1
+            max_frames = min(max_frames, self.bats[losing_player].timer - 1)
+
+        elif abs(ball.x - HALF_WIDTH_PX) >= 344:
+            # The ball is between a bat and the edge of the screen, and may go out on any frame
+            return 0
+
+        if max_frames <= 0:
+            return 0
+
+        # The bats update before the ball, so they see its position at the start of each frame
+        x, y = ball.x, ball.y
+        frames = ball.fast_forward(max_frames)
+        if frames:
+            for bat in self.bats:
+                bat.advance(frames, x, y, ball.speed * ball.dx, ball.speed * ball.dy)
+            self.impacts.update(frames)
+            self.frame += frames
+
+            # The positions before the last of the skipped frames aren't known, so don't interpolate
+            self.previous = None
+        return frames
+
+    def snapshot(self):
+        """
+        Packs the simulation state of the game - everything update depends on or changes - into a binary buffer.
+
+        The buffer has a fixed layout, described by SNAPSHOT_HEADER and SNAPSHOT_RNG, followed by the active impact
+        effects - see ImpactPool.snapshot. Nothing but numbers is copied, so a snapshot takes a few microseconds.
+        Most of its size is the state of the random number generator, which is needed for the game to carry on the
+        same way after a restore; it is only packed again once the generator has been used.
+
+        Returns:
+            bytes: The state, which can be passed to restore.
+        """
+        ball = self.ball
+        bat0, bat1 = self.bats
+        rng = self.rng
+        if rng.changes != self._rng_changes:
+            _, words, gauss = rng.getstate()
+            self._rng_state = SNAPSHOT_RNG.pack(*words, gauss is not None, gauss or 0.0)
+            self._rng_changes = rng.changes
+
+        return b"".join((SNAPSHOT_HEADER.pack(self.frame, ball.x, ball.y, ball.dx, ball.dy, ball.speed,
+                                              bat0.y, bat0.score, bat0.timer, bat0.frame,
+                                              bat1.y, bat1.score, bat1.timer, bat1.frame,
+                                              self.ai_offset),
+                         self._rng_state,
+                         self.impacts.snapshot()))
+
+    def restore(self, buffer):
+        """
+        Puts the game back into a state packed by snapshot.
+
+        Args:
+            buffer (bytes): The state returned by snapshot.
+        """
+        ball = self.ball
+        bat0, bat1 = self.bats
+        (self.frame, ball.x, ball.y, ball.dx, ball.dy, ball.speed,
+         bat0.y, bat0.score, bat0.timer, bat0.frame,
+         bat1.y, bat1.score, bat1.timer, bat1.frame,
+         self.ai_offset) = SNAPSHOT_HEADER.unpack_from(buffer)
+
+        # Snapshots taken close together usually hold the same generator state, which doesn't need restoring if
+        # the generator hasn't been used since
+        offset = SNAPSHOT_HEADER.size
+        rng_state = buffer[offset:offset + SNAPSHOT_RNG.size]
+        rng = self.rng
+        if rng.changes != self._rng_changes or rng_state != self._rng_state:
+            values = SNAPSHOT_RNG.unpack(rng_state)
+            rng.setstate((random.Random.VERSION, values[:625], values[626] if values[625] else None))
+            self._rng_state = bytes(rng_state)
+            self._rng_changes = rng.changes
+
+        self.impacts.restore(buffer, offset + SNAPSHOT_RNG.size)
+        self.previous = None
+
+    def draw(self, alpha=1.0, overlay=None):
+        """
+        Draws the game.
+
+        The table, 'just scored' effects and overlay are drawn from pre-composited copies, so the screen gets a
+        single full-screen blit, and the sprites are drawn from the sprite atlas - see src/atlas.py.
+
+        Args:
+            alpha (float, optional): How far between their positions before and after the most recent update to
+                draw the bats and ball - see sprite_positions. Defaults to their current positions.
+            overlay (pygame.Surface, optional): A full-screen image to draw on top of everything, such as the
+                menu or game over screen.
+        """
         if not self.screen:
             return
 
-        # Draw background
-        self.screen.blit("table", (0,0))
+        profiler = self.profiler
+        if profiler:
+            start = profiler.clock()
 
-        # Draw 'just scored' effects, if required
-        for p in (0,1):
-            if self.bats[p].timer > 0 and self.ball.is_out():
-                self.screen.blit("effect" + str(p), (0,0))
+        # Draw straight onto the screen's surface with the pre-resolved images, rather than by name
+        surface = self.screen.surface
+        assets = self.get_assets()
+        sprites = self.get_sprites()
+
+        # Work out the bats, ball and impact effects to draw - in that order
+        bat_positions, ball_pos = self.sprite_positions(alpha)
+        layers = [sprites.bat.place(bat, pos) for bat, pos in zip(self.bats, bat_positions)]
+        layers.append(sprites.ball.place(self.ball, ball_pos))
+        layers.extend(sprites.impact.place(impact) for impact in self.impacts)
+
+        if profiler:
+            start = profiler.add(PHASE_DRAW_SPRITES, start)
+
+        # And the scores
+        digits = assets.digits
+        layers.extend((digits[colour][digit], pos) for colour, digit, pos in self.score_digits())
+
+        if profiler:
+            start = profiler.add(PHASE_DRAW_DIGITS, start)
 
-        # Draw bats, ball and impact effects - in that order. Square brackets are needed around the ball because
-        # it's just an object, whereas the other two are lists - and you can't directly join an object onto a
-        # list without first putting it in a list
-        for obj in self.bats + [self.ball] + self.impacts:
-            obj.draw()
+        # Draw the background with the 'just scored' effects, if required, the sprites and digits, and the overlay.
+        # As the layers are drawn together, the profiler counts all of the blits as part of the background phase
+        effects = tuple(assets.effects[p] for p in self.effect_players())
+        sprites.static.draw(surface, effects, overlay, layers)
 
-        # Display scores - outer loop goes through each player
+        if profiler:
+            profiler.add(PHASE_DRAW_BACKGROUND, start)
+
+    def get_assets(self):
+        """
+        Returns the asset registry, loading it on first use.
+
+        Returns:
+            Assets: The registry - see src/assets.py.
+        """
+        if self.assets is None:
+            # Pygame imports
+            from src.assets import load_assets
+            self.assets = load_assets()
+        return self.assets
+
+    def get_sprites(self):
+        """
+        Returns the adapters used to draw the simulation objects, creating them on first use.
+
+        Returns:
+            Sprites: The adapters - see src/sprites.py.
+        """
+        if self.sprites is None:
+            # Local application imports
+            from src.sprites import Sprites
+            self.sprites = Sprites(self.get_assets())
+        return self.sprites
+
+    def sprite_positions(self, alpha=1.0):
+        """
+        Works out where to draw the bats and ball.
+
+        When the simulation runs at a fixed rate which differs from the rate at which frames are drawn - see
+        src/timestep.py - a frame is usually drawn part of the way between two updates. Drawing the bats and ball
+        part of the way between their positions before and after the most recent update keeps their motion smooth.
+
+        Args:
+            alpha (float, optional): 0 for the positions before the most recent update, 1 for the current
+                positions, or anything in between.
+
+        Returns:
+            tuple: (bat_positions, ball_pos) - the (x, y) positions of the two bats and of the ball.
+        """
+        ball = self.ball
+        bat_positions = [(bat.x, bat.y) for bat in self.bats]
+        ball_pos = (ball.x, ball.y)
+
+        if alpha < 1 and self.previous:
+            previous_ball, ball_x, ball_y, *bat_ys = self.previous
+            bat_positions = [(bat.x, y + (bat.y - y) * alpha) for bat, y in zip(self.bats, bat_ys)]
+
+            # If a new ball was served by the most recent update, it has no previous position
+            if previous_ball is ball:
+                ball_pos = (ball_x + (ball.x - ball_x) * alpha, ball_y + (ball.y - ball_y) * alpha)
+
+        return bat_positions, ball_pos
+
+    def effect_players(self):
+        """
+        Lists the full-screen 'just scored' effects to draw over the background.
+
+        Returns:
+            list: The players who have just conceded a point, whose effect images - Assets.effects - are drawn.
+        """
+        return [p for p in (0,1) if self.bats[p].timer > 0 and self.ball.is_out()]
+
+    def score_digits(self):
+        """
+        Lists the score digits to draw.
+
+        Returns:
+            list: (colour, digit, pos) tuples giving the indices into Assets.digits and the position of each of the
+            four digit images.
+        """
+        digits = []
+
+        # Outer loop goes through each player
         for p in (0,1):
-            # Convert score into a string of 2 digits (e.g. "05") so we can later get the individual digits
-            score = "{0:02d}".format(self.bats[p].score)
-            # Inner loop goes through each digit
-            for i in (0,1):
-                # Digit sprites are numbered 00 to 29, where the first digit is the colour (0 = grey,
-                # 1 = blue, 2 = green) and the second digit is the digit itself
-                # Colour is usually grey but turns red or green (depending on player number) when a
-                # point has just been scored
-                colour = "0"
-                other_p = 1 - p
-                if self.bats[other_p].timer > 0 and self.ball.is_out():
-                    colour = "2" if p == 0  else "1"
-                image = "digit" + colour + str(score[i])
-                self.screen.blit(image, (255 + (160 * p) + (i * 55), 46))
-
-    def play_sound(self, name, count=1):
-        # Some sounds have multiple varieties. If count > 1, we'll randomly choose one from those
-        # We don't play any in-game sound effects if player 0 is an AI player - as this means we're on the menu
-        if self.bats[0].move_func != self.bats[0].ai:
-            # Pygame Zero allows you to write things like 'sounds.explosion.play()'
-            # This automatically loads and plays a file named 'explosion.wav' (or .ogg) from the sounds folder (if
-            # such a file exists)
-            # But what if you have files named 'explosion0.ogg' to 'explosion5.ogg' and want to randomly choose
-            # one of them to play? You can generate a string such as 'explosion3', but to use such a string
-            # to access an attribute of Pygame Zero's sounds object, we must use Python's built-in function getattr
-            try:
-                getattr(sounds, name + str(random.randint(0, count - 1))).play()
-            except:
-                pass
\ No newline at end of file
+            # Split the score into its 2 digits (e.g. 5 becomes 0 and 5). Only the first 2 digits of a score of 100
+            # or more - which the AIs can reach on the menu - are shown
+            score = self.bats[p].score
+            while score >= 100:
+                score //= 10
+            tens, units = divmod(score, 10)
+
+            # Colour is usually grey (0) but turns blue (1) or green (2), depending on player number, when a
+            # point has just been scored
+            colour = 0
+            other_p = 1 - p
+            if self.bats[other_p].timer > 0 and self.ball.is_out():
+                colour = 2 if p == 0 else 1
+            digits.append((colour, tens, (255 + (160 * p), 46)))
+            digits.append((colour, units, (255 + (160 * p) + 55, 46)))
+
+        return digits
+
+    def play_sound(self, sound_id):
+        # Sounds are only queued here, and played together at the end of the frame - see src/audio.py
+        # We don't play any in-game sound effects if player 0 is an AI player - as this means we're on the menu,
+        # or if the game has no sound dispatcher - as this means it is headless
+        if self.audio is not None and self.bats[0].move_func != self.bats[0].ai:
+            self.audio.request(sound_id)
@@ -0,0 +1,139 @@
+# Standard library imports
+import asyncio
+import itertools
+
+# Local application imports
+from src.session import Session
+from src.timestep import FixedTimestep
+
+# Local application constants
+from src.constants import SIMULATION_RATE, MAX_CATCH_UP_STEPS
+
+
+class SessionHost:
+    """
+    Runs many headless sessions in one process, updating them all at a fixed rate from an asyncio event loop.
+
+    Each session has its own input queue, which whatever receives the players' input - a network protocol, a
+    cabinet's controller reader - fills from its own coroutines or callbacks, while run is waiting for the next
+    tick. Each item put on a queue is the bit mask of keys held down from then on - see src/session.py. On each
+    tick, a session's queue is emptied and the session is given every key which was held down at any point since
+    the previous tick, so a key pressed and released between two ticks still counts as pressed.
+
+    The ticks are timed with a FixedTimestep, as in main.py: if the event loop wakes up late, the missing ticks are
+    run straight away, up to the catch-up limit, and any further ones are dropped. A tick which runs more than one
+    period after it was due, or is dropped, has missed its deadline - the players would see the game stutter -
+    and is counted in missed.
+
+    Attributes:
+        sessions (dict): The sessions, by id.
+        timestep (FixedTimestep): The scheduler timing the ticks.
+        ticks (int): The number of ticks run - each updates every session once.
+        busy (float): The total time spent running ticks, in seconds.
+    """
+
+    def __init__(self, rate=SIMULATION_RATE, max_steps=MAX_CATCH_UP_STEPS):
+        """
+        Initializes a host without any sessions.
+
+        Args:
+            rate (float, optional): The number of ticks per second.
+            max_steps (int, optional): The maximum number of late ticks run at once to catch up.
+        """
+        self.sessions = {}
+        self.timestep = FixedTimestep(rate, max_steps)
+        self.ticks = 0
+        self.busy = 0.0
+
+        self._queues = {}
+        self._held = {}
+        self._ids = itertools.count()
+        self._late = 0
+        self._running = False
+
+    @property
+    def missed(self):
+        """
+        int: The number of ticks which missed their deadline.
+        """
+        return self._late + self.timestep.dropped
+
+    def add(self, **options):
+        """
+        Creates a new session, on the menu.
+
+        Args:
+            **options: Passed on to Session - e.g. arena_balls or replay_dir.
+
+        Returns:
+            int: The id of the session.
+        """
+        session_id = next(self._ids)
+        self.sessions[session_id] = Session(**options)
+        self._queues[session_id] = asyncio.Queue()
+        self._held[session_id] = 0
+        return session_id
+
+    def remove(self, session_id):
+        """
+        Stops running a session and discards it.
+        """
+        del self.sessions[session_id]
+        del self._queues[session_id]
+        del self._held[session_id]
+
+    def queue(self, session_id):
+        """
+        Returns the input queue of a session.
+
+        Returns:
+            asyncio.Queue: The queue, on which to put the bit mask of the keys held down whenever it changes.
+        """
+        return self._queues[session_id]
+
+    def tick(self):
+        """
+        Updates every session once, with the input received since the previous tick.
+        """
+        held = self._held
+        for session_id, session in self.sessions.items():
+            queue = self._queues[session_id]
+            inputs = held[session_id]
+            while not queue.empty():
+                held[session_id] = queue.get_nowait()
+                inputs |= held[session_id]
+            session.tick(inputs)
+        self.ticks += 1
+
+    async def run(self, duration=None):
+        """
+        Ticks the sessions at a fixed rate until stop is called.
+
+        Args:
+            duration (float, optional): Stop after this many seconds.
+        """
+        clock = asyncio.get_running_loop().time
+        timestep = self.timestep
+        start = last = clock()
+        self._running = True
+
+        while self._running and (duration is None or last - start < duration):
+            now = clock()
+            steps = timestep.advance(now - last)
+            last = now
+
+            # Only the first of several ticks due at once is on time
+            self._late += max(0, steps - 1)
+            for _ in range(steps):
+                self.tick()
+
+            # Wait until the next tick is due, letting the input queues fill in the meantime
+            elapsed = clock() - now
+            self.busy += elapsed
+            await asyncio.sleep(max(0.0, timestep.step - timestep.accumulator - elapsed))
+
+    def stop(self):
+        """
+        Makes run return before its next tick.
+        """
+        self._running = False
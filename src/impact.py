@@ -1,40 +1,142 @@
-# Pygame imports
-from pgzero.actor import Actor
+# Standard library imports
+import struct
+from array import array
 
+# Local application constants
+from src.constants import IMPACT_LIFETIME, IMPACT_POOL_CAPACITY
 
-class Impact(Actor):
+# Snapshots of the pool start with the frame and the number of active impacts, followed by the X positions, Y
+# positions and birth frames of the active impacts, oldest first - see ImpactPool.snapshot
+SNAPSHOT_HEADER = struct.Struct("<qI")
+
+
+class ImpactPool:
     """
-    A class to represent an impact effect in the game when a ball bounces.
+    A fixed-capacity pool of the impact effects shown for a short time every time the ball bounces.
+
+    This class only holds the simulation state of the effects - their positions and ages - so that headless games
+    never need to load any sprites. The adapter used to draw them lives in src/sprites.py. Each impact effect
+    changes its sprite every 2 frames and is removed from the game after IMPACT_LIFETIME frames.
+
+    Rather than creating an object for each impact and deleting it from a list when it expires, the pool keeps the
+    impacts in preallocated arrays used as a ring buffer, whose slots are recycled. Every impact lives for the same
+    number of frames, so impacts always expire in the order they were created - the oldest is always at the head of
+    the ring and new ones are added at its tail. Instead of an age which would have to be incremented for every
+    impact each frame, the pool stores the frame on which each impact was created, so advancing the pool by a frame
+    only touches the impacts which expire.
 
-    This class inherits from the Actor class and is used to create and update
-    impact effects at a given position. The impact effect changes its sprite
-    every 2 frames and is removed from the game after 10 frames.
+    Iterating over the pool gives an (x, y, time) tuple for each active impact, oldest first, where time is the
+    number of frames since the impact was created - 0 until the first update after it was added.
 
     Attributes:
-        time (int): A counter to track the number of frames since the impact was created.
+        capacity (int): The maximum number of active impacts. If an impact is added to a full pool, the oldest one
+            is dropped.
+        frame (int): The number of times the pool has been updated.
     """
 
-    def __init__(self, pos):
+    __slots__ = ("capacity", "frame", "_x", "_y", "_born", "_head", "_count")
+
+    def __init__(self, capacity=IMPACT_POOL_CAPACITY):
+        """
+        Initializes an empty pool.
+
+        Args:
+            capacity (int, optional): The maximum number of active impacts.
+        """
+        self.capacity = capacity
+        self.frame = 0
+        self._x = array("d", bytes(8 * capacity))
+        self._y = array("d", bytes(8 * capacity))
+        self._born = array("q", bytes(8 * capacity))
+        self._head = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for i in range(self._count):
+            slot = (self._head + i) % self.capacity
+            yield self._x[slot], self._y[slot], self.frame - self._born[slot]
+
+    def add(self, x, y):
+        """
+        Creates an impact effect.
+
+        Args:
+            x, y (float): The position where the impact effect should be created.
         """
-        Initializes the Impact instance with a position and sets the initial time to 0.
+        if self._count == self.capacity:
+            # Recycle the oldest impact's slot
+            self._head = (self._head + 1) % self.capacity
+            self._count -= 1
+
+        slot = (self._head + self._count) % self.capacity
+        self._x[slot] = x
+        self._y[slot] = y
+
+        # Impacts created during a frame are not aged until the next update, so their time is still 0 after this
+        # frame's update
+        self._born[slot] = self.frame + 1
+        self._count += 1
+
+    def update(self, frames=1):
+        """
+        Ages every impact effect, and removes those which have reached the end of their lifetime.
 
         Args:
-            pos (tuple): The (x, y) position where the impact effect should be created.
+            frames (int, optional): The number of frames to age the impacts by.
+        """
+        self.frame += frames
+        while self._count and self.frame - self._born[self._head] >= IMPACT_LIFETIME:
+            self._head = (self._head + 1) % self.capacity
+            self._count -= 1
+
+    def clear(self):
         """
-        super().__init__("blank", pos)
-        self.time = 0
+        Removes every impact effect.
+        """
+        self._count = 0
+
+    def snapshot(self):
+        """
+        Packs the state of the pool into a compact binary buffer.
+
+        Only the active impacts are stored, so the buffer is SNAPSHOT_HEADER.size bytes plus 24 bytes per impact.
+        The arrays are copied out with slicing rather than an element at a time.
 
-    def update(self):
+        Returns:
+            bytes: The state, which can be passed to restore.
         """
-        Updates the impact effect by changing its sprite every 2 frames and increments the time counter.
+        head = self._head
+        end = head + self._count
+        if end <= self.capacity:
+            x, y, born = self._x[head:end], self._y[head:end], self._born[head:end]
+        else:
+            # The active impacts wrap around the end of the ring
+            end -= self.capacity
+            x = self._x[head:] + self._x[:end]
+            y = self._y[head:] + self._y[:end]
+            born = self._born[head:] + self._born[:end]
+        return SNAPSHOT_HEADER.pack(self.frame, self._count) + x.tobytes() + y.tobytes() + born.tobytes()
 
-        The sprite is updated based on the current time divided by 2. If the time exceeds 10, the impact 
-        effect is removed from the game by the Game class, which maintains a list of Impact instances.
+    def restore(self, buffer, offset=0):
+        """
+        Puts the pool back into a state packed by snapshot.
+
+        Args:
+            buffer (bytes): A buffer holding the state returned by snapshot.
+            offset (int, optional): The position of the state in the buffer.
         """
-        
-        # Impact sprites are numbered 0 to 4 (e.g. /images/impact0.png). We update to a new sprite 
-        # every 2 frames by using integer division.
-        self.image = "impact" + str(self.time // 2)
+        self.frame, count = SNAPSHOT_HEADER.unpack_from(buffer, offset)
+        if count > self.capacity:
+            raise ValueError(f"Snapshot holds {count} impacts, but the pool's capacity is {self.capacity}")
 
-        # Increment the time counter
-        self.time += 1
+        # The impacts are restored to the start of the ring, by copying the bytes straight into the arrays
+        size = 8 * count
+        offset += SNAPSHOT_HEADER.size
+        for values in (self._x, self._y, self._born):
+            memoryview(values).cast("B")[:size] = memoryview(buffer)[offset:offset + size]
+            offset += size
+        self._head = 0
+        self._count = count
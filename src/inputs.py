@@ -0,0 +1,257 @@
+# Standard library imports
+import json
+import time
+from array import array
+from collections import deque
+
+# Pygame imports
+import pygame
+
+# Local application imports
+from src.session import INPUT_SPACE, INPUT_UP, INPUT_DOWN, INPUT_A, INPUT_Z, INPUT_K, INPUT_M
+
+# The player each key belongs to, and its bit in the input mask Session.tick takes. The space key, which works the
+# menu and game over screen, belongs to player 1
+KEY_INPUTS = {
+    pygame.K_SPACE: (0, INPUT_SPACE),
+    pygame.K_UP: (0, INPUT_UP),
+    pygame.K_DOWN: (0, INPUT_DOWN),
+    pygame.K_a: (0, INPUT_A),
+    pygame.K_z: (0, INPUT_Z),
+    pygame.K_k: (1, INPUT_K),
+    pygame.K_m: (1, INPUT_M),
+}
+
+# Latencies are counted in buckets of this many milliseconds, up to the last bucket, which also counts everything
+# longer
+LATENCY_BUCKET_MS = 0.5
+LATENCY_BUCKETS = 400
+
+# The overlay's statistics are recomputed every this many frames
+OVERLAY_REFRESH_FRAMES = 30
+
+
+class LatencyHistogram:
+    """
+    Histogram of latencies, with fixed-width buckets held in a preallocated array, so that recording a latency is
+    a division and an index, and never allocates.
+
+    Attributes:
+        count (int): The number of latencies recorded.
+        total (float): The sum of the latencies recorded, in seconds.
+        max (float): The longest latency recorded, in seconds.
+        buckets (array): The number of latencies in each bucket - see LATENCY_BUCKET_MS.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = array("q", bytes(8 * LATENCY_BUCKETS))
+
+    def add(self, latency):
+        """
+        Records a latency.
+
+        Args:
+            latency (float): The latency in seconds.
+        """
+        latency = max(0.0, latency)
+        self.count += 1
+        self.total += latency
+        self.max = max(self.max, latency)
+        self.buckets[min(LATENCY_BUCKETS - 1, int(latency * 1000 / LATENCY_BUCKET_MS))] += 1
+
+    def percentile(self, percent):
+        """
+        Returns the latency below which a percentage of the recorded latencies fall, to the nearest bucket.
+
+        Args:
+            percent (float): The percentage, from 0 to 100.
+
+        Returns:
+            float: The upper edge of the bucket holding that latency, or the longest latency if that is shorter, in
+            milliseconds - or 0 if nothing has been recorded.
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, self.count * percent / 100)
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                break
+        return min((bucket + 1) * LATENCY_BUCKET_MS, self.max * 1000)
+
+    def stats(self):
+        """
+        Summarises the recorded latencies.
+
+        Returns:
+            dict: The number of latencies, and the mean, 50th, 99th percentile and maximum in milliseconds.
+        """
+        return {"count": self.count,
+                "mean": self.total / self.count * 1000 if self.count else 0.0,
+                "p50": self.percentile(50),
+                "p99": self.percentile(99),
+                "max": self.max * 1000}
+
+
+class KeyEventQueue:
+    """
+    Input layer which turns key events into the input mask for each update, and measures how long input takes to
+    reach the simulation and the screen.
+
+    Polling the keyboard once per frame, as Pygame Zero's keyboard object does, only sees the keys held down at that
+    moment: a key pressed and released between two frames is lost, and every press seems to happen at the start of
+    a frame. Instead, each key event is timestamped with a high-resolution clock as it arrives and put on its
+    player's queue - so that each player's events could come from a separate controller, with timestamps of its
+    own. Each update takes the events which happened up to the time it stands for off the queues, in order, and is
+    given every key which was held down at any point since the previous update - as SessionHost does with its
+    input queues - so a quick tap still counts as a press.
+
+    For every event, the time from its timestamp to the update which took it off the queue is recorded as its
+    input-to-simulation latency, and the time to the end of the next presented frame - which shows the outcome of
+    that update - as its input-to-present latency.
+
+    Pygame doesn't pass on the time at which SDL received an event, so events handed over by Pygame Zero are
+    timestamped when they are dispatched, at the start of the frame after they happened. Their latencies are
+    therefore measured from then, and leave out the up to one frame they spent waiting to be dispatched.
+
+    Attributes:
+        clock (callable): The clock timestamps come from, in seconds.
+        simulation (LatencyHistogram): The input-to-simulation latencies.
+        present (LatencyHistogram): The input-to-present latencies.
+        frames (int): The number of frames presented.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        """
+        Initializes the input layer with no keys held down.
+
+        Args:
+            clock (callable, optional): The clock to timestamp events with.
+        """
+        self.clock = clock
+        self.simulation = LatencyHistogram()
+        self.present = LatencyHistogram()
+        self.frames = 0
+
+        # For each player, the queue of (timestamp, bit, down) events not yet taken by an update, and the keys held
+        # down as of the most recent update
+        self._queues = (deque(), deque())
+        self._held = [0, 0]
+
+        # The timestamps of the events taken by updates since the most recent presented frame
+        self._unpresented = []
+
+        self._overlay = None
+
+    def key_down(self, key, timestamp=None):
+        """
+        Queues a key being pressed.
+
+        Args:
+            key (int): The Pygame key code. Keys which aren't in KEY_INPUTS are ignored.
+            timestamp (float, optional): When the key was pressed, from the clock. Defaults to now.
+        """
+        self._queue(key, True, timestamp)
+
+    def key_up(self, key, timestamp=None):
+        """
+        Queues a key being released.
+
+        Args:
+            key (int): The Pygame key code. Keys which aren't in KEY_INPUTS are ignored.
+            timestamp (float, optional): When the key was released, from the clock. Defaults to now.
+        """
+        self._queue(key, False, timestamp)
+
+    def _queue(self, key, down, timestamp):
+        if key in KEY_INPUTS:
+            player, bit = KEY_INPUTS[key]
+            self._queues[player].append((self.clock() if timestamp is None else timestamp, bit, down))
+
+    def tick(self, until=None):
+        """
+        Takes the input for one update off the players' queues.
+
+        Args:
+            until (float, optional): The time the update stands for, from the clock - events after it are left for
+                later updates. Defaults to taking every queued event.
+
+        Returns:
+            int: Bit mask of the INPUT_ constants for every key held down at any point since the previous update -
+            see Session.tick.
+        """
+        now = self.clock()
+        inputs = 0
+        for player, queue in enumerate(self._queues):
+            # Keys held down when the previous update happened count, even if they have since been released
+            held = self._held[player]
+            held_since = held
+            while queue and (until is None or queue[0][0] <= until):
+                timestamp, bit, down = queue.popleft()
+                if down:
+                    held |= bit
+                    held_since |= bit
+                else:
+                    held &= ~bit
+                self.simulation.add(now - timestamp)
+                self._unpresented.append(timestamp)
+            self._held[player] = held
+            inputs |= held_since
+        return inputs
+
+    def presented(self):
+        """
+        Records that a frame showing the outcome of every update so far has been presented.
+        """
+        now = self.clock()
+        for timestamp in self._unpresented:
+            self.present.add(now - timestamp)
+        self._unpresented.clear()
+        self.frames += 1
+
+    def stats(self):
+        """
+        Summarises the recorded latencies.
+
+        Returns:
+            dict: The statistics of the input-to-simulation and input-to-present latencies - see
+            LatencyHistogram.stats.
+        """
+        return {"simulation": self.simulation.stats(), "present": self.present.stats()}
+
+    def dump(self, path):
+        """
+        Writes the statistics and the histograms to a JSON file.
+
+        Args:
+            path (str): The file to write.
+        """
+        with open(path, "w") as file:
+            json.dump({"stats": self.stats(),
+                       "bucket_ms": LATENCY_BUCKET_MS,
+                       "histograms": {"simulation": list(self.simulation.buckets),
+                                      "present": list(self.present.buckets)}},
+                      file)
+
+    def draw(self, screen):
+        """
+        Draws an overlay showing the latency percentiles.
+
+        Args:
+            screen (Screen): The Pygame Zero screen to draw on.
+        """
+
+        # Going through the histograms takes a while, so the text is only rebuilt every few frames
+        if self._overlay is None or self.frames % OVERLAY_REFRESH_FRAMES == 0:
+            lines = ["{:<12}{:>7}{:>7}{:>7}{:>7}".format("input ms", "mean", "p50", "p99", "max")]
+            for name, stats in self.stats().items():
+                lines.append("{:<12}{:>7.1f}{:>7.1f}{:>7.1f}{:>7.1f}".format(name, stats["mean"], stats["p50"],
+                                                                            stats["p99"], stats["max"]))
+            lines.append("events {}".format(self.simulation.count))
+            self._overlay = "\n".join(lines)
+
+        screen.draw.text(self._overlay, topleft=(70, 360), fontsize=18, color="yellow")
@@ -0,0 +1,451 @@
+# Standard library imports
+import argparse
+import heapq
+import random
+import socket
+import struct
+import time
+
+# Local application imports
+from src.game import Game
+from src.replay import MOVES, Replay
+
+# The local game may run at most this many frames ahead of the last input received from the remote player,
+# which bounds both the number of snapshots kept and the number of frames re-simulated by a rollback
+MAX_ROLLBACK_FRAMES = 8
+
+# Packets are made up of this header - magic bytes, the number of the sender's frames whose remote input it has
+# received, and the frame of the first input in the packet and the number of inputs - followed by one move code
+# per input
+PACKET = struct.Struct("<2sIIB")
+PACKET_MAGIC = b"PN"
+
+# Up to this many inputs are sent in each packet
+MAX_INPUTS_PER_PACKET = 255
+
+
+class UdpTransport:
+    """
+    Non-blocking UDP socket exchanging datagrams with a single peer.
+
+    To try out networked play on a single machine, the transport can simulate a poor connection: each datagram
+    sent can be dropped with a given probability, or held back for a given latency plus a random jitter - which
+    also reorders datagrams - before it is actually sent.
+
+    Attributes:
+        peer (tuple): The (host, port) address datagrams are sent to.
+        latency (float): Artificial delay added to every datagram, in seconds.
+        jitter (float): Maximum random extra delay added to every datagram, in seconds.
+        loss (float): Probability of dropping each datagram.
+    """
+
+    # Large enough for any packet
+    MAX_DATAGRAM = 2048
+
+    def __init__(self, bind, peer, latency=0.0, jitter=0.0, loss=0.0, seed=None):
+        """
+        Opens the socket.
+
+        Args:
+            bind (tuple): The local (host, port) address to receive on. Port 0 picks any free port.
+            peer (tuple): The (host, port) address of the peer.
+            latency (float, optional): Artificial delay in seconds.
+            jitter (float, optional): Maximum random extra delay in seconds.
+            loss (float, optional): Probability of dropping each datagram.
+            seed (int, optional): Seed for the generator deciding which datagrams are dropped or delayed.
+        """
+        self.peer = peer
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self._rng = random.Random(seed)
+        self._delayed = []
+        self._sequence = 0
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(bind)
+        self.socket.setblocking(False)
+
+    @property
+    def address(self):
+        """
+        tuple: The local (host, port) address the socket is bound to.
+        """
+        return self.socket.getsockname()
+
+    def send(self, data):
+        """
+        Sends a datagram to the peer, subject to the simulated packet loss and latency.
+
+        Args:
+            data (bytes): The datagram.
+        """
+        if self.loss and self._rng.random() < self.loss:
+            return
+
+        if self.latency or self.jitter:
+            # The sequence number keeps datagrams due at the same moment in the order they were sent
+            due = time.monotonic() + self.latency + self._rng.uniform(0, self.jitter)
+            heapq.heappush(self._delayed, (due, self._sequence, data))
+            self._sequence += 1
+            self.flush()
+        else:
+            self._send_now(data)
+
+    def flush(self):
+        """
+        Sends the delayed datagrams which are due.
+        """
+        now = time.monotonic()
+        while self._delayed and self._delayed[0][0] <= now:
+            self._send_now(heapq.heappop(self._delayed)[2])
+
+    def _send_now(self, data):
+        try:
+            self.socket.sendto(data, self.peer)
+        except OSError:
+            # Like a lost packet - e.g. the peer isn't listening yet
+            pass
+
+    def receive(self):
+        """
+        Returns the datagrams received since the last call, without blocking.
+
+        Returns:
+            list: The datagrams, as bytes.
+        """
+        self.flush()
+        datagrams = []
+        while True:
+            try:
+                datagrams.append(self.socket.recv(self.MAX_DATAGRAM))
+            except (BlockingIOError, ConnectionRefusedError):
+                return datagrams
+
+    def close(self):
+        """
+        Closes the socket.
+        """
+        self.socket.close()
+
+
+class _FrameEvents:
+    # Stands in for an EventLog, keeping the events of each frame - see RollbackSession._simulate
+
+    def __init__(self):
+        self.frames = {}
+        self.current = None
+
+    def emit(self, frame, kind, player=-1, x=0.0, y=0.0, speed=0, value=0.0, dy=0.0):
+        self.current.append((frame, kind, player, x, y, speed, value, dy))
+
+
+class _EventRecorder:
+    # Stands in for an EventLog, keeping every event in a list
+
+    def __init__(self):
+        self.events = []
+
+    def emit(self, frame, kind, player=-1, x=0.0, y=0.0, speed=0, value=0.0, dy=0.0):
+        self.events.append((frame, kind, player, x, y, speed, value, dy))
+
+
+class RollbackSession:
+    """
+    Networked two-player match using rollback.
+
+    Each peer runs the same seeded Game and exchanges only the players' inputs. The local player's input is
+    applied on the frame it is made, without waiting for the network. The remote player's input for frames which
+    haven't been heard from yet is predicted - the remote player is assumed to keep making the move they made last.
+    When the real input arrives and differs from the prediction, the game is rolled back to a snapshot taken before
+    the mispredicted frame and re-simulated up to the present with the corrected input. Sound effects are only
+    played when a frame is simulated for the first time. The events of a frame which may still be re-simulated may
+    turn out never to have happened, so if the game has an event log, each frame's events are held back, and
+    replaced if the frame is re-simulated, until the remote player's input for the frame has been received - the
+    log then only records what actually happened, in order.
+
+    Inputs are sent as move codes, one byte per frame, as in replays. Every packet carries all the local inputs the
+    peer hasn't acknowledged yet, so a lost packet is made up for by the next one. If no input is heard from the
+    peer for MAX_ROLLBACK_FRAMES frames, the session stops advancing until it is.
+
+    Attributes:
+        game (Game): The game being played.
+        local_player (int): The player controlled on this peer - 0 or 1.
+        frame (int): The number of frames simulated.
+        confirmed (int): The number of frames for which the remote player's input has been received.
+        moves (list): For each player, a bytearray with the move code used on each simulated frame. The remote
+            player's codes from frame confirmed onwards are predictions.
+        rollbacks (int): The number of rollbacks performed.
+        resimulated (int): The total number of frames re-simulated by rollbacks.
+        events (EventLog): The game's event log, which the confirmed frames' events are passed on to, or None.
+    """
+
+    def __init__(self, game, local_player, transport, local_input):
+        """
+        Initializes the session, taking over the control functions of both of the game's bats.
+
+        Args:
+            game (Game): A new game, created with the same seed on both peers.
+            local_player (int): The player controlled on this peer.
+            transport (UdpTransport): The connection to the peer.
+            local_input (callable): Returns the local player's move for the current frame, like the control
+                functions passed to Game.
+        """
+        self.game = game
+        self.local_player = local_player
+        self.remote_player = 1 - local_player
+        self.transport = transport
+        self.local_input = local_input
+
+        self.frame = 0
+        self.confirmed = 0
+        self.moves = [bytearray(), bytearray()]
+        self.rollbacks = 0
+        self.resimulated = 0
+
+        # Remote inputs received for frames which haven't been simulated yet, by frame
+        self._received = {}
+
+        # The number of local inputs the peer has acknowledged
+        self._acknowledged = 0
+
+        # The state of the game before each frame which may still need to be re-simulated, by frame
+        self._snapshots = {}
+
+        # The frame being simulated, whose moves the bats' control functions return
+        self._simulating = 0
+
+        # Stands in for the game's event log, holding the events of the frames which aren't confirmed yet
+        self.events = None
+        self._frame_events = _FrameEvents()
+
+        for player in (0, 1):
+            game.bats[player].move_func = self._control(player)
+
+    def _control(self, player):
+        moves = self.moves[player]
+        return lambda: MOVES[moves[self._simulating]]
+
+    @property
+    def settled(self):
+        """
+        bool: Whether every simulated frame used the remote player's actual input, so the game's state can't be
+        changed by a rollback.
+        """
+        return self.confirmed >= self.frame
+
+    def advance(self):
+        """
+        Simulates the next frame - reading the local input, exchanging inputs with the peer and rolling back if an
+        earlier prediction turned out to be wrong.
+
+        Returns:
+            bool: True if a frame was simulated, or False if the session is waiting for the peer.
+        """
+        self._correct()
+
+        if self.frame - self.confirmed >= MAX_ROLLBACK_FRAMES:
+            # Too far ahead of the peer - keep sending our inputs, but wait for theirs
+            self._send()
+            return False
+
+        self.moves[self.local_player].append(MOVES.index(self.local_input()))
+        self._send()
+
+        self._simulate(self.frame)
+        self.frame += 1
+        self._record_events()
+
+        # Snapshots before the first unconfirmed frame will never be needed again
+        for frame in [frame for frame in self._snapshots if frame < self.confirmed]:
+            del self._snapshots[frame]
+
+        return True
+
+    def poll(self):
+        """
+        Exchanges inputs with the peer and rolls back if an earlier prediction turned out to be wrong, without
+        simulating a new frame - e.g. to settle the last frames of a match which has ended locally.
+        """
+        self._correct()
+        self._send()
+
+    def _correct(self):
+        # Applies the inputs received from the peer, re-simulating the frames which used wrong predictions
+        rollback_frame = self._receive()
+        if rollback_frame is not None:
+            self._rollback(rollback_frame)
+        self._record_events()
+
+    def _receive(self):
+        # Applies the inputs received from the peer, and returns the first frame which was simulated with a wrong
+        # prediction, if any
+        rollback_frame = None
+        remote_moves = self.moves[self.remote_player]
+
+        for datagram in self.transport.receive():
+            if len(datagram) < PACKET.size:
+                continue
+            magic, acknowledged, first, count = PACKET.unpack_from(datagram)
+            if magic != PACKET_MAGIC:
+                continue
+
+            self._acknowledged = max(self._acknowledged, acknowledged)
+            for i, move in enumerate(datagram[PACKET.size:PACKET.size + count]):
+                if first + i >= self.confirmed:
+                    self._received[first + i] = move
+
+        # Confirm the received inputs in order
+        while self.confirmed in self._received:
+            move = self._received.pop(self.confirmed)
+            if self.confirmed < self.frame:
+                if remote_moves[self.confirmed] != move:
+                    remote_moves[self.confirmed] = move
+                    if rollback_frame is None:
+                        rollback_frame = self.confirmed
+            else:
+                remote_moves.append(move)
+            self.confirmed += 1
+
+        return rollback_frame
+
+    def _send(self):
+        # Sends every local input the peer hasn't acknowledged, together with our own acknowledgement
+        local_moves = self.moves[self.local_player]
+        first = self._acknowledged
+        moves = local_moves[first:first + MAX_INPUTS_PER_PACKET]
+        self.transport.send(PACKET.pack(PACKET_MAGIC, self.confirmed, first, len(moves)) + moves)
+
+    def _rollback(self, frame):
+        # Goes back to the state before the given frame, and simulates up to the present again. Only the remote
+        # player's predictions from that frame onwards may have been wrong, so they are predicted again too
+        self.rollbacks += 1
+        self.resimulated += self.frame - frame
+        self.game.restore(self._snapshots[frame])
+
+        remote_moves = self.moves[self.remote_player]
+        for resimulated in range(frame, self.frame):
+            if resimulated >= self.confirmed:
+                remote_moves[resimulated] = remote_moves[resimulated - 1]
+
+            # Sounds were played when the frame was first simulated
+            game = self.game
+            audio = game.audio
+            game.audio = None
+            self._simulate(resimulated)
+            game.audio = audio
+
+    def _simulate(self, frame):
+        # Simulates a frame, predicting the remote player's input if it hasn't been received
+        remote_moves = self.moves[self.remote_player]
+        if frame >= len(remote_moves):
+            remote_moves.append(remote_moves[frame - 1] if frame else MOVES.index(0))
+
+        # The game's events go to the stand-in, under this frame - any events from an earlier simulation of it are
+        # replaced. The log may have been given to the game since the previous frame, e.g. by Session
+        game = self.game
+        if game.events is not self._frame_events:
+            self.events = game.events
+        if self.events:
+            self._frame_events.current = self._frame_events.frames[frame] = []
+            game.events = self._frame_events
+
+        self._snapshots[frame] = game.snapshot()
+        self._simulating = frame
+        game.update()
+
+    def _record_events(self):
+        # Passes the events of the frames which have been confirmed, and so will never be re-simulated, on to the
+        # event log, in order
+        frames = self._frame_events.frames
+        if frames and min(frames) < self.confirmed:
+            for frame in sorted(frame for frame in frames if frame < self.confirmed):
+                for event in frames.pop(frame):
+                    self.events.emit(*event)
+
+    def to_replay(self, seed):
+        """
+        Creates a replay of the frames simulated so far with the players' actual inputs.
+
+        Args:
+            seed (int): The seed the game was created with.
+
+        Returns:
+            Replay: The replay, covering the frames for which the remote player's input has been received.
+        """
+        replay = Replay(seed, human=(True, True))
+        replay.moves = [bytearray(moves[:self.confirmed]) for moves in self.moves]
+        return replay
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play a networked match between two scripted players over UDP on "
+                                                 "this machine, and check both peers end up in the same state.")
+    parser.add_argument("--frames", type=int, default=3000, help="frames to play")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the game")
+    parser.add_argument("--latency-ms", type=float, default=50, help="artificial one-way latency")
+    parser.add_argument("--jitter-ms", type=float, default=10, help="maximum artificial extra latency")
+    parser.add_argument("--loss", type=float, default=0.05, help="probability of dropping each packet")
+    args = parser.parse_args(argv)
+
+    # Each player holds a random key for a random number of frames, like a person would
+    def scripted_player(seed):
+        rng = random.Random(seed)
+        state = {"move": 0, "frames": 0}
+
+        def move():
+            if state["frames"] == 0:
+                state["move"] = rng.choice(MOVES)
+                state["frames"] = rng.randint(1, 30)
+            state["frames"] -= 1
+            return state["move"]
+
+        return move
+
+    transports = [UdpTransport(("127.0.0.1", 0), None, args.latency_ms / 1000, args.jitter_ms / 1000, args.loss,
+                               seed=player) for player in (0, 1)]
+    transports[0].peer = transports[1].address
+    transports[1].peer = transports[0].address
+    sessions = [RollbackSession(Game(seed=args.seed), player, transports[player], scripted_player(player))
+                for player in (0, 1)]
+    for session in sessions:
+        session.game.events = _EventRecorder()
+
+    # Both peers tick at 60 frames per second, until both have simulated every frame and heard every input
+    start = time.perf_counter()
+    next_tick = start
+    while not all(session.frame >= args.frames and session.settled for session in sessions):
+        for session in sessions:
+            if session.frame < args.frames:
+                session.advance()
+            else:
+                # Keep exchanging inputs so that both peers can confirm their last frames
+                session.poll()
+        next_tick += 1 / 60
+        time.sleep(max(0.0, next_tick - time.perf_counter()))
+    elapsed = time.perf_counter() - start
+
+    for transport in transports:
+        transport.close()
+
+    states = [session.game.snapshot() for session in sessions]
+    for player, session in enumerate(sessions):
+        print(f"peer {player}: {session.frame} frames, {session.rollbacks} rollbacks, "
+              f"{session.resimulated} frames re-simulated, "
+              f"score {session.game.bats[0].score}-{session.game.bats[1].score}")
+    print(f"{elapsed:.1f}s, peers {'in sync' if states[0] == states[1] else 'OUT OF SYNC'}")
+
+    # Despite the rollbacks, each peer's events must be exactly those of the match its inputs describe, as a
+    # headless re-simulation of its replay records them
+    replayed = sessions[0].to_replay(args.seed).playback()
+    replayed.events = _EventRecorder()
+    for _ in range(args.frames):
+        replayed.update()
+    for player, session in enumerate(sessions):
+        matches = session.events.events == replayed.events.events
+        print(f"peer {player}: {len(session.events.events)} events, "
+              f"{'same as replay' if matches else 'DIFFERENT FROM REPLAY'}")
+
+
+if __name__ == "__main__":
+    main()
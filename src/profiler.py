@@ -0,0 +1,156 @@
+# Standard library imports
+import json
+import time
+from array import array
+
+# Phases of a frame which can be timed. They are small integers so that recording a time is just a list index
+PHASE_BATS = 0
+PHASE_BAT_AI = 1
+PHASE_BALL = 2
+PHASE_IMPACTS = 3
+PHASE_SCORING = 4
+PHASE_DRAW_BACKGROUND = 5
+PHASE_DRAW_SPRITES = 6
+PHASE_DRAW_DIGITS = 7
+PHASE_FRAME = 8
+
+PHASE_NAMES = ("bats", "bat_ai", "ball", "impacts", "scoring", "draw_background", "draw_sprites", "draw_digits",
+               "frame")
+
+_ZEROS = (0,) * len(PHASE_NAMES)
+
+# The overlay's statistics are recomputed every this many frames
+OVERLAY_REFRESH_FRAMES = 30
+
+
+class FrameProfiler:
+    """
+    Opt-in per-frame profiler for the update and draw loop.
+
+    Code being profiled adds the time spent in each phase to the current frame; at the end of the frame the totals
+    are written to fixed-size ring buffers holding the most recent frames, so the profiler never allocates once it
+    has been created. Game only times its phases when its profiler attribute is set, so profiling costs a single
+    attribute check per phase when it is disabled.
+
+    Times are measured with the monotonic time.perf_counter_ns clock and stored in nanoseconds. Note that the
+    bat_ai phase is part of the bats phase, and that the frame phase covers the whole frame from begin_frame to
+    end_frame.
+
+    Attributes:
+        capacity (int): The number of frames kept in the ring buffers.
+        budget_ns (int): The frame time budget in nanoseconds - frames taking longer count as overruns.
+        frames (int): The number of frames recorded since the profiler was created.
+        overruns (int): The number of frames which took longer than the budget.
+    """
+
+    clock = staticmethod(time.perf_counter_ns)
+
+    def __init__(self, capacity=600, budget_ms=1000 / 60):
+        """
+        Initializes the profiler with empty ring buffers.
+
+        Args:
+            capacity (int, optional): The number of frames to keep. Defaults to 10 seconds at 60 frames per second.
+            budget_ms (float, optional): The frame time budget in milliseconds. Defaults to one 60 Hz frame.
+        """
+        self.capacity = capacity
+        self.budget_ns = int(budget_ms * 1e6)
+        self.frames = 0
+        self.overruns = 0
+        self._samples = [array("q", bytes(8 * capacity)) for _ in PHASE_NAMES]
+        self._current = [0] * len(PHASE_NAMES)
+        self._frame_start = 0
+        self._overlay = None
+
+    def begin_frame(self):
+        """
+        Starts timing a new frame.
+        """
+        self._current[:] = _ZEROS
+        self._frame_start = self.clock()
+
+    def add(self, phase, start):
+        """
+        Adds the time elapsed since start to a phase of the current frame.
+
+        Args:
+            phase (int): One of the PHASE_ constants.
+            start (int): The clock value when the phase started, as returned by clock().
+
+        Returns:
+            int: The current clock value, which can be used as the start of the next phase.
+        """
+        now = self.clock()
+        self._current[phase] += now - start
+        return now
+
+    def end_frame(self):
+        """
+        Finishes timing the current frame and stores its phase times in the ring buffers.
+        """
+        self._current[PHASE_FRAME] = self.clock() - self._frame_start
+        slot = self.frames % self.capacity
+        for samples, elapsed in zip(self._samples, self._current):
+            samples[slot] = elapsed
+        self.frames += 1
+        if self._current[PHASE_FRAME] > self.budget_ns:
+            self.overruns += 1
+
+    def stats(self):
+        """
+        Summarises the recorded frames.
+
+        Returns:
+            dict: For each phase, the 50th and 99th percentile and maximum time in milliseconds over the frames
+            held in the ring buffers, together with the frame and overrun counts.
+        """
+        count = min(self.frames, self.capacity)
+        phases = {}
+        for name, samples in zip(PHASE_NAMES, self._samples):
+            times = sorted(samples[:count])
+            if times:
+                phases[name] = {"p50": times[count // 2] / 1e6,
+                                "p99": times[min(count - 1, count * 99 // 100)] / 1e6,
+                                "max": times[-1] / 1e6}
+        return {"frames": self.frames,
+                "overruns": self.overruns,
+                "budget_ms": self.budget_ns / 1e6,
+                "phases": phases}
+
+    def dump(self, path):
+        """
+        Writes the statistics and the raw per-frame phase times held in the ring buffers to a JSON file.
+
+        Args:
+            path (str): The file to write.
+        """
+        count = min(self.frames, self.capacity)
+
+        # Put the samples back into the order in which the frames happened
+        first = self.frames % self.capacity if self.frames > self.capacity else 0
+        order = [(first + i) % self.capacity for i in range(count)]
+
+        with open(path, "w") as file:
+            json.dump({"stats": self.stats(),
+                       "samples_ns": {name: [samples[i] for i in order]
+                                      for name, samples in zip(PHASE_NAMES, self._samples)}},
+                      file)
+
+    def draw(self, screen):
+        """
+        Draws an overlay showing the frame time percentiles and the time of each phase.
+
+        Args:
+            screen (Screen): The Pygame Zero screen to draw on.
+        """
+
+        # Sorting the samples takes a while, so the text is only rebuilt every few frames
+        if self._overlay is None or self.frames % OVERLAY_REFRESH_FRAMES == 0:
+            stats = self.stats()
+            lines = ["{:<16}{:>7}{:>7}{:>7}".format("ms", "p50", "p99", "max")]
+            for name, times in stats["phases"].items():
+                lines.append("{:<16}{:>7.2f}{:>7.2f}{:>7.2f}".format(name, times["p50"], times["p99"], times["max"]))
+            lines.append("overruns {} / {}".format(stats["overruns"], stats["frames"]))
+            self._overlay = "\n".join(lines)
+
+        screen.draw.text(self._overlay, topleft=(70, 120), fontsize=18, color="yellow")
@@ -0,0 +1,140 @@
+# Pygame imports
+import pygame
+
+# Local application constants
+from src.constants import WIDTH_PX, HEIGHT_PX
+
+
+class DirtyRectRenderer:
+    """
+    Draws a Game with the same layering as Game.draw and main.draw, but only redraws the parts of the screen which
+    have changed since the previous frame.
+
+    Each frame, the renderer works out the bounding rectangles of the moving sprites - bats, ball and impacts - in
+    their previous and current positions, and the rectangles of any score digits whose value or colour changed.
+    Only these regions are redrawn: for each one, every layer (the pre-composited table and effects, sprites,
+    digits, overlay) is blitted with the surface's clipping rectangle set to the region, so each blit only touches
+    the pixels that need it - see StaticLayers in src/atlas.py. The whole screen is only redrawn when a full-screen
+    layer - the 'just scored' effect or the menu/game over overlay - appears, disappears or changes.
+
+    The returned rectangles are meant to be passed to pygame.display.update, so that only they are pushed to the
+    display.
+    """
+
+    # The screen, as a rectangle
+    SCREEN_RECT = pygame.Rect(0, 0, WIDTH_PX, HEIGHT_PX)
+
+    def __init__(self, surface):
+        """
+        Initializes the renderer. The first frame it draws will be a full redraw.
+
+        Args:
+            surface (pygame.Surface): The surface to draw on - normally the display surface.
+        """
+        self.surface = surface
+        self._sprite_rects = []
+        self._digits = None
+        self._full_screen_layers = None
+
+    def invalidate(self):
+        """
+        Forces the next frame to redraw the whole screen - for instance after something else has drawn on it.
+        """
+        self._full_screen_layers = None
+
+    def draw(self, game, overlay=None, alpha=1.0):
+        """
+        Draws the game, updating only the regions which changed since the last call.
+
+        Args:
+            game (Game): The game to draw.
+            overlay (pygame.Surface, optional): A full-screen image drawn on top of everything, such as the menu
+                or game over screen.
+            alpha (float, optional): How far between their previous and current positions to draw the bats and
+                ball - see Game.sprite_positions.
+
+        Returns:
+            list: The pygame.Rect regions of the surface which were redrawn.
+        """
+
+        # Gather everything which is drawn this frame
+        assets = game.get_assets()
+        sprites = self._sprites(game, alpha)
+        digits = [(assets.digits[colour][digit], pos) for colour, digit, pos in game.score_digits()]
+        effects = tuple(assets.effects[p] for p in game.effect_players())
+        full_screen_layers = (effects, overlay)
+
+        sprite_rects = [rect for _, _, rect in sprites]
+
+        full_redraw = full_screen_layers != self._full_screen_layers
+        if full_redraw:
+            # A full-screen layer has changed, so everything needs redrawing
+            dirty = [self.SCREEN_RECT]
+        else:
+            # Sprites need to be erased from where they were and drawn where they are now
+            dirty = self._sprite_rects + sprite_rects
+
+            # Digits are only redrawn when their image changes
+            if self._digits is not None:
+                for (image, pos), (old_image, _) in zip(digits, self._digits):
+                    if image is not old_image:
+                        dirty.append(image.get_rect(topleft=pos))
+
+            dirty = merge_rects(dirty)
+
+        self._sprite_rects = sprite_rects
+        self._digits = digits
+        self._full_screen_layers = full_screen_layers
+
+        layers = [(image, topleft) for image, topleft, _ in sprites]
+        layers.extend(digits)
+
+        static = game.get_sprites().static
+        if full_redraw:
+            static.draw(self.surface, effects, overlay, layers)
+        else:
+            static.draw(self.surface, effects, overlay, layers, dirty)
+
+        return dirty
+
+    def _sprites(self, game, alpha):
+        # Returns (image, topleft, bounding rect) for each sprite, using the same adapters as Game.draw so that
+        # sprites are chosen and positioned identically
+        adapters = game.get_sprites()
+        bat_positions, ball_pos = game.sprite_positions(alpha)
+        placed = [adapters.bat.place(bat, pos) for bat, pos in zip(game.bats, bat_positions)]
+        placed.append(adapters.ball.place(game.ball, ball_pos))
+        placed.extend(adapters.impact.place(impact) for impact in game.impacts)
+
+        sprites = []
+        for image, topleft in placed:
+            # Sprite positions can be fractional, so round the rectangle outwards to cover every pixel touched
+            rect = pygame.Rect(int(topleft[0]) - 1, int(topleft[1]) - 1,
+                               image.get_width() + 2, image.get_height() + 2)
+            sprites.append((image, topleft, rect))
+        return sprites
+
+
+def merge_rects(rects):
+    """
+    Merges overlapping rectangles, so that no region is redrawn twice.
+
+    Args:
+        rects (list): pygame.Rect instances.
+
+    Returns:
+        list: Non-overlapping rectangles covering at least the same area.
+    """
+    merged = []
+    for rect in rects:
+        rect = rect.clip(DirtyRectRenderer.SCREEN_RECT)
+        if not rect.width or not rect.height:
+            continue
+
+        # Keep absorbing overlapping rectangles until none are left
+        index = rect.collidelist(merged)
+        while index != -1:
+            rect.union_ip(merged.pop(index))
+            index = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
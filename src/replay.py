@@ -0,0 +1,192 @@
+# Standard library imports
+import argparse
+import random
+import struct
+import time
+import zlib
+
+# Local application imports
+from src.game import Game
+
+# Local application constants
+from src.constants import PLAYER_SPEED
+
+# The three moves a player can make each frame, indexed by the code stored in the replay
+MOVES = (-PLAYER_SPEED, 0, PLAYER_SPEED)
+
+
+class Replay:
+    """
+    A recording of a match, made up of the seed of the game's random number generator and the moves made by the
+    human players on every frame. The AI players and the ball are fully determined by these, so re-simulating the
+    match from them reproduces it exactly.
+
+    The binary format is a small header followed by the zlib-compressed moves, one byte per human player per frame.
+    Players tend to hold a key for many frames at a time, so a whole match compresses to a few kilobytes.
+
+    Attributes:
+        seed (int): The seed of the game's random number generator.
+        human (tuple): Whether each of the two players is human (True) or the AI (False).
+        moves (list): For each player, a bytearray holding the code of the move made on each frame - 0, 1 or 2 for
+            up, still or down. The moves of AI players are not recorded.
+    """
+
+    # Magic bytes, version, seed, human players bit mask and number of frames
+    HEADER = struct.Struct("<4sBqBI")
+    MAGIC = b"PONG"
+    VERSION = 1
+
+    def __init__(self, seed=None, human=(True, False)):
+        """
+        Initializes an empty replay.
+
+        Args:
+            seed (int, optional): The seed of the game's random number generator. A random seed is chosen if this
+                is not given.
+            human (tuple, optional): Whether each of the two players is human. Defaults to one human player.
+        """
+        self.seed = random.getrandbits(63) if seed is None else seed
+        self.human = tuple(human)
+        self.moves = [bytearray(), bytearray()]
+
+    @property
+    def frames(self):
+        """
+        int: The number of frames recorded.
+        """
+        return max(len(moves) for moves in self.moves)
+
+    def record(self, screen=None, controls=(None, None)):
+        """
+        Creates a game which records into this replay.
+
+        Args:
+            screen (Screen, optional): The screen to draw the game on.
+            controls (tuple, optional): The control functions of the two players, as for Game. Only the players
+                marked as human in this replay are recorded.
+
+        Returns:
+            Game: A new game seeded from this replay, whose human players' moves are appended to the replay on
+            every frame.
+        """
+        return Game(screen, [self._recorder(player, controls[player]) if self.human[player] else None
+                             for player in (0, 1)], seed=self.seed)
+
+    def _recorder(self, player, move_func):
+        moves = self.moves[player]
+
+        def recorded():
+            move = move_func()
+            moves.append(MOVES.index(move))
+            return move
+
+        return recorded
+
+    def playback(self, screen=None):
+        """
+        Creates a game which replays the recorded moves.
+
+        Args:
+            screen (Screen, optional): The screen to draw the game on.
+
+        Returns:
+            Game: A new game seeded from this replay, whose human players make the recorded moves.
+        """
+        return Game(screen, [self._player(player) if self.human[player] else None for player in (0, 1)],
+                    seed=self.seed)
+
+    def _player(self, player):
+        moves = iter(self.moves[player])
+
+        def played():
+            # Once the recording runs out, the player stands still
+            return MOVES[next(moves, 1)]
+
+        return played
+
+    def play(self, frames=None):
+        """
+        Re-simulates the match headlessly, as fast as possible.
+
+        Args:
+            frames (int, optional): The number of frames to simulate. Defaults to the whole recording.
+
+        Returns:
+            Game: The game in the state it was in after the last simulated frame.
+        """
+        game = self.playback()
+        for _ in range(self.frames if frames is None else frames):
+            game.update()
+        return game
+
+    def to_bytes(self):
+        """
+        Serialises the replay.
+
+        Returns:
+            bytes: The replay in its compact binary format.
+        """
+        human_mask = self.human[0] | (self.human[1] << 1)
+        header = self.HEADER.pack(self.MAGIC, self.VERSION, self.seed, human_mask, self.frames)
+        moves = b"".join(bytes(self.moves[player]) for player in (0, 1) if self.human[player])
+        return header + zlib.compress(moves, 9)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Deserialises a replay.
+
+        Args:
+            data (bytes): A replay in the format written by to_bytes.
+
+        Returns:
+            Replay: The replay.
+
+        Raises:
+            ValueError: If the data is not a replay, or was written by an unsupported version.
+        """
+        magic, version, seed, human_mask, frames = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise ValueError("Not a version {} replay.".format(cls.VERSION))
+
+        replay = cls(seed, (bool(human_mask & 1), bool(human_mask & 2)))
+        moves = zlib.decompress(data[cls.HEADER.size:])
+        for player in (0, 1):
+            if replay.human[player]:
+                replay.moves[player] = bytearray(moves[:frames])
+                moves = moves[frames:]
+        return replay
+
+    def save(self, path):
+        """
+        Writes the replay to a file.
+        """
+        with open(path, "wb") as file:
+            file.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a replay from a file written by save.
+        """
+        with open(path, "rb") as file:
+            return cls.from_bytes(file.read())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-simulate recorded matches headlessly.")
+    parser.add_argument("paths", nargs="+", help="replay files")
+    args = parser.parse_args(argv)
+
+    for path in args.paths:
+        replay = Replay.load(path)
+        start = time.perf_counter()
+        game = replay.play()
+        elapsed = time.perf_counter() - start
+        print(f"{path}: seed {replay.seed}, {replay.frames} frames, "
+              f"score {game.bats[0].score}-{game.bats[1].score}, "
+              f"re-simulated in {elapsed:.3f}s ({replay.frames / elapsed:.0f} frames/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+# Standard library imports
+import os
+import time
+
+# Local application imports
+from src.state import State
+from src.game import Game
+from src.replay import Replay
+from src.netplay import RollbackSession
+
+# Local application constants
+from src.constants import PLAYER_SPEED, SOUND_UP, SOUND_DOWN
+
+# The keys a session responds to. The input for each tick is a bit mask of the keys held down - see Session.tick
+INPUT_SPACE = 1
+INPUT_UP = 2
+INPUT_DOWN = 4
+INPUT_A = 8
+INPUT_Z = 16
+INPUT_K = 32
+INPUT_M = 64
+
+
+class Session:
+    """
+    One copy of the game as a player sees it - the menu, a match and the game over screen - driven by the keys held
+    down on each tick.
+
+    The session holds the state machine which main.py used to keep in module globals: which screen is showing,
+    the number of players chosen on the menu, the game being played, the replay of the match and whether the space
+    key was already down on the previous tick, so that a press is only acted on once. As its input is a bit mask
+    rather than Pygame Zero's keyboard, and it only touches Pygame through the game's draw method, any number of
+    headless sessions can run side by side in one process - see src/host.py.
+
+    Attributes:
+        screen (Screen): The screen games are drawn on, or None for a headless session.
+        assets (Assets): The asset registry given to each game, or None.
+        audio (SoundDispatcher): The sound dispatcher given to each game, or None for a silent session.
+        netplay (dict): If set, every match is a networked match - see main.py for its keys.
+        arena_balls (int): If set, every match which isn't networked is played in a multi-ball arena with this many
+            balls.
+        replay_dir (str): If set, the replay of every recorded match is saved in this directory when it ends.
+        events (EventLog): If set, records the events of every match - see src/events.py.
+        profiler (FrameProfiler): If set, times the phases of each update - see src/profiler.py.
+        state (State): The screen which is showing.
+        num_players (int): The number of players chosen on the menu.
+        game (Game): The game being played - or, on the menu, the attract mode game in the background.
+        replay (Replay): The replay of the current or most recent match, if it was recorded.
+        inputs (int): The keys held down on the most recent tick.
+        matches (int): The number of matches which have been played to the end.
+    """
+
+    def __init__(self, screen=None, assets=None, audio=None, netplay=None, arena_balls=0, replay_dir=None):
+        """
+        Initializes the session on the menu.
+
+        Args:
+            screen (Screen, optional): The screen to draw on. Can be set later with attach.
+            assets (Assets, optional): The asset registry.
+            audio (SoundDispatcher, optional): The sound dispatcher.
+            netplay (dict, optional): Settings making every match a networked one.
+            arena_balls (int, optional): The number of balls in an arena match, or 0 for normal matches.
+            replay_dir (str, optional): The directory in which to save replays.
+        """
+        self.screen = screen
+        self.assets = assets
+        self.audio = audio
+        self.netplay = netplay
+        self.arena_balls = arena_balls
+        self.replay_dir = replay_dir
+        self.events = None
+        self.profiler = None
+
+        self.state = State.MENU
+        self.num_players = 1
+        self.replay = None
+        self.inputs = 0
+        self.matches = 0
+
+        # Whether the space key was down on the previous tick
+        self._space_down = False
+
+        # In a networked match, the RollbackSession exchanging inputs with the peer - see src/netplay.py
+        self._rollback = None
+
+        # The attract mode game on the menu, with two AIs playing each other
+        self.game = self._setup(Game(screen))
+
+    def attach(self, screen):
+        """
+        Sets the screen to draw on, for a session created before the screen existed.
+        """
+        self.screen = screen
+        self.game.screen = screen
+
+    def p1_controls(self):
+        move = 0
+        if self.inputs & (INPUT_Z | INPUT_DOWN):
+            move = PLAYER_SPEED
+        elif self.inputs & (INPUT_A | INPUT_UP):
+            move = -PLAYER_SPEED
+        return move
+
+    def p2_controls(self):
+        move = 0
+        if self.inputs & INPUT_M:
+            move = PLAYER_SPEED
+        elif self.inputs & INPUT_K:
+            move = -PLAYER_SPEED
+        return move
+
+    def tick(self, inputs):
+        """
+        Advances the session by one update.
+
+        Args:
+            inputs (int): Bit mask of the INPUT_ constants for the keys held down.
+        """
+        self.inputs = inputs
+        game = self.game
+
+        if self.profiler:
+            game.profiler = self.profiler
+
+        # Only matches are logged, not the attract mode game on the menu
+        if self.events and self.state == State.PLAY:
+            game.events = self.events
+
+        # Work out whether the space key has just been pressed - i.e. on the previous tick it wasn't down, and on
+        # this one it is
+        space_down = bool(inputs & INPUT_SPACE)
+        space_pressed = space_down and not self._space_down
+        self._space_down = space_down
+
+        if self.state == State.MENU:
+            if space_pressed:
+                self._start_match()
+            else:
+                # Detect up/down keys
+                if self.num_players == 2 and inputs & INPUT_UP:
+                    self._request_sound(SOUND_UP)
+                    self.num_players = 1
+                elif self.num_players == 1 and inputs & INPUT_DOWN:
+                    self._request_sound(SOUND_DOWN)
+                    self.num_players = 2
+
+                # Update the attract mode game in the background
+                game.update()
+
+        elif self.state == State.PLAY:
+            # Has anyone won?
+            if game.finished:
+                # In a networked match, the winning point might yet be undone by a rollback, so the match is only
+                # over once the peer's inputs for every frame have arrived
+                if self._rollback and not self._rollback.settled:
+                    self._rollback.poll()
+                else:
+                    self.state = State.GAME_OVER
+                    self.matches += 1
+                    if self._rollback:
+                        self.replay = self._rollback.to_replay(self.netplay["seed"])
+                    self._save_replay()
+            elif self._rollback:
+                self._rollback.advance()
+            else:
+                game.update()
+
+        elif self.state == State.GAME_OVER:
+            # Our inputs for the last frames of a networked match may not have reached the peer yet, so keep
+            # sending them until we leave the game over screen. Every frame has been settled, so there is nothing
+            # left to roll back
+            if self._rollback:
+                self._rollback.poll()
+
+            if space_pressed:
+                # Back to the menu, with a new attract mode game
+                self.state = State.MENU
+                self.num_players = 1
+                self.game = self._setup(Game(self.screen))
+                self._rollback = None
+
+    def overlay(self):
+        """
+        Returns the full-screen image which goes on top of the game - the menu or the game over screen - if any.
+        """
+        if self.state == State.MENU:
+            return self.assets.menus[self.num_players - 1]
+        elif self.state == State.GAME_OVER:
+            return self.assets.over
+        return None
+
+    def _start_match(self):
+        # Switch to play state, and create a new game, passing it the controls function for player 1, and if we're
+        # in 2 player mode, the controls function for player 2 (otherwise None, making that player computer-controlled)
+        self.state = State.PLAY
+
+        if self.netplay:
+            # In a networked match, each peer controls one of the bats with player 1's keys, and the rollback
+            # session controls both bats from the exchanged inputs - see src/netplay.py
+            self.game = self._setup(Game(self.screen, seed=self.netplay["seed"]))
+            self._rollback = RollbackSession(self.game, self.netplay["player"], self.netplay["transport"],
+                                             self.p1_controls)
+            return
+
+        controls = [self.p1_controls]
+        controls.append(self.p2_controls if self.num_players == 2 else None)
+
+        if self.arena_balls:
+            # Local application imports - the arena needs numpy, which takes a while to import, so it is only
+            # imported when an arena match is played
+            from src.arena import ArenaGame
+
+            # Arena matches aren't recorded - see src/arena.py
+            self.replay = None
+            self.game = self._setup(ArenaGame(self.screen, controls, self.arena_balls))
+            return
+
+        # Every match is recorded, so that it can be re-simulated later - see src/replay.py
+        self.replay = Replay(human=(True, self.num_players == 2))
+        self.game = self._setup(self.replay.record(self.screen, controls))
+
+    def _setup(self, game):
+        game.assets = self.assets
+        game.audio = self.audio
+        return game
+
+    def _request_sound(self, sound_id):
+        if self.audio is not None:
+            self.audio.request(sound_id)
+
+    def _save_replay(self):
+        # Save the replay of the match which has just finished, if a directory for replays has been configured
+        if self.replay_dir and self.replay:
+            os.makedirs(self.replay_dir, exist_ok=True)
+            self.replay.save(os.path.join(self.replay_dir, time.strftime("%Y%m%d-%H%M%S") + ".replay"))
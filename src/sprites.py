@@ -0,0 +1,148 @@
+# Local application imports
+from src.atlas import StaticLayers
+
+
+class BatSprite:
+    """
+    Rendering adapter drawing Bat simulation objects with the bat sprites.
+
+    A single instance is shared by both bats: each call to draw_state selects the sprite matching the bat's player
+    number and animation frame from the asset registry, and draws it centred on the bat's position.
+    """
+
+    def __init__(self, assets):
+        """
+        Args:
+            assets (Assets): The asset registry - see src/assets.py.
+        """
+
+        # There are 3 sprites per player - e.g. bats[0][0] is the left-hand player's standard bat sprite, bats[0][1]
+        # is the sprite to use when the ball has just bounced off the bat, and bats[0][2] is the sprite to use when
+        # the bat has just missed the ball and the ball has gone out of bounds. bats[1] holds the equivalents for
+        # the right-hand player
+        self.images = assets.bats
+
+    def draw_state(self, surface, bat, pos=None):
+        """
+        Draws the given bat.
+
+        Args:
+            surface (pygame.Surface): The surface to draw on.
+            bat (Bat): The bat to draw.
+            pos (tuple, optional): Where to draw the bat, if not at its current position.
+        """
+        surface.blit(*self.place(bat, pos))
+
+    def place(self, bat, pos=None):
+        """
+        Selects the sprite for the given bat and works out where it goes, without drawing it.
+
+        Args:
+            bat (Bat): The bat to represent.
+            pos (tuple, optional): Where to draw the bat, if not at its current position.
+
+        Returns:
+            tuple: (image, topleft) - the pygame.Surface to draw and the position of its top left corner.
+        """
+        x, y = pos or (bat.x, bat.y)
+        image = self.images[bat.player][bat.frame]
+        return image, (x - image.get_width() / 2, y - image.get_height() / 2)
+
+
+class BallSprite:
+    """
+    Rendering adapter drawing a Ball simulation object with the ball sprite.
+    """
+
+    def __init__(self, assets):
+        """
+        Args:
+            assets (Assets): The asset registry - see src/assets.py.
+        """
+        # The registry is kept rather than the sprite, as the sprite is replaced by its view of the atlas once
+        # every image has been loaded - see src/assets.py
+        self.assets = assets
+        self.half_width = assets.ball.get_width() / 2
+        self.half_height = assets.ball.get_height() / 2
+
+    def draw_state(self, surface, ball, pos=None):
+        """
+        Draws the given ball.
+
+        Args:
+            surface (pygame.Surface): The surface to draw on.
+            ball (Ball): The ball to draw.
+            pos (tuple, optional): Where to draw the ball, if not at its current position.
+        """
+        surface.blit(*self.place(ball, pos))
+
+    def place(self, ball, pos=None):
+        """
+        Works out where the ball's sprite goes, without drawing it.
+
+        Args:
+            ball (Ball): The ball to represent.
+            pos (tuple, optional): Where to draw the ball, if not at its current position.
+
+        Returns:
+            tuple: (image, topleft) - the pygame.Surface to draw and the position of its top left corner.
+        """
+        x, y = pos or (ball.x, ball.y)
+        return self.assets.ball, (x - self.half_width, y - self.half_height)
+
+
+class ImpactSprite:
+    """
+    Rendering adapter drawing the impact effects held in an ImpactPool with the impact animation sprites.
+    """
+
+    def __init__(self, assets):
+        """
+        Args:
+            assets (Assets): The asset registry - see src/assets.py.
+        """
+
+        # One sprite per value of the impact's time - see Assets.impacts
+        self.images = assets.impacts
+
+    def draw_state(self, surface, impact):
+        """
+        Draws the given impact effect.
+
+        Args:
+            surface (pygame.Surface): The surface to draw on.
+            impact (tuple): The (x, y, time) of the impact effect to draw, as given by iterating over an
+                ImpactPool.
+        """
+        surface.blit(*self.place(impact))
+
+    def place(self, impact):
+        """
+        Selects the animation frame for the given impact effect and works out where it goes, without drawing it.
+
+        Args:
+            impact (tuple): The (x, y, time) of the impact effect to represent.
+
+        Returns:
+            tuple: (image, topleft) - the pygame.Surface to draw and the position of its top left corner.
+        """
+        x, y, time = impact
+        image = self.images[time]
+        return image, (x - image.get_width() / 2, y - image.get_height() / 2)
+
+
+class Sprites:
+    """
+    The set of rendering adapters used by Game.draw - one per kind of simulation object, shared by all
+    objects of that kind - together with the pre-composited full-screen layers drawn around them.
+    """
+
+    def __init__(self, assets):
+        """
+        Args:
+            assets (Assets): The asset registry the adapters take their sprites from.
+        """
+        self.bat = BatSprite(assets)
+        self.ball = BallSprite(assets)
+        self.impact = ImpactSprite(assets)
+        self.static = StaticLayers(assets)
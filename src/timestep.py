@@ -0,0 +1,68 @@
+# Local application constants
+from src.constants import SIMULATION_RATE, MAX_CATCH_UP_STEPS
+
+
+class FixedTimestep:
+    """
+    Fixed timestep scheduler, which decouples the rate at which the game is simulated from the rate at which it is
+    drawn.
+
+    Speeds in the game are in pixels per update, so if the game were updated once per drawn frame, a slow draw
+    would slow the game down and a fast display would speed it up. Instead, the time elapsed between drawn frames
+    is added to an accumulator, and the game is updated once for every whole timestep in the accumulator, so it
+    always runs at SIMULATION_RATE updates per second. What is left in the accumulator is how far the current
+    moment is between the most recent update and the next one, which draw uses to interpolate the positions of
+    the bats and ball - see Game.sprite_positions.
+
+    If drawing falls far behind - for instance while the window is being dragged - catching up fully would take
+    so many updates that the next frame would fall even further behind. So at most max_steps updates are run per
+    frame, and any further time is dropped, which slows the game down for a moment instead.
+
+    Attributes:
+        step (float): The length of a timestep in seconds.
+        max_steps (int): The maximum number of updates per drawn frame.
+        accumulator (float): The time elapsed since the most recent update, in seconds.
+        dropped (int): The number of updates dropped because of the catch-up cap.
+    """
+
+    def __init__(self, rate=SIMULATION_RATE, max_steps=MAX_CATCH_UP_STEPS):
+        """
+        Initializes the scheduler with an empty accumulator.
+
+        Args:
+            rate (float, optional): The number of updates per second.
+            max_steps (int, optional): The maximum number of updates per drawn frame.
+        """
+        self.step = 1 / rate
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        self.dropped = 0
+
+    def advance(self, dt):
+        """
+        Adds the time elapsed since the previous frame to the accumulator.
+
+        Args:
+            dt (float): The time elapsed in seconds.
+
+        Returns:
+            int: The number of updates to run this frame.
+        """
+        self.accumulator += dt
+        steps = int(self.accumulator // self.step)
+
+        if steps > self.max_steps:
+            self.dropped += steps - self.max_steps
+            steps = self.max_steps
+            self.accumulator %= self.step
+        else:
+            self.accumulator -= steps * self.step
+
+        return steps
+
+    @property
+    def alpha(self):
+        """
+        float: How far the current moment is between the most recent update (0) and the next one (1).
+        """
+        return min(1.0, self.accumulator / self.step)
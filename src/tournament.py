@@ -0,0 +1,308 @@
+# Standard library imports
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+# Local application imports
+from src.game import Game
+from src.events import EVENT_POINT_SCORED
+
+# Fast-forwarded matches are advanced this many frames at a time between checks for a winner
+FAST_FORWARD_FRAMES = 600
+
+
+def play_match(seed, max_frames=None, fast_forward=False):
+    """
+    Plays one headless AI-vs-AI match to the end, using the same winning rule as main.py - the match is over as
+    soon as one of the players has more than 9 points.
+
+    Args:
+        seed (int): Seed for the random number generator, which makes the match reproducible.
+        max_frames (int, optional): Abandon the match after this many frames.
+        fast_forward (bool, optional): Jump over the frames on which nothing happens with Game.advance, which is
+            a couple of times faster. The bats' positions can then differ from update's in their last bits, which
+            the ball's path picks up when it is hit, so a match is played much like, but not necessarily exactly
+            like, the one update would play from the same seed.
+
+    Returns:
+        dict: The seed, the final score, the number of frames, and for each point the number of times the ball was
+        hit and its final speed.
+    """
+    if fast_forward:
+        return _fast_forward_match(seed, max_frames)
+
+    game = Game(seed=seed)
+
+    frames = 0
+    rallies = []
+    speeds = []
+    scores = [0, 0]
+    while max(scores) <= 9 and (max_frames is None or frames < max_frames):
+        game.update()
+        frames += 1
+
+        # A point has been scored when either score changes. The ball starts at speed 5 and gains 1 with each
+        # hit, so its speed tells us how long the rally was
+        if game.bats[0].score != scores[0] or game.bats[1].score != scores[1]:
+            scores = [game.bats[0].score, game.bats[1].score]
+            rallies.append(game.ball.speed - 5)
+            speeds.append(game.ball.speed)
+
+    return {"seed": seed, "score": scores, "frames": frames, "rallies": rallies, "speeds": speeds}
+
+
+class _PointRecorder:
+    # Stands in for an EventLog, keeping the frame, scoring player and ball speed of each point
+
+    def __init__(self):
+        self.points = []
+
+    def emit(self, frame, kind, player=-1, x=0.0, y=0.0, speed=0, value=0.0, dy=0.0):
+        if kind == EVENT_POINT_SCORED:
+            self.points.append((frame, player, speed))
+
+
+def _fast_forward_match(seed, max_frames):
+    # Plays a match as play_match does, a large number of frames at a time with Game.advance. The points are
+    # recorded as they happen, so that the match can be cut off at the exact frame of the winning point, even
+    # though the game may have been advanced beyond it
+    game = Game(seed=seed)
+    recorder = _PointRecorder()
+    game.events = recorder
+
+    frames = 0
+    while not game.finished and (max_frames is None or frames < max_frames):
+        step = FAST_FORWARD_FRAMES if max_frames is None else min(FAST_FORWARD_FRAMES, max_frames - frames)
+        game.advance(step)
+        frames += step
+
+    # The ball starts at speed 5 and gains 1 with each hit, so its speed tells us how long the rally was
+    rallies = []
+    speeds = []
+    scores = [0, 0]
+    for frame, player, speed in recorder.points:
+        scores[player] += 1
+        rallies.append(speed - 5)
+        speeds.append(speed)
+        if max(scores) > 9:
+            # Each update emits events with the number of frames before it
+            frames = frame + 1
+            break
+
+    return {"seed": seed, "score": scores, "frames": frames, "rallies": rallies, "speeds": speeds}
+
+
+class TournamentStats:
+    """
+    Running statistics over a number of matches. Only counts and histograms are kept, so memory use is bounded by
+    the number of distinct values rather than growing with the number of matches - a match lasts at most a few tens
+    of thousands of frames - and statistics gathered by different processes can be merged. The histograms hold
+    exact values, so the means and percentiles are exact too.
+
+    Attributes:
+        matches (int): The number of matches played.
+        wins (list): The number of matches won by each player.
+        unfinished (int): The number of matches abandoned before either player won.
+        rallies (Counter): Histogram of the number of hits per point.
+        speeds (Counter): Histogram of the ball speed when each point was scored.
+        frames (Counter): Histogram of the number of frames per match.
+        total_frames (int): The total number of frames played.
+    """
+
+    def __init__(self):
+        self.matches = 0
+        self.wins = [0, 0]
+        self.unfinished = 0
+        self.rallies = Counter()
+        self.speeds = Counter()
+        self.frames = Counter()
+        self.total_frames = 0
+
+    def add(self, result):
+        """
+        Adds the result of a match, as returned by play_match.
+        """
+        self.matches += 1
+        score = result["score"]
+        if max(score) > 9:
+            self.wins[0 if score[0] > score[1] else 1] += 1
+        else:
+            self.unfinished += 1
+        self.rallies.update(result["rallies"])
+        self.speeds.update(result["speeds"])
+        self.frames[result["frames"]] += 1
+        self.total_frames += result["frames"]
+
+    def merge(self, other):
+        """
+        Adds the statistics of another TournamentStats instance to this one.
+        """
+        self.matches += other.matches
+        self.wins = [a + b for a, b in zip(self.wins, other.wins)]
+        self.unfinished += other.unfinished
+        self.rallies.update(other.rallies)
+        self.speeds.update(other.speeds)
+        self.frames.update(other.frames)
+        self.total_frames += other.total_frames
+
+    def summary(self):
+        """
+        Summarises the statistics.
+
+        Returns:
+            dict: Win rates, and the mean and percentiles of the rally length, ball speed and match length.
+        """
+        return {
+            "matches": self.matches,
+            "win_rate": [wins / self.matches if self.matches else 0 for wins in self.wins],
+            "unfinished": self.unfinished,
+            "rally_length": describe(self.rallies),
+            "speed": describe(self.speeds),
+            "frames_per_match": describe(self.frames),
+            "total_frames": self.total_frames,
+        }
+
+
+def describe(histogram):
+    """
+    Describes the distribution of a histogram.
+
+    Args:
+        histogram (Counter): Mapping of values to the number of times they occurred.
+
+    Returns:
+        dict: The number of samples, mean, median, 90th and 99th percentiles and maximum value.
+    """
+    count = sum(histogram.values())
+    if count == 0:
+        return {"count": 0}
+
+    values = sorted(histogram)
+    percentiles = {}
+    targets = [("p50", 0.5), ("p90", 0.9), ("p99", 0.99)]
+    seen = 0
+    for value in values:
+        seen += histogram[value]
+        while targets and seen >= targets[0][1] * count:
+            percentiles[targets.pop(0)[0]] = value
+
+    return {"count": count,
+            "mean": sum(value * n for value, n in histogram.items()) / count,
+            **percentiles,
+            "max": values[-1]}
+
+
+def play_chunk(seeds, max_frames=None, fast_forward=False):
+    """
+    Plays a chunk of matches in a worker process.
+
+    Args:
+        seeds (range): The seeds of the matches to play.
+        max_frames (int, optional): Abandon matches after this many frames.
+        fast_forward (bool, optional): Fast-forward the matches - see play_match.
+
+    Returns:
+        tuple: (stats, results) - the TournamentStats for the chunk, and the per-match results.
+    """
+    stats = TournamentStats()
+    results = []
+    for seed in seeds:
+        result = play_match(seed, max_frames, fast_forward)
+        stats.add(result)
+        results.append(result)
+    return stats, results
+
+
+def run_tournament(num_matches, seed=0, workers=None, chunk_size=100, max_frames=None, on_chunk=None,
+                   fast_forward=False):
+    """
+    Plays a number of seeded matches across a pool of worker processes.
+
+    Matches are handed out in chunks, and only a couple of chunks per worker are in flight at any time. Each
+    chunk's statistics are merged as soon as it completes, so memory use stays constant however many matches are
+    played.
+
+    Args:
+        num_matches (int): The number of matches to play. Match i uses the seed seed + i.
+        seed (int, optional): The seed of the first match.
+        workers (int, optional): The number of worker processes. Defaults to the number of CPUs.
+        chunk_size (int, optional): The number of matches per chunk.
+        max_frames (int, optional): Abandon matches after this many frames.
+        on_chunk (callable, optional): Called with the per-match results of each chunk as it completes.
+        fast_forward (bool, optional): Fast-forward the matches - see play_match.
+
+    Returns:
+        TournamentStats: The statistics over all the matches.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = (range(start, min(start + chunk_size, seed + num_matches))
+              for start in range(seed, seed + num_matches, chunk_size))
+
+    stats = TournamentStats()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for chunk in chunks:
+            pending.add(executor.submit(play_chunk, chunk, max_frames, fast_forward))
+            if len(pending) >= 2 * workers:
+                pending = _collect(wait(pending, return_when=FIRST_COMPLETED), stats, on_chunk)
+        while pending:
+            pending = _collect(wait(pending, return_when=FIRST_COMPLETED), stats, on_chunk)
+
+    return stats
+
+
+def _collect(waited, stats, on_chunk):
+    done, pending = waited
+    for future in done:
+        chunk_stats, results = future.result()
+        stats.merge(chunk_stats)
+        if on_chunk:
+            on_chunk(results)
+    return pending
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play seeded headless AI-vs-AI matches and report statistics.")
+    parser.add_argument("--matches", type=int, default=1000, help="number of matches to play")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first match")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: number of CPUs)")
+    parser.add_argument("--chunk-size", type=int, default=100, help="matches per unit of work")
+    parser.add_argument("--max-frames", type=int, default=None, help="abandon matches after this many frames")
+    parser.add_argument("--fast-forward", action="store_true",
+                        help="jump over frames on which nothing happens - faster, but not frame-exact")
+    parser.add_argument("--output", help="write one JSON line per match to this file as results arrive")
+    args = parser.parse_args(argv)
+
+    output = open(args.output, "w") if args.output else None
+    played = 0
+
+    def on_chunk(results):
+        nonlocal played
+        played += len(results)
+        if output:
+            for result in results:
+                output.write(json.dumps(result) + "\n")
+            output.flush()
+        print(f"{played}/{args.matches} matches", file=sys.stderr)
+
+    start = time.perf_counter()
+    try:
+        stats = run_tournament(args.matches, args.seed, args.workers, args.chunk_size, args.max_frames, on_chunk,
+                               args.fast_forward)
+    finally:
+        if output:
+            output.close()
+    elapsed = time.perf_counter() - start
+
+    summary = stats.summary()
+    summary["seconds"] = elapsed
+    summary["frames_per_second"] = stats.total_frames / elapsed if elapsed else 0
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
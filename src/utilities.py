@@ -1,7 +1,6 @@
 # Standard library imports
 import math
 import sys
-import pgzero
 
 # Local application constants
 from src.constants import (MINIMUM_PYTHON_VERSION, 
@@ -22,6 +21,9 @@ def check_python_pygame_versions():
         SystemExit: If the Python or Pygame Zero version is below the required minimum.
     """
 
+    # Pygame imports - deferred so that headless simulations never import Pygame Zero
+    import pgzero
+
     # Python version check
     if sys.version_info < MINIMUM_PYTHON_VERSION:
         raise SystemExit(f"This game requires at least version {MINIMUM_PYTHON_VERSION} of Python. You have version {sys.version_info}. Please upgrade.")
@@ -60,6 +62,106 @@ def normalize_xy_vector(x, y):
     return (x / length, y / length)
 
 
+def repeated_addition_run(value, delta, limit):
+    """
+    Find for how many repeated floating point additions of delta to value the result has a closed form.
+
+    Each addition is rounded, so adding delta to value n times does not in general give value + n * delta. 
+    However, while the running sum stays between two consecutive powers of two, every sum is rounded to the 
+    same grid, so each addition adds exactly the same increment - delta rounded to that grid - and the result 
+    after k additions is exactly value + k * increment.
+
+    Args:
+        value (float): The starting value.
+        delta (float): The amount added at each step.
+        limit (int): The maximum number of additions to consider.
+
+    Returns:
+        tuple: (n, increment), where n <= limit is a number of additions such that for every k <= n, adding 
+        delta k times gives exactly value + k * increment. n is 0 when there is no such run - for instance when 
+        value is 0 or the additions round to even - in which case the next addition must be done normally.
+    """
+
+    # Adding zero never changes the value
+    if delta == 0:
+        return limit, 0.0
+
+    if value == 0 or not math.isfinite(value):
+        return 0, 0.0
+
+    # Work in units of the spacing between floats in the binade containing value - its magnitude is then an
+    # integer a with 2**52 <= a < 2**53, and delta corresponds to q units, in the direction away from zero
+    _, exponent = math.frexp(value)
+    if exponent - 53 < -1074:
+        return 0, 0.0
+    unit = math.ldexp(1.0, exponent - 53)
+    a = int(abs(value) / unit)
+    direction = 1 if value > 0 else -1
+    q = direction * delta / unit
+
+    # Sums exactly halfway between two grid points are rounded to even, which depends on the running sum
+    if q - math.floor(q) == 0.5:
+        return 0, 0.0
+    s = round(q)
+
+    # Stay at least one unit inside the binade, so that no exact sum falls below 2**52 units (where the grid 
+    # is twice as fine) or above 2**53 units (where it is twice as coarse)
+    if s > 0:
+        n = (2**53 - 1 - a) // s
+    elif a <= 2**52:
+        n = 0
+    elif s < 0:
+        n = (a - 2**52 - 1) // -s
+    else:
+        n = limit
+
+    return min(n, limit), direction * s * unit
+
+
+def first_nonpositive(a, b, c, start, end):
+    """
+    Find the first integer at which a quadratic stops being positive.
+
+    A quadratic changes sign only at its roots, so rather than evaluating it at every integer in turn, only the
+    integers next to its real roots need to be checked. A few neighbours of each root are checked, so that rounding
+    errors in the roots cannot cause a sign change to be missed.
+
+    Args:
+        a, b, c (float): The coefficients of the quadratic a * i**2 + b * i + c.
+        start (int): The first integer to consider, at which the quadratic should be positive.
+        end (int): One past the last integer to consider.
+
+    Returns:
+        int: The smallest integer i with start <= i < end at which the quadratic is zero or negative, or end if
+        there is none.
+    """
+    def value(i):
+        return (a * i + b) * i + c
+
+    if start >= end or value(start) <= 0:
+        return start
+
+    if a == 0:
+        roots = [-c / b] if b else []
+    else:
+        discriminant = b * b - 4 * a * c
+        if discriminant < 0:
+            roots = []
+        else:
+            root = math.sqrt(discriminant)
+            roots = sorted(((-b - root) / (2 * a), (-b + root) / (2 * a)))
+
+    for root in roots:
+        if root >= end:
+            break
+        first = max(start, math.ceil(root) - 1)
+        for i in range(first, min(first + 3, end)):
+            if value(i) <= 0:
+                return i
+
+    return end
+
+
 def sign(x):
     """
     Determine the sign of a number.